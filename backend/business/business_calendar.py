@@ -0,0 +1,124 @@
+"""
+営業日カレンダー
+
+土日・日本の祝日（jpholiday）・ビジネスごとの休業日（BusinessClosure）を除いた営業日を
+年単位で事前計算してキャッシュする。各年のカレンダーは日ごとの営業日フラグと
+「その日以降の最初の営業日」の表、月ごとの営業日リストを持つため、
+「N番目の営業日」「次の営業日」はどちらも O(1) で引ける。
+"""
+import calendar
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import jpholiday
+
+# ビジネスごとのカレンダーを保持する秒数（他プロセスでの休業日変更もこの時間で反映される）
+CALENDAR_CACHE_TTL = 600
+
+_calendar_cache = {}
+
+
+class YearCalendar:
+    """1年分の営業日表"""
+
+    def __init__(self, year, closed_days=frozenset(), consider_holidays=True):
+        self.year = year
+        self.start = date(year, 1, 1)
+        days_in_year = 366 if calendar.isleap(year) else 365
+
+        holidays = _national_holidays(year) | closed_days if consider_holidays else frozenset()
+        self.is_open = bytearray(days_in_year)
+        for offset in range(days_in_year):
+            day = self.start + timedelta(days=offset)
+            if day.weekday() < 5 and day not in holidays:
+                self.is_open[offset] = 1
+
+        # next_open[i]: i日目以降で最初の営業日のオフセット（年内になければ None）
+        self.next_open = [None] * (days_in_year + 1)
+        for offset in range(days_in_year - 1, -1, -1):
+            self.next_open[offset] = offset if self.is_open[offset] else self.next_open[offset + 1]
+
+        # 月ごとの営業日（日付のリスト）
+        self.month_days = {month: [] for month in range(1, 13)}
+        for offset in range(days_in_year):
+            if self.is_open[offset]:
+                day = self.start + timedelta(days=offset)
+                self.month_days[day.month].append(day)
+
+    def is_business_day(self, day):
+        return bool(self.is_open[(day - self.start).days])
+
+    def nth_business_day(self, month, n):
+        """month 月の n 番目の営業日（存在しなければ None）"""
+        days = self.month_days[month]
+        if n < 1 or n > len(days):
+            return None
+        return days[n - 1]
+
+    def first_business_day_on_or_after(self, day):
+        """day 以降で最初の営業日（年内になければ None）"""
+        offset = self.next_open[(day - self.start).days]
+        return None if offset is None else self.start + timedelta(days=offset)
+
+
+@lru_cache(maxsize=64)
+def _national_holidays(year):
+    return frozenset(holiday for holiday, _ in jpholiday.year_holidays(year))
+
+
+def _closed_days(business_id, year):
+    from .models import BusinessClosure
+
+    return frozenset(BusinessClosure.objects.filter(
+        business_id=business_id, date__year=year
+    ).values_list('date', flat=True))
+
+
+def get_year_calendar(year, business_id=None, consider_holidays=True):
+    """指定年・ビジネスの営業日カレンダーを返す（キャッシュ付き）"""
+    key = (year, business_id if consider_holidays else None, consider_holidays)
+    cached = _calendar_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        return cached[1]
+
+    closed_days = _closed_days(business_id, year) if business_id and consider_holidays else frozenset()
+    year_calendar = YearCalendar(year, closed_days, consider_holidays)
+    _calendar_cache[key] = (now + CALENDAR_CACHE_TTL, year_calendar)
+    return year_calendar
+
+
+def invalidate_business_calendar(business_id):
+    """ビジネスの休業日が変わった時にキャッシュを破棄する"""
+    for key in [key for key in _calendar_cache if key[1] == business_id]:
+        _calendar_cache.pop(key, None)
+
+
+def is_business_day(day, business_id=None, consider_holidays=True):
+    day = _as_date(day)
+    return get_year_calendar(day.year, business_id, consider_holidays).is_business_day(day)
+
+
+def nth_business_day(year, month, n, business_id=None, consider_holidays=True):
+    """year 年 month 月の n 番目の営業日（存在しなければ None）"""
+    return get_year_calendar(year, business_id, consider_holidays).nth_business_day(month, n)
+
+
+def next_business_day(day, business_id=None, consider_holidays=True):
+    """
+    day 当日を含め、以降で最初の営業日を返す。
+    datetime を渡した場合は時刻を保ったまま日付だけを進める
+    """
+    target = _as_date(day)
+    # 年末年始の休業日が続いても年をまたいで探す
+    for year in range(target.year, target.year + 2):
+        year_calendar = get_year_calendar(year, business_id, consider_holidays)
+        found = year_calendar.first_business_day_on_or_after(max(target, year_calendar.start))
+        if found:
+            return day + timedelta(days=(found - target).days)
+    return day
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
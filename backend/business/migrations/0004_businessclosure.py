@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0003_alter_business_owner_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('name', models.CharField(blank=True, max_length=100, verbose_name='name')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='closures', to='business.business')),
+            ],
+            options={
+                'verbose_name': 'business closure',
+                'verbose_name_plural': 'business closures',
+                'ordering': ['date'],
+                'unique_together': {('business', 'date')},
+            },
+        ),
+    ]
@@ -122,6 +122,28 @@ class Workspace(models.Model):
         return f"{self.name} ({self.business.name})"
 
 
+class BusinessClosure(models.Model):
+    """Business-specific closed day (e.g. year-end holidays) excluded from business-day calculations."""
+    
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name='closures'
+    )
+    date = models.DateField(_('date'))
+    name = models.CharField(_('name'), max_length=100, blank=True)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('business closure')
+        verbose_name_plural = _('business closures')
+        ordering = ['date']
+        unique_together = ('business', 'date')
+    
+    def __str__(self):
+        return f"{self.date} {self.name} ({self.business.name})"
+
+
 class BusinessInvitation(models.Model):
     """Invitation to join a business."""
     
@@ -1,6 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Business, Workspace
+from .models import Business, BusinessClosure, Workspace
+from .business_calendar import invalidate_business_calendar
 
 @receiver(post_save, sender=Business)
 def ensure_workspace_exists(sender, instance, created, **kwargs):
@@ -14,4 +15,11 @@ def ensure_workspace_exists(sender, instance, created, **kwargs):
             )
             print(f"Created default workspace for business: {instance.name} via signal")
         except Exception as e:
-            print(f"Error creating workspace in signal: {e}")
\ No newline at end of file
+            print(f"Error creating workspace in signal: {e}")
+
+
+@receiver(post_save, sender=BusinessClosure)
+@receiver(post_delete, sender=BusinessClosure)
+def clear_business_calendar(sender, instance, **kwargs):
+    """休業日が変わったビジネスの営業日カレンダーキャッシュを破棄する"""
+    invalidate_business_calendar(instance.business_id)
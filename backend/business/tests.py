@@ -1,3 +1,38 @@
+from datetime import date, datetime
+
 from django.test import TestCase
 
-# Create your tests here.
+from .business_calendar import is_business_day, next_business_day, nth_business_day
+from .models import Business, BusinessClosure
+
+
+class BusinessCalendarTests(TestCase):
+    """祝日・休業日を考慮した営業日計算を確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Calendar Business')
+
+    def test_nth_business_day_skips_national_holidays(self):
+        # 2024年5月: 3〜6日がゴールデンウィークの祝日・振替休日
+        self.assertEqual(nth_business_day(2024, 5, 2), date(2024, 5, 2))
+        self.assertEqual(nth_business_day(2024, 5, 3), date(2024, 5, 7))
+        self.assertEqual(nth_business_day(2024, 5, 3, consider_holidays=False), date(2024, 5, 3))
+        self.assertIsNone(nth_business_day(2024, 5, 30))
+
+    def test_closures_are_applied_and_invalidated(self):
+        self.assertTrue(is_business_day(date(2024, 12, 30), business_id=self.business.id))
+
+        for day in (30, 31):
+            BusinessClosure.objects.create(business=self.business, date=date(2024, 12, day))
+        BusinessClosure.objects.create(business=self.business, date=date(2025, 1, 2))
+        BusinessClosure.objects.create(business=self.business, date=date(2025, 1, 3))
+
+        self.assertFalse(is_business_day(date(2024, 12, 30), business_id=self.business.id))
+        # 年末年始の休業日をまたいで翌営業日を探す（時刻は保持する）
+        self.assertEqual(
+            next_business_day(datetime(2024, 12, 28, 9, 30), business_id=self.business.id),
+            datetime(2025, 1, 6, 9, 30)
+        )
+        # 他のビジネスには影響しない
+        self.assertEqual(next_business_day(date(2024, 12, 28)), date(2024, 12, 30))
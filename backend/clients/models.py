@@ -3,6 +3,7 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from business.business_calendar import next_business_day
 
 User = get_user_model()
 
@@ -291,6 +292,87 @@ class ClientTaskTemplate(models.Model):
         
         return new_task
     
+    # スケジュールタイプごとのタスク作成日（月内の日）
+    MONTHLY_CREATION_DAYS = {
+        'monthly_start': 1,
+        'monthly_end': 25,
+    }
+    
+    def should_generate_on(self, day):
+        """指定日がスケジュール上のタスク生成日かどうかを判定する"""
+        from django.utils import timezone
+        
+        if not self.is_active or not self.schedule:
+            return False
+        
+        schedule_type = self.schedule.schedule_type
+        if schedule_type in self.MONTHLY_CREATION_DAYS:
+            if day.day != self.MONTHLY_CREATION_DAYS[schedule_type]:
+                return False
+        elif schedule_type == 'fiscal_relative':
+            if self._fiscal_generation_date() != day:
+                return False
+        else:
+            return False
+        
+        if not self.last_generated_at:
+            return True
+        
+        # 繰り返し設定に応じて、同じ期間内に生成済みならスキップ
+        last = timezone.localtime(self.last_generated_at).date()
+        if last == day:
+            return False
+        recurrence = self.schedule.recurrence
+        if recurrence == 'monthly':
+            return (last.year, last.month) != (day.year, day.month)
+        if recurrence == 'quarterly':
+            return (last.year, (last.month - 1) // 3) != (day.year, (day.month - 1) // 3)
+        if recurrence == 'yearly':
+            return last.year != day.year
+        if recurrence == 'once':
+            return False
+        return True
+    
+    def next_generation_date(self, start, horizon_months=36):
+        """start 以降で最初にタスクを生成する日を返す（予定がなければ None）"""
+        from dateutil.relativedelta import relativedelta
+        
+        if not self.is_active or not self.schedule:
+            return None
+        
+        schedule_type = self.schedule.schedule_type
+        if schedule_type in self.MONTHLY_CREATION_DAYS:
+            creation_day = self.MONTHLY_CREATION_DAYS[schedule_type]
+            candidate = start.replace(day=creation_day)
+            if candidate < start:
+                candidate += relativedelta(months=1)
+            for _ in range(horizon_months):
+                if self.should_generate_on(candidate):
+                    return candidate
+                candidate += relativedelta(months=1)
+            return None
+        
+        if schedule_type == 'fiscal_relative':
+            candidate = self._fiscal_generation_date()
+            if candidate and candidate >= start and self.should_generate_on(candidate):
+                return candidate
+        return None
+    
+    def _fiscal_generation_date(self):
+        """決算日基準スケジュールの作成日（現在の期の開始日・終了日 + creation_day）"""
+        from datetime import timedelta
+        
+        if self.schedule.creation_day is None:
+            return None
+        fiscal_year = self.client.fiscal_years.filter(is_current=True).first()
+        if not fiscal_year:
+            return None
+        if self.schedule.fiscal_date_reference == 'start_date':
+            reference = fiscal_year.start_date
+        else:  # end_date
+            reference = fiscal_year.end_date
+        return reference + timedelta(days=self.schedule.creation_day)
+    
     def _calculate_due_date(self, reference_date):
         """Calculate the due date based on the schedule settings"""
         import calendar
@@ -342,7 +424,8 @@ class ClientTaskTemplate(models.Model):
         else:
             return None
             
-        return due_date
+        # 期限日が土日・祝日・休業日に当たる場合は翌営業日にする
+        return next_business_day(due_date, business_id=self.client.business_id)
 
 
 class FiscalYear(models.Model):
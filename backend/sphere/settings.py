@@ -225,6 +225,23 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# キャッシュ（REDIS_URL を指定すると web・スケジューラー・アウトボックスの各プロセスで共有する）
+# 繰り返しタスクの予測や稼働中タイマーなど、別プロセスからの無効化が届く必要があるため本番では必須
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'sphere',
+        }
+    }
+
+# WebSocketサーバー（通知送信先）
+WEBSOCKET_NOTIFY_URL = os.environ.get('WEBSOCKET_NOTIFY_URL', 'http://websocket:8001')
+# 通知受付エンドポイント用の共有シークレット（WebSocketサーバーの WEBSOCKET_NOTIFY_SECRET と同じ値）
+WEBSOCKET_NOTIFY_SECRET = os.environ.get('WEBSOCKET_NOTIFY_SECRET', '')
+
 # Authentication settings
 AUTH_USER_MODEL = 'users.User'  # カスタムユーザーモデルを使用
 
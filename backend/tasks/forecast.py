@@ -0,0 +1,128 @@
+import heapq
+from datetime import datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.utils import timezone
+
+from clients.models import ClientTaskTemplate
+from .models import Task
+
+# 予測結果のキャッシュ時間（秒）。繰り返し設定が変わった場合はバージョンを上げて即座に無効化する
+FORECAST_CACHE_TIMEOUT = 60 * 60
+# 1件の繰り返しから展開する最大件数（毎日繰り返しでも2年分は収まる）
+MAX_OCCURRENCES_PER_SOURCE = 800
+
+
+def get_forecast(business_id, start, end):
+    """
+    ビジネスの繰り返しタスク・テンプレートを期間内の発生予定に展開する（キャッシュ付き）
+    キャッシュキーは (ビジネス, 期間) とビジネスごとのバージョン番号
+    """
+    key = f'task_forecast:{business_id}:{_version(business_id)}:{start.isoformat()}:{end.isoformat()}'
+    occurrences = cache.get(key)
+    if occurrences is None:
+        occurrences = list(iter_forecast(business_id, start, end))
+        cache.set(key, occurrences, FORECAST_CACHE_TIMEOUT)
+    return occurrences
+
+
+def invalidate_forecast(business_id):
+    """ビジネスの予測キャッシュを無効化する"""
+    key = f'task_forecast_version:{business_id}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+
+
+def _version(business_id):
+    return cache.get_or_set(f'task_forecast_version:{business_id}', 1, None)
+
+
+def iter_forecast(business_id, start, end):
+    """
+    発生予定を日付順に1件ずつ返すジェネレーター
+    各繰り返し元のジェネレーターを heapq.merge で日付順にマージする
+    """
+    tasks = Task.objects.filter(
+        business_id=business_id,
+        is_recurring=True,
+        is_template=False,
+        # 次のインスタンスが生成済みのものは、生成された側から展開する
+        recurring_instances__isnull=True,
+    ).exclude(recurrence_pattern__isnull=True).exclude(recurrence_pattern='').defer('description')
+
+    templates = ClientTaskTemplate.objects.filter(
+        client__business_id=business_id,
+        is_active=True,
+        schedule__isnull=False,
+    ).select_related('schedule', 'client')
+
+    sources = [iter_task_occurrences(task, start, end) for task in tasks]
+    sources += [iter_template_occurrences(template, start, end) for template in templates]
+    return heapq.merge(*sources, key=lambda occurrence: occurrence['date'])
+
+
+def iter_task_occurrences(task, start, end):
+    """繰り返しタスクの発生予定（現在の未完了分と、_calculate_next_date で求めた以降の予定）"""
+    current = task.due_date or task.start_date
+    if current is None:
+        return
+    next_date = task._calculate_next_date
+
+    if task.completed_at is None and start <= _local_date(current) <= end:
+        yield _occurrence('task', task, current, projected=False)
+
+    for _ in range(MAX_OCCURRENCES_PER_SOURCE):
+        following = next_date(current)
+        # 日付が進まない設定（不正な曜日指定など）は打ち切る
+        if following is None or following <= current:
+            return
+        current = following
+        if task.recurrence_end_date and current > task.recurrence_end_date:
+            return
+        day = _local_date(current)
+        if day > end:
+            return
+        if day >= start:
+            yield _occurrence('task', task, current, projected=True)
+
+
+def iter_template_occurrences(template, start, end):
+    """テンプレートの生成予定（生成日と、その生成日で計算される期限日）"""
+    generation_date = template.next_generation_date(start)
+    for _ in range(MAX_OCCURRENCES_PER_SOURCE):
+        if generation_date is None or generation_date > end:
+            return
+        due_date = template._calculate_due_date(generation_date)
+        occurrence = _occurrence('template', template, due_date or generation_date, projected=True)
+        occurrence['generation_date'] = generation_date
+        yield occurrence
+
+        # 生成したものとして次回を求める（インスタンスは保存しない）
+        template.last_generated_at = timezone.make_aware(datetime.combine(generation_date, time(12)))
+        generation_date = template.next_generation_date(generation_date + timedelta(days=1))
+
+
+def forecast_window(start=None, months=12):
+    """開始日と月数から予測期間 (start, end) を返す"""
+    start = start or timezone.localdate()
+    return start, start + relativedelta(months=months) - timedelta(days=1)
+
+
+def _occurrence(source_type, source, value, projected):
+    return {
+        'date': _local_date(value),
+        'source_type': source_type,
+        'source_id': source.id,
+        'title': source.title,
+        'client_id': source.client_id,
+        'projected': projected,
+    }
+
+
+def _local_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
@@ -0,0 +1,84 @@
+import time
+from django.core.management.base import BaseCommand
+from tasks.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'アウトボックスに溜まったWebSocket通知をバックグラウンドで送信するコマンド'
+
+    # 送信済み行を掃除する間隔（秒）
+    purge_interval = 3600
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='送信可能な行を1回だけ処理して終了する'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='1バッチで送信する最大件数（デフォルト: 100）'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='送信待ちがない場合のポーリング間隔（秒、デフォルト: 1）'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=8,
+            help='1件あたりの最大送信試行回数（デフォルト: 8）'
+        )
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=7,
+            help='送信済みの行を保持する日数（デフォルト: 7日）'
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(
+            batch_size=options['batch_size'],
+            max_attempts=options['max_attempts']
+        )
+
+        if options['once']:
+            sent, failed = dispatcher.dispatch_batch()
+            self.stdout.write(f'送信完了: 成功 {sent}件、失敗 {failed}件')
+            return
+
+        self.stdout.write(f'WebSocket通知の送信を開始します（送信先: {dispatcher.base_url}）')
+        last_purged = 0
+        unavailable_streak = 0
+
+        while True:
+            if time.monotonic() - last_purged > self.purge_interval:
+                purged = dispatcher.purge_sent(options['retention_days'])
+                if purged:
+                    self.stdout.write(f'送信済みの通知 {purged}件を削除しました')
+                last_purged = time.monotonic()
+
+            try:
+                sent, failed = dispatcher.dispatch_batch()
+            except Exception as e:
+                self.stderr.write(f'通知の送信中にエラー: {str(e)}')
+                time.sleep(options['interval'])
+                continue
+
+            if sent or failed:
+                self.stdout.write(f'送信: 成功 {sent}件、失敗 {failed}件')
+
+            if dispatcher.server_unavailable:
+                # WebSocketサーバーが落ちている間は指数バックオフで待つ
+                unavailable_streak += 1
+                time.sleep(dispatcher.backoff_seconds(unavailable_streak))
+                continue
+            unavailable_streak = 0
+
+            if sent + failed < dispatcher.batch_size:
+                # 送信待ちが残っていなければ次のポーリングまで待つ
+                time.sleep(options['interval'])
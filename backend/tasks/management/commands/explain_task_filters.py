@@ -0,0 +1,144 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+from rest_framework.request import Request
+from business.models import Business
+from tasks.models import Task, TaskStatus
+from tasks.views import TaskViewSet
+
+
+class Command(BaseCommand):
+    help = 'TaskViewSet のフィルタ組み合わせごとに EXPLAIN を出力し、インデックスが使われているか確認するコマンド'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            help='対象のビジネスID（省略時はタスク数が最も多いビジネス）'
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='EXPLAIN ANALYZE で実際にクエリを実行する（PostgreSQLのみ）'
+        )
+        parser.add_argument(
+            '--only',
+            nargs='*',
+            help='指定したフィルタ名のみ出力する'
+        )
+
+    def handle(self, *args, **options):
+        business = self._get_business(options['business'])
+        user = business.users.first()
+        if not user:
+            raise CommandError(f'ビジネス「{business.name}」にユーザーが存在しません')
+
+        self.stdout.write(f'ビジネス「{business.name}」(ID: {business.id}) のタスク検索プランを確認しています...')
+
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+
+        seq_scan_count = 0
+        combinations = self._get_filter_combinations(business, user)
+        if options['only']:
+            combinations = [c for c in combinations if c[0] in options['only']]
+
+        for name, queryset in combinations:
+            plan = queryset.explain(**explain_options)
+            uses_seq_scan = 'Seq Scan on tasks_task' in plan
+
+            self.stdout.write('')
+            if uses_seq_scan:
+                seq_scan_count += 1
+                self.stdout.write(self.style.WARNING(f'=== {name} (Seq Scan) ==='))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'=== {name} ==='))
+            self.stdout.write(plan)
+
+        self.stdout.write('')
+        if seq_scan_count:
+            self.stdout.write(self.style.WARNING(
+                f'{len(combinations)}件中 {seq_scan_count}件で tasks_task のシーケンシャルスキャンが使われています'
+                '（テーブルが小さい場合はプランナーが意図的に選択することがあります）'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{len(combinations)}件すべてでインデックスが使われています'))
+
+    def _get_business(self, business_id):
+        if business_id:
+            try:
+                return Business.objects.get(id=business_id)
+            except Business.DoesNotExist:
+                raise CommandError(f'ビジネスID {business_id} が見つかりません')
+
+        business_id = Task.objects.values('business').order_by().annotate(
+            task_count=Count('id')
+        ).order_by('-task_count').values_list('business', flat=True).first()
+        if not business_id:
+            raise CommandError('タスクが存在しません')
+        return Business.objects.get(id=business_id)
+
+    def _get_filter_combinations(self, business, user):
+        """TaskViewSet が受け付けるクエリパラメータの組み合わせと、実際のクエリセットを返す"""
+        tasks = Task.objects.filter(business=business)
+
+        def sample(field):
+            value = tasks.exclude(**{f'{field}__isnull': True}).values_list(field, flat=True).first()
+            return str(value) if value is not None else '0'
+
+        status_ids = list(TaskStatus.objects.filter(business=business).values_list('id', flat=True)[:2])
+        now = timezone.now()
+        due_after = (now - timezone.timedelta(days=30)).isoformat()
+        due_before = (now + timezone.timedelta(days=30)).isoformat()
+
+        params_list = [
+            ('default', {}),
+            ('status', {'status': sample('status')}),
+            ('status_multi', {'status': ','.join(str(i) for i in status_ids) or '0'}),
+            ('client', {'client': sample('client')}),
+            ('category', {'category': sample('category')}),
+            ('creator', {'creator': sample('creator')}),
+            ('assignee', {'assignee': sample('assignee')}),
+            ('assignee_none', {'assignee': 'none'}),
+            ('open', {'completed': 'false'}),
+            ('open_assignee_due', {
+                'completed': 'false',
+                'assignee': sample('assignee'),
+                'due_date_before': due_before,
+            }),
+            ('open_due_range', {
+                'completed': 'false',
+                'due_date_after': due_after,
+                'due_date_before': due_before,
+            }),
+            ('priority', {'priority': sample('priority_value')}),
+            ('no_fiscal_year', {'is_fiscal_task': 'false'}),
+        ]
+
+        combinations = [
+            (name, self._build_queryset(user, params))
+            for name, params in params_list
+        ]
+        # テンプレート一覧（TaskTemplateViewSet.get_queryset と同条件）
+        combinations.append(('templates', Task.objects.filter(business=business, is_template=True)))
+        return combinations
+
+    def _build_queryset(self, user, params):
+        """TaskViewSet.get_queryset をそのまま使ってクエリセットを組み立てる"""
+        http_request = HttpRequest()
+        http_request.method = 'GET'
+        http_request.GET = QueryDict(mutable=True)
+        http_request.GET.update(params)
+
+        request = Request(http_request)
+        request.user = user
+
+        view = TaskViewSet()
+        view.request = request
+        view.action = 'list'
+        view.format_kwarg = None
+        view.kwargs = {}
+        return view.filter_queryset(view.get_queryset())
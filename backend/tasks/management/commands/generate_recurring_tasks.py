@@ -1,47 +1,52 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from tasks.models import Task, TaskNotification
+from tasks.models import Task
+from tasks.notifications import NotificationFanout
 from django.db.models import Q
 
 class Command(BaseCommand):
     help = '繰り返しタスクを生成するコマンド'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='1回の書き込みで生成するタスク数（デフォルト: 500）'
+        )
+
     def handle(self, *args, **options):
         """繰り返しタスクの新しいインスタンスを生成する"""
         self.stdout.write('繰り返しタスクの生成を開始しています...')
         
         # 繰り返し設定があり、完了済みで次のタスクがまだ生成されていないタスクを検索
         recurring_tasks = Task.objects.filter(
+            # 未生成、または前回の生成試行から一定時間経過しているもの
+            Q(last_generated_date__isnull=True) | 
+            Q(last_generated_date__lt=timezone.now() - timezone.timedelta(hours=12)),
             is_recurring=True,  # 繰り返しタスク
             completed_at__isnull=False,  # 完了済み
-            # 未完了の子タスクがない、または最後の生成から一定時間経過しているもの
-            Q(last_generated_date__isnull=True) | 
-            Q(last_generated_date__lt=timezone.now() - timezone.timedelta(hours=12))
+            recurring_instances__isnull=True,  # 次のインスタンスが未生成
         ).exclude(
             # リサイクル終了日を過ぎたものは除外
             Q(recurrence_end_date__isnull=False) & Q(recurrence_end_date__lt=timezone.now())
-        )
+        ).order_by('id')
         
         self.stdout.write(f'繰り返し生成対象のタスク数: {recurring_tasks.count()}')
         
-        # 各タスクの次のインスタンスを生成
-        created_count = 0
-        for task in recurring_tasks:
-            try:
-                new_task = task.generate_next_instance()
-                if new_task:
-                    created_count += 1
-                    self.stdout.write(f'タスク生成完了: {new_task.title} (ID: {new_task.id})')
-                    
-                    # タスク割り当ての通知を作成
-                    if new_task.assignee:
-                        TaskNotification.objects.create(
-                            user=new_task.assignee,
-                            task=new_task,
-                            notification_type='assignment',
-                            content=f'新しい繰り返しタスク「{new_task.title}」が割り当てられました。'
-                        )
-            except Exception as e:
-                self.stderr.write(f'タスク「{task.title}」(ID: {task.id})の生成中にエラー: {str(e)}')
+        # 次のインスタンスをまとめて生成
+        generated = Task.generate_next_instances(recurring_tasks, batch_size=options['batch_size'])
+        
+        # タスク割り当ての通知を作成
+        fanout = NotificationFanout()
+        for new_task in generated.values():
+            self.stdout.write(f'タスク生成完了: {new_task.title} (ID: {new_task.id})')
+            fanout.add(
+                new_task,
+                [new_task.assignee_id],
+                'assignment',
+                f'新しい繰り返しタスク「{new_task.title}」が割り当てられました。'
+            )
+        fanout.flush()
                 
-        self.stdout.write(f'繰り返しタスク生成完了: {created_count}件生成')
\ No newline at end of file
+        self.stdout.write(f'繰り返しタスク生成完了: {len(generated)}件生成')
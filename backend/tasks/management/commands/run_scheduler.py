@@ -0,0 +1,113 @@
+import time
+import zlib
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from tasks.scheduler import TaskScheduler
+
+
+class Command(BaseCommand):
+    help = '繰り返しタスク・テンプレートタスクの生成と期限通知を常駐プロセスで実行するスケジューラー'
+
+    # 複数レプリカで起動した場合に1台だけが実行するためのアドバイザリロックのキー
+    lock_key = zlib.crc32(b'sphere.tasks.scheduler')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deadline-interval',
+            type=int,
+            default=3600,
+            help='期限通知チェックの実行間隔（秒、デフォルト: 3600）'
+        )
+        parser.add_argument(
+            '--refresh-interval',
+            type=int,
+            default=60,
+            help='更新された繰り返しタスク・テンプレートを取り込む間隔（秒、デフォルト: 60）'
+        )
+        parser.add_argument(
+            '--analytics-interval',
+            type=int,
+            default=3600,
+            help='日次分析（DailyAnalytics）の事前計算の実行間隔（秒、0で無効、デフォルト: 3600）'
+        )
+        parser.add_argument(
+            '--lock-retry',
+            type=int,
+            default=30,
+            help='他のプロセスがロックを保持している場合の再試行間隔（秒、デフォルト: 30）'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='実行時刻を迎えている項目を1回だけ処理して終了する'
+        )
+
+    def handle(self, *args, **options):
+        self._wait_for_lock(options['lock_retry'])
+
+        try:
+            scheduler = TaskScheduler(
+                deadline_interval=options['deadline_interval'],
+                refresh_interval=options['refresh_interval'],
+                analytics_interval=options['analytics_interval'],
+                stdout=self.stdout
+            )
+            scheduler.load()
+
+            if options['once']:
+                processed = scheduler.run_due()
+                self.stdout.write(f'処理完了: {processed}件')
+                return
+
+            self.stdout.write('スケジューラーを開始しました')
+            while True:
+                scheduler.run_due()
+                self._sleep_until_next(scheduler, options['refresh_interval'])
+                if not self._keep_lock():
+                    self.stdout.write('DB接続の再接続時にロックを失ったため待機に戻ります')
+                    self._wait_for_lock(options['lock_retry'])
+                    # 待機中に他のスケジューラーが処理した分を反映するため読み込み直す
+                    scheduler.load()
+        finally:
+            self._release_lock()
+
+    def _sleep_until_next(self, scheduler, refresh_interval):
+        """次の予定まで待機する（新規・更新分を取り込むため refresh_interval より長くは待たない）"""
+        next_fire_at = scheduler.next_fire_at()
+        wait = refresh_interval
+        if next_fire_at is not None:
+            wait = min(wait, (next_fire_at - timezone.now()).total_seconds())
+        if wait > 0:
+            time.sleep(wait)
+
+    def _wait_for_lock(self, lock_retry):
+        while not self._acquire_lock():
+            self.stdout.write('他のスケジューラーが実行中のため待機しています...')
+            time.sleep(lock_retry)
+
+    def _keep_lock(self):
+        """
+        壊れた・古いDB接続を閉じる。閉じた場合はセッション単位のアドバイザリロックも解放されているため
+        取り直し、他のプロセスに取られていれば False を返す
+        """
+        close_old_connections()
+        if connection.connection is not None or connection.vendor != 'postgresql':
+            return True
+        return self._acquire_lock()
+
+    def _acquire_lock(self):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                'PostgreSQL以外のデータベースではアドバイザリロックを使用できません（単一プロセスで実行してください）'
+            ))
+            return True
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [self.lock_key])
+            return cursor.fetchone()[0]
+
+    def _release_lock(self):
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [self.lock_key])
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_remove_archive_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['business', '-created_at', '-id'], name='tasks_task_biz_created_id_idx'),
+        ),
+    ]
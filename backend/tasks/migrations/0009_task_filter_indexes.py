@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_task_business_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['business', 'status', '-created_at'], name='tasks_task_biz_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['business', 'client', '-created_at'], name='tasks_task_biz_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['business', 'category', '-created_at'], name='tasks_task_biz_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['business', 'creator', '-created_at'], name='tasks_task_biz_creator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['business', 'priority_value'], name='tasks_task_biz_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['business', 'is_template'], name='tasks_task_biz_template_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed_at__isnull', True)), fields=['business', 'assignee', 'due_date'], name='tasks_task_open_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed_at__isnull', True)), fields=['business', 'due_date'], name='tasks_task_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('assignee__isnull', True)), fields=['business', '-created_at'], name='tasks_task_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('fiscal_year__isnull', True)), fields=['business', '-created_at'], name='tasks_task_no_fiscal_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('task_status', 'Task Status Change'), ('task_comment', 'Task Comment')], max_length=50, verbose_name='event type')),
+                ('payload', models.JSONField(default=dict, verbose_name='payload')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='created at')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='available at')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='attempts')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='sent at')),
+                ('failed_at', models.DateTimeField(blank=True, null=True, verbose_name='failed at')),
+                ('last_error', models.TextField(blank=True, verbose_name='last error')),
+            ],
+            options={
+                'verbose_name': 'notification outbox entry',
+                'verbose_name_plural': 'notification outbox entries',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('failed_at__isnull', True), ('sent_at__isnull', True)), fields=['available_at', 'id'], name='tasks_outbox_pending_idx')],
+            },
+        ),
+    ]
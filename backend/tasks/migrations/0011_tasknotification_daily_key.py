@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasknotification',
+            name='notification_date',
+            field=models.DateField(blank=True, null=True, verbose_name='notification date'),
+        ),
+        migrations.AddConstraint(
+            model_name='tasknotification',
+            constraint=models.UniqueConstraint(condition=models.Q(('notification_date__isnull', False)), fields=('task', 'user', 'notification_type', 'notification_date'), name='tasks_notification_daily_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_tasknotification_daily_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_recurring', True)), fields=['updated_at'], name='tasks_task_recurring_upd_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0012_task_recurring_updated_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='event_type',
+            field=models.CharField(choices=[('task_status', 'Task Status Change'), ('task_comment', 'Task Comment'), ('task_notification', 'Task Notification')], max_length=50, verbose_name='event type'),
+        ),
+    ]
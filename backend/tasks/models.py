@@ -1,10 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 import calendar
 from datetime import timedelta
 from dateutil.relativedelta import relativedelta
+from business.business_calendar import next_business_day, nth_business_day
 
 User = get_user_model()
 
@@ -379,6 +380,45 @@ class Task(models.Model):
         verbose_name = _('task')
         verbose_name_plural = _('tasks')
         ordering = ['-created_at']
+        indexes = [
+            # タスク一覧のキーセットページネーション用 (business, created_at, id)
+            models.Index(fields=['business', '-created_at', '-id'], name='tasks_task_biz_created_id_idx'),
+            # TaskViewSet.get_queryset のフィルタ条件に対応する複合インデックス
+            models.Index(fields=['business', 'status', '-created_at'], name='tasks_task_biz_status_idx'),
+            models.Index(fields=['business', 'client', '-created_at'], name='tasks_task_biz_client_idx'),
+            models.Index(fields=['business', 'category', '-created_at'], name='tasks_task_biz_category_idx'),
+            models.Index(fields=['business', 'creator', '-created_at'], name='tasks_task_biz_creator_idx'),
+            models.Index(fields=['business', 'priority_value'], name='tasks_task_biz_priority_idx'),
+            models.Index(fields=['business', 'is_template'], name='tasks_task_biz_template_idx'),
+            # 未完了タスク（completed_at IS NULL）のみを対象とする部分インデックス
+            models.Index(
+                fields=['business', 'assignee', 'due_date'],
+                condition=models.Q(completed_at__isnull=True),
+                name='tasks_task_open_assignee_idx'
+            ),
+            models.Index(
+                fields=['business', 'due_date'],
+                condition=models.Q(completed_at__isnull=True),
+                name='tasks_task_open_due_idx'
+            ),
+            # 担当者未設定（assignee=none）・決算期なし（is_fiscal_task=false）のフィルタ用
+            models.Index(
+                fields=['business', '-created_at'],
+                condition=models.Q(assignee__isnull=True),
+                name='tasks_task_unassigned_idx'
+            ),
+            models.Index(
+                fields=['business', '-created_at'],
+                condition=models.Q(fiscal_year__isnull=True),
+                name='tasks_task_no_fiscal_idx'
+            ),
+            # スケジューラーが更新された繰り返しタスクだけを差分で読み込むためのインデックス
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(is_recurring=True),
+                name='tasks_task_recurring_upd_idx'
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -405,6 +445,10 @@ class Task(models.Model):
             # 既存のタスクの場合、ステータス変更を検出
             try:
                 old_task = Task.objects.get(pk=self.pk)
+                # 繰り返し予測（tasks.forecast）のキャッシュ無効化判定に使う
+                self._forecast_changed = any(
+                    getattr(old_task, field) != getattr(self, field) for field in self.FORECAST_FIELDS
+                )
                 if self.status and (not old_task.status or old_task.status.id != self.status.id):
                     self._update_assignee_based_on_status()
                     
@@ -471,75 +515,110 @@ class Task(models.Model):
         """
         繰り返しタスクの次回インスタンスを生成する
         """
-        print(f"[DEBUG] generate_next_instance called for task {self.id} ({self.title})")
-        print(f"[DEBUG] is_recurring: {self.is_recurring}, recurrence_pattern: {self.recurrence_pattern}, completed_at: {self.completed_at}")
-        
-        if not self.is_recurring or not self.recurrence_pattern or self.completed_at is None:
-            print(f"[DEBUG] Task {self.id} cannot generate next instance: recurring={self.is_recurring}, pattern={self.recurrence_pattern}, completed_at={self.completed_at}")
-            return None
-            
-        # 繰り返し終了日をチェック
-        if self.recurrence_end_date and timezone.now() > self.recurrence_end_date:
-            print(f"[DEBUG] Task {self.id} cannot generate next instance: recurrence_end_date {self.recurrence_end_date} is in the past")
-            return None
-            
-        # 次回の日付を計算
-        if self.due_date:
-            next_due_date = self._calculate_next_date(self.due_date)
-            print(f"[DEBUG] Task {self.id} calculated next_due_date: {next_due_date} from current due_date: {self.due_date}")
-        else:
-            next_due_date = None
-            print(f"[DEBUG] Task {self.id} has no due_date, next_due_date will be None")
-            
-        if self.start_date:
-            next_start_date = self._calculate_next_date(self.start_date)
-            print(f"[DEBUG] Task {self.id} calculated next_start_date: {next_start_date} from current start_date: {self.start_date}")
-        else:
-            next_start_date = None
-            print(f"[DEBUG] Task {self.id} has no start_date, next_start_date will be None")
-            
-        # 新しいタスクインスタンスを作成
-        default_status = TaskStatus.objects.filter(business=self.business, name='未着手').first()
-        print(f"[DEBUG] Task {self.id} found default_status: {default_status.id if default_status else None}")
-        
         try:
-            # 既存タスクのコピーを作成
-            new_task = Task.objects.create(
-                title=self.title,
-                description=self.description,
-                business=self.business,
-                workspace=self.workspace,
-                status=default_status,
-                due_date=next_due_date,
-                start_date=next_start_date,
-                estimated_hours=self.estimated_hours,
-                client=self.client,
-                fiscal_year=self.fiscal_year,
-                is_recurring=self.is_recurring,
-                recurrence_pattern=self.recurrence_pattern,
-                recurrence_end_date=self.recurrence_end_date,
-                weekday=self.weekday,
-                weekdays=self.weekdays,
-                monthday=self.monthday,
-                business_day=self.business_day,
-                parent_task=self,
-                recurrence_frequency=self.recurrence_frequency
-            )
-            
-            print(f"[DEBUG] Task {self.id} successfully created next recurring task: {new_task.id}")
-            
-            # 最終生成日を更新
-            self.last_generated_date = timezone.now()
-            self.save(update_fields=['last_generated_date'])
-            print(f"[DEBUG] Task {self.id} updated last_generated_date to {self.last_generated_date}")
-            
-            return new_task
+            return Task.generate_next_instances([self]).get(self.id)
         except Exception as e:
             print(f"[ERROR] Failed to create next recurring task for {self.id}: {str(e)}")
-            import traceback
-            traceback.print_exc()
             return None
     
+    # 変更されると繰り返しの発生予定（tasks.forecast）が変わるフィールド
+    FORECAST_FIELDS = (
+        'is_recurring', 'recurrence_pattern', 'recurrence_end_date', 'recurrence_frequency',
+        'weekday', 'weekdays', 'monthday', 'business_day', 'consider_holidays',
+        'yearly_month', 'yearly_day', 'due_date', 'start_date', 'completed_at', 'title', 'client_id',
+    )
+    
+    # 次回インスタンスにコピーするフィールド
+    RECURRENCE_COPY_FIELDS = (
+        'title', 'description', 'business_id', 'workspace_id', 'estimated_hours',
+        'client_id', 'fiscal_year_id', 'is_recurring', 'recurrence_pattern',
+        'recurrence_end_date', 'weekday', 'weekdays', 'monthday', 'business_day',
+        'recurrence_frequency',
+    )
+    
+    @classmethod
+    def generate_next_instances(cls, tasks, batch_size=500):
+        """
+        完了済みの繰り返しタスク（クエリセットまたはリスト）の次回インスタンスをまとめて生成する
+        
+        次回の日付はメモリ上で計算し、チャンクごとに bulk_create 1回と
+        last_generated_date の bulk_update 1回で書き込む。
+        戻り値は {元タスクID: 生成したタスク} の辞書
+        """
+        if isinstance(tasks, models.QuerySet):
+            tasks = tasks.iterator(chunk_size=batch_size)
+        
+        # ビジネスごとの既定ステータス（未着手）とデフォルトワークスペース
+        default_statuses = {}
+        default_workspaces = {}
+        generated = {}
+        
+        chunk = []
+        for task in tasks:
+            chunk.append(task)
+            if len(chunk) >= batch_size:
+                generated.update(cls._generate_next_chunk(chunk, default_statuses, default_workspaces))
+                chunk = []
+        if chunk:
+            generated.update(cls._generate_next_chunk(chunk, default_statuses, default_workspaces))
+        return generated
+    
+    @classmethod
+    def _generate_next_chunk(cls, tasks, default_statuses, default_workspaces):
+        now = timezone.now()
+        sources = [
+            task for task in tasks
+            if task.is_recurring and task.recurrence_pattern and task.completed_at is not None
+            # 繰り返し終了日を過ぎたものは生成しない
+            and not (task.recurrence_end_date and now > task.recurrence_end_date)
+        ]
+        if not sources:
+            return {}
+        
+        # 未取得のビジネスだけをまとめて読み込む（最初に見つかったものを使用）
+        missing = {task.business_id for task in sources} - default_statuses.keys()
+        if missing:
+            default_statuses.update(dict.fromkeys(missing))
+            for status in TaskStatus.objects.filter(business_id__in=missing, name='未着手'):
+                if default_statuses[status.business_id] is None:
+                    default_statuses[status.business_id] = status
+        
+        missing = {task.business_id for task in sources if not task.workspace_id} - default_workspaces.keys()
+        if missing:
+            from business.models import Workspace
+            default_workspaces.update(dict.fromkeys(missing))
+            for workspace in Workspace.objects.filter(business_id__in=missing).order_by('id'):
+                if default_workspaces[workspace.business_id] is None:
+                    default_workspaces[workspace.business_id] = workspace.id
+        
+        new_tasks = []
+        for task in sources:
+            new_task = Task(
+                status=default_statuses[task.business_id],
+                due_date=task._calculate_next_date(task.due_date),
+                start_date=task._calculate_next_date(task.start_date),
+                parent_task=task,
+                **{field: getattr(task, field) for field in cls.RECURRENCE_COPY_FIELDS}
+            )
+            if not new_task.workspace_id:
+                new_task.workspace_id = default_workspaces[task.business_id]
+            # save() と同様にステータスに応じた担当者を設定
+            new_task._update_assignee_based_on_status()
+            new_tasks.append(new_task)
+        
+        with transaction.atomic():
+            cls.objects.bulk_create(new_tasks)
+            for task in sources:
+                task.last_generated_date = now
+            cls.objects.bulk_update(sources, ['last_generated_date'])
+        
+        # bulk_create はシグナルを発火しないため、予測キャッシュをここで無効化する
+        from .forecast import invalidate_forecast
+        for business_id in {task.business_id for task in sources}:
+            invalidate_forecast(business_id)
+        
+        return {task.id: new_task for task, new_task in zip(sources, new_tasks)}
+    
     def _calculate_next_date(self, date):
         """
         指定された日付から次の繰り返し日を計算する
@@ -607,38 +686,19 @@ class Task(models.Model):
             
             # 月次の場合、日指定または営業日指定を考慮
             if self.business_day is not None:
-                # 営業日指定の場合
-                # 次の月初日を計算
+                # 営業日指定の場合（土日・祝日・ビジネスの休業日を除いた n 番目の営業日）
                 next_month_start = date.replace(day=1) + relativedelta(months=frequency)
-                
-                # 次の月の指定営業日を計算
-                business_day_target = self.business_day
                 consider_holidays = getattr(self, 'consider_holidays', True)
                 
-                # 営業日カウンター
-                business_day_count = 0
-                current_date = next_month_start
-                
-                # 月内の各日をチェック
-                while current_date.month == next_month_start.month:
-                    # 週末でない場合
-                    if current_date.weekday() < 5:  # 0=月曜、4=金曜
-                        # 祝日判定（ここではスタブ）
-                        is_holiday = False
-                        if consider_holidays:
-                            # 実際には祝日判定ロジックが必要
-                            # TODO: 祝日チェックを実装
-                            pass
-                            
-                        if not is_holiday:
-                            business_day_count += 1
-                            
-                            # 目標の営業日に達したら
-                            if business_day_count == business_day_target:
-                                return current_date
-                    
-                    # 次の日に進む
-                    current_date += timedelta(days=1)
+                target = nth_business_day(
+                    next_month_start.year,
+                    next_month_start.month,
+                    self.business_day,
+                    business_id=self.business_id,
+                    consider_holidays=consider_holidays
+                )
+                if target:
+                    return next_month_start.replace(day=target.day)
                     
                 # 指定営業日が月内に存在しない場合は月末を返す
                 return next_month_start + relativedelta(day=31)
@@ -1042,8 +1102,15 @@ class TaskSchedule(models.Model):
         
     def calculate_deadline_date(self, creation_date=None, reference_date=None, fiscal_year=None):
         """
-        作成日または基準日から期限日を計算する
+        作成日または基準日から期限日を計算する（休業日に当たる場合は翌営業日）
         """
+        deadline = self._calculate_raw_deadline_date(creation_date, reference_date, fiscal_year)
+        if deadline is None:
+            return None
+        return next_business_day(deadline, business_id=self.business_id)
+    
+    def _calculate_raw_deadline_date(self, creation_date=None, reference_date=None, fiscal_year=None):
+        """スケジュール設定どおりの期限日（営業日補正前）"""
         from datetime import datetime, timedelta
         from dateutil.relativedelta import relativedelta
         
@@ -1233,11 +1300,62 @@ class TaskNotification(models.Model):
     content = models.TextField(_('content'))
     created_at = models.DateTimeField(_('created at'), auto_now_add=True)
     read = models.BooleanField(_('read'), default=False)
+    # 期限通知など、1日1回だけ作成する通知の対象日（冪等キーの一部）
+    notification_date = models.DateField(_('notification date'), null=True, blank=True)
     
     class Meta:
         verbose_name = _('task notification')
         verbose_name_plural = _('task notifications')
         ordering = ['-created_at']
+        constraints = [
+            # 同じタスク・ユーザー・タイプの通知は1日1件まで（再実行しても重複しない）
+            models.UniqueConstraint(
+                fields=['task', 'user', 'notification_type', 'notification_date'],
+                condition=models.Q(notification_date__isnull=False),
+                name='tasks_notification_daily_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.notification_type} notification for {self.user.get_full_name()}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    WebSocketサーバーへの送信待ち通知（トランザクショナル・アウトボックス）
+    
+    リクエスト処理中は同一トランザクションで行を書き込むだけにし、
+    実際の送信は dispatch_websocket_outbox コマンドがバックグラウンドで行う。
+    """
+    
+    EVENT_TYPES = (
+        ('task_status', _('Task Status Change')),
+        ('task_comment', _('Task Comment')),
+        ('task_notification', _('Task Notification')),
+    )
+    
+    event_type = models.CharField(_('event type'), max_length=50, choices=EVENT_TYPES)
+    payload = models.JSONField(_('payload'), default=dict)
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    # 次回送信を試みてよい時刻（バックオフで後ろにずらす）
+    available_at = models.DateTimeField(_('available at'), default=timezone.now)
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+    sent_at = models.DateTimeField(_('sent at'), null=True, blank=True)
+    # 再試行の上限に達した、または再試行しても成功しないエラーで諦めた時刻
+    failed_at = models.DateTimeField(_('failed at'), null=True, blank=True)
+    last_error = models.TextField(_('last error'), blank=True)
+    
+    class Meta:
+        verbose_name = _('notification outbox entry')
+        verbose_name_plural = _('notification outbox entries')
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                condition=models.Q(sent_at__isnull=True, failed_at__isnull=True),
+                name='tasks_outbox_pending_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} outbox entry #{self.id}"
@@ -0,0 +1,104 @@
+from django.db.models.signals import post_save
+
+from .models import TaskNotification
+from .outbox import enqueue_websocket_event
+
+
+class NotificationFanout:
+    """
+    タスク通知の一括作成
+
+    受信者をメモリ上で集約・重複排除し、TaskNotification を bulk_create でまとめて書き込む。
+    同じタスク・同じユーザー・同じ通知タイプの組み合わせは最初に追加したものだけが作成される。
+    """
+
+    def __init__(self):
+        self._notifications = {}
+
+    def add(self, task, recipients, notification_type, content, exclude=None, notification_date=None):
+        """
+        recipients の各ユーザー（User またはユーザーID）に通知を追加する。
+        None や exclude に含まれるユーザー、既に追加済みのユーザーはスキップする。
+        notification_date を指定すると (タスク, ユーザー, タイプ, 日付) の一意制約の対象になる
+        """
+        excluded_ids = {_user_id(user) for user in (exclude or ()) if user is not None}
+        for user in recipients:
+            if user is None:
+                continue
+            user_id = _user_id(user)
+            if user_id in excluded_ids:
+                continue
+            key = (task.id, user_id, notification_type)
+            if key in self._notifications:
+                continue
+            notification = TaskNotification(
+                task=task,
+                notification_type=notification_type,
+                content=content,
+                notification_date=notification_date
+            )
+            if isinstance(user, int):
+                notification.user_id = user
+            else:
+                notification.user = user
+            self._notifications[key] = notification
+
+    def __len__(self):
+        return len(self._notifications)
+
+    def flush(self, batch_size=500, ignore_conflicts=False):
+        """
+        集約した通知を書き込み、作成した通知のリストを返す。
+        ignore_conflicts=True の場合は一意制約に当たる行を黙ってスキップする
+        （主キーが取得できないため post_save は送らない）
+        """
+        notifications = list(self._notifications.values())
+        self._notifications = {}
+        if not notifications:
+            return []
+
+        created = TaskNotification.objects.bulk_create(
+            notifications, batch_size=batch_size, ignore_conflicts=ignore_conflicts
+        )
+        if ignore_conflicts:
+            # 一意制約でスキップされた行と区別できないため、WebSocket への配信は行わない
+            return created
+
+        # bulk_create は post_save を発火しないため、チャット連携などの受信側のために明示的に送る
+        for notification in created:
+            post_save.send(
+                sender=TaskNotification,
+                instance=notification,
+                created=True,
+                update_fields=None,
+                raw=False,
+                using=notification._state.db
+            )
+
+        # 受信者のソケット（user_{id} ルーム）にだけ届くよう、まとめて1行でアウトボックスに書き込む
+        enqueue_websocket_event('task_notification', {
+            'notifications': [
+                {
+                    'id': notification.id,
+                    'user_id': notification.user_id,
+                    'task_id': notification.task_id,
+                    'task_title': notification.task.title,
+                    'notification_type': notification.notification_type,
+                    'content': notification.content,
+                    'created_at': notification.created_at.isoformat() if notification.created_at else None,
+                }
+                for notification in created
+            ]
+        })
+        return created
+
+
+def notify(task, recipients, notification_type, content, exclude=None):
+    """1件のイベントについて通知を一括作成するショートカット"""
+    fanout = NotificationFanout()
+    fanout.add(task, recipients, notification_type, content, exclude=exclude)
+    return fanout.flush()
+
+
+def _user_id(user):
+    return user if isinstance(user, int) else user.id
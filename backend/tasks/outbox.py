@@ -0,0 +1,142 @@
+import logging
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+# イベント種別ごとの WebSocket サーバー側エンドポイント
+EVENT_ENDPOINTS = {
+    'task_status': '/api/notify_task_status',
+    'task_comment': '/api/notify_task_comment',
+    'task_notification': '/api/notify_users',
+}
+
+# WebSocket サーバーが送信元を確認するためのヘッダー
+NOTIFY_SECRET_HEADER = 'X-Notify-Secret'
+
+
+def enqueue_websocket_event(event_type, payload):
+    """
+    WebSocket通知をアウトボックスに書き込む。
+    呼び出し元のトランザクションと一緒にコミット・ロールバックされる。
+    """
+    return NotificationOutbox.objects.create(event_type=event_type, payload=payload)
+
+
+def build_session(pool_size=10):
+    """コネクションを使い回すための HTTP セッションを作成する"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class OutboxDispatcher:
+    """アウトボックスの未送信行をまとめて取り出し、WebSocketサーバーへ送信する"""
+
+    def __init__(self, session=None, base_url=None, secret=None, batch_size=100, max_attempts=8,
+                 timeout=2, base_backoff=1, max_backoff=300):
+        self.session = session or build_session()
+        self.base_url = (base_url or settings.WEBSOCKET_NOTIFY_URL).rstrip('/')
+        # WebSocket サーバーの通知受付エンドポイントに送る共有シークレット
+        self.secret = settings.WEBSOCKET_NOTIFY_SECRET if secret is None else secret
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # 直前のバッチで WebSocket サーバーに接続できなかったかどうか
+        self.server_unavailable = False
+
+    def backoff_seconds(self, attempts):
+        """試行回数に応じた指数バックオフ（秒）"""
+        return min(self.base_backoff * (2 ** max(attempts - 1, 0)), self.max_backoff)
+
+    def dispatch_batch(self):
+        """
+        送信可能な行を最大 batch_size 件送信する。
+        複数プロセスで動かしても同じ行を二重送信しないよう SKIP LOCKED で行ロックを取る。
+        戻り値は (送信成功件数, 失敗件数)
+        """
+        self.server_unavailable = False
+        sent_count = 0
+        failed_count = 0
+
+        with transaction.atomic():
+            entries = list(
+                NotificationOutbox.objects.select_for_update(skip_locked=True).filter(
+                    sent_at__isnull=True,
+                    failed_at__isnull=True,
+                    available_at__lte=timezone.now()
+                ).order_by('available_at', 'id')[:self.batch_size]
+            )
+
+            processed = []
+            for entry in entries:
+                try:
+                    self._send(entry)
+                    entry.sent_at = timezone.now()
+                    entry.last_error = ''
+                    sent_count += 1
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    # サーバーに届かない場合は残りの行も失敗するため、このバッチはここで打ち切る
+                    self._schedule_retry(entry, e)
+                    failed_count += 1
+                    processed.append(entry)
+                    self.server_unavailable = True
+                    break
+                except requests.HTTPError as e:
+                    if e.response is not None and 400 <= e.response.status_code < 500:
+                        # クライアントエラーは再送しても成功しないため破棄する
+                        self._mark_failed(entry, e)
+                    else:
+                        self._schedule_retry(entry, e)
+                    failed_count += 1
+                except requests.RequestException as e:
+                    self._schedule_retry(entry, e)
+                    failed_count += 1
+                processed.append(entry)
+
+            if processed:
+                NotificationOutbox.objects.bulk_update(
+                    processed,
+                    ['sent_at', 'failed_at', 'attempts', 'available_at', 'last_error']
+                )
+
+        return sent_count, failed_count
+
+    def purge_sent(self, older_than_days=7):
+        """送信済みの古い行を削除する"""
+        threshold = timezone.now() - timedelta(days=older_than_days)
+        deleted, _ = NotificationOutbox.objects.filter(sent_at__lt=threshold).delete()
+        return deleted
+
+    def _send(self, entry):
+        url = f'{self.base_url}{EVENT_ENDPOINTS[entry.event_type]}'
+        headers = {NOTIFY_SECRET_HEADER: self.secret} if self.secret else {}
+        response = self.session.post(url, json=entry.payload, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+
+    def _schedule_retry(self, entry, error):
+        entry.attempts += 1
+        entry.last_error = str(error)[:1000]
+        if entry.attempts >= self.max_attempts:
+            entry.failed_at = timezone.now()
+            logger.error(f"Outbox entry {entry.id} gave up after {entry.attempts} attempts: {error}")
+        else:
+            entry.available_at = timezone.now() + timedelta(seconds=self.backoff_seconds(entry.attempts))
+            logger.warning(f"Outbox entry {entry.id} failed (attempt {entry.attempts}), retrying: {error}")
+
+    def _mark_failed(self, entry, error):
+        entry.attempts += 1
+        entry.last_error = str(error)[:1000]
+        entry.failed_at = timezone.now()
+        logger.error(f"Outbox entry {entry.id} rejected by websocket server: {error}")
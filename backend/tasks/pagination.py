@@ -0,0 +1,144 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TaskPagination(PageNumberPagination):
+    """
+    タスク一覧用のページネーション
+
+    - 既定: 従来通りのページ番号方式（count / next / previous / results）
+    - ?count=false: COUNT(*) を省略し、page_size + 1 件だけ取得して次ページの有無を判定する
+    - ?pagination=keyset または ?cursor=...: (business, created_at, id) のキーセット方式。
+      OFFSET を使わないため、どれだけ深くスクロールしても1ページの取得コストが一定になる。
+      並び順は -created_at 固定のため、それ以外の ?ordering= は 400 で拒否する
+    """
+
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    # キーセット方式の並び順（tasks_task_biz_created_id_idx と一致させる）
+    keyset_ordering = ('-created_at', '-id')
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = self._get_mode(request)
+
+        if self.mode == 'keyset':
+            return self._paginate_keyset(queryset, request)
+        if self.mode == 'nocount':
+            return self._paginate_without_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.mode == 'page':
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('next', self.next_link),
+            ('previous', self.previous_link),
+            ('results', data),
+        ]))
+
+    def _get_mode(self, request):
+        params = request.query_params
+        if params.get(self.cursor_query_param) or params.get(self.mode_query_param) == 'keyset':
+            return 'keyset'
+        if params.get(self.count_query_param, '').lower() == 'false':
+            return 'nocount'
+        return 'page'
+
+    # --- キーセット方式 -------------------------------------------------
+
+    def _paginate_keyset(self, queryset, request):
+        self._check_keyset_ordering(request)
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.keyset_ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            created_at, pk = self._decode_cursor(encoded)
+            # (created_at, id) < (cursor.created_at, cursor.id) を降順インデックスで辿る
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+
+        self.next_link = None
+        if has_next:
+            last = rows[-1]
+            self.next_link = replace_query_param(
+                self.request.build_absolute_uri(),
+                self.cursor_query_param,
+                self._encode_cursor(last.created_at, last.pk)
+            )
+        # 無限スクロール用途のため、キーセット方式は前方向のみ
+        self.previous_link = None
+        return rows
+
+    def _check_keyset_ordering(self, request):
+        """キーセット方式と異なる並び順が指定された場合は黙って無視せずエラーにする"""
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM, '')
+        fields = tuple(field.strip() for field in ordering.split(',') if field.strip())
+        if fields and fields != self.keyset_ordering[:len(fields)]:
+            raise ValidationError({
+                api_settings.ORDERING_PARAM: 'Keyset pagination only supports ordering=-created_at'
+            })
+
+    def _encode_cursor(self, created_at, pk):
+        payload = json.dumps([created_at.isoformat(), pk]).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+    def _decode_cursor(self, encoded):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    # --- 件数を数えないページ番号方式 ----------------------------------
+
+    def _paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        try:
+            page_number = _positive_int(request.query_params.get(self.page_query_param, 1), strict=True)
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param), message='Invalid page.'
+            ))
+
+        offset = (page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        has_next = len(rows) > page_size
+
+        url = self.request.build_absolute_uri()
+        self.next_link = replace_query_param(url, self.page_query_param, page_number + 1) if has_next else None
+        if page_number == 1:
+            self.previous_link = None
+        elif page_number == 2:
+            self.previous_link = remove_query_param(url, self.page_query_param)
+        else:
+            self.previous_link = replace_query_param(url, self.page_query_param, page_number - 1)
+        return rows[:page_size]
@@ -0,0 +1,229 @@
+import heapq
+import itertools
+import logging
+from datetime import datetime, time, timedelta
+
+from django.core.management import call_command
+from django.db.models import Q
+from django.utils import timezone
+
+from clients.models import ClientTaskTemplate
+from .models import Task
+from .notifications import NotificationFanout
+
+logger = logging.getLogger(__name__)
+
+# 次のインスタンスの生成に失敗した繰り返しタスクを再試行するまでの間隔
+RECURRING_RETRY_INTERVAL = timedelta(hours=12)
+
+
+class TaskScheduler:
+    """
+    繰り返しタスク・テンプレートタスク・期限通知の実行予定を優先度付きキュー（ヒープ）で管理する
+
+    起動時に一度だけ全件から次回実行時刻を計算し、以降は実行した項目の次回時刻だけを再計算する。
+    新規・変更された項目は updated_at を使った差分読み込みで取り込む。
+    """
+
+    def __init__(self, deadline_interval=3600, refresh_interval=60, analytics_interval=3600, stdout=None):
+        self.deadline_interval = timedelta(seconds=deadline_interval)
+        # 0 の場合は日次分析の事前計算を行わない
+        self.analytics_interval = timedelta(seconds=analytics_interval) if analytics_interval else None
+        self.refresh_interval = timedelta(seconds=refresh_interval)
+        self.stdout = stdout
+        self._heap = []
+        # (種別, ID) -> 現在有効な実行時刻。ヒープ内の古いエントリを読み飛ばすために使う
+        self._scheduled = {}
+        self._counter = itertools.count()
+        self._last_refreshed = None
+
+    # --- キュー操作 -----------------------------------------------------
+
+    def schedule(self, kind, obj_id, fire_at):
+        """項目の実行時刻を登録・更新する。fire_at が None なら予定を取り消す"""
+        key = (kind, obj_id)
+        if fire_at is None:
+            self._scheduled.pop(key, None)
+            return
+        self._scheduled[key] = fire_at
+        heapq.heappush(self._heap, (fire_at, next(self._counter), kind, obj_id))
+
+    def next_fire_at(self):
+        """次に実行する項目の時刻（予定がなければ None）"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """now までに実行時刻を迎えた項目を取り出す"""
+        due = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, kind, obj_id = heapq.heappop(self._heap)
+            del self._scheduled[(kind, obj_id)]
+            due.append((kind, obj_id))
+
+    def __len__(self):
+        return len(self._scheduled)
+
+    def _discard_stale(self):
+        while self._heap:
+            fire_at, _, kind, obj_id = self._heap[0]
+            if self._scheduled.get((kind, obj_id)) == fire_at:
+                return
+            heapq.heappop(self._heap)
+
+    # --- 読み込み -------------------------------------------------------
+
+    def load(self, now=None):
+        """全項目の次回実行時刻を計算してキューを作り直す"""
+        now = now or timezone.now()
+        self._heap = []
+        self._scheduled = {}
+
+        for task in self._recurring_tasks():
+            self.schedule('recurring', task.id, self.recurring_fire_at(task, now))
+        for template in self._templates():
+            self.schedule('template', template.id, self.template_fire_at(template, now))
+
+        self.schedule('deadlines', None, now)
+        if self.analytics_interval:
+            self.schedule('analytics', None, now)
+        # 決算期の切り替えなど updated_at に現れない変化を拾うため、日付が変わったら作り直す
+        self.schedule('reload', None, self._start_of_day(timezone.localdate(now) + timedelta(days=1)))
+        self._last_refreshed = now
+        self._log(f'{len(self)}件の予定を読み込みました')
+
+    def refresh(self, now=None):
+        """前回の読み込み以降に更新された繰り返しタスク・テンプレートだけを再計算する"""
+        now = now or timezone.now()
+        since = self._last_refreshed
+
+        for task in self._recurring_tasks(Q(updated_at__gte=since)):
+            self.schedule('recurring', task.id, self.recurring_fire_at(task, now))
+        for template in self._templates(Q(updated_at__gte=since)):
+            self.schedule('template', template.id, self.template_fire_at(template, now))
+        # 失敗した場合は次回も同じ時刻以降の更新分を読み直す
+        self._last_refreshed = now
+
+    def _recurring_tasks(self, extra=Q()):
+        """次のインスタンスがまだ生成されていない完了済み繰り返しタスク"""
+        return Task.objects.filter(
+            extra, is_recurring=True, completed_at__isnull=False, recurring_instances__isnull=True
+        ).exclude(recurrence_pattern__isnull=True).exclude(recurrence_pattern='')
+
+    def _templates(self, extra=Q()):
+        return ClientTaskTemplate.objects.filter(
+            extra, is_active=True, schedule__isnull=False
+        ).select_related('schedule', 'client')
+
+    # --- 次回実行時刻の計算 ---------------------------------------------
+
+    def recurring_fire_at(self, task, now):
+        """完了済み繰り返しタスクから次のインスタンスを生成する時刻"""
+        if not task.is_recurring or not task.recurrence_pattern or task.completed_at is None:
+            return None
+        if task.recurrence_end_date:
+            if task.recurrence_end_date < now:
+                return None
+            # 次回の期限日が繰り返し終了日を過ぎる場合は生成しない
+            next_due_date = task._calculate_next_date(task.due_date)
+            if next_due_date and next_due_date > task.recurrence_end_date:
+                return None
+        return task.completed_at
+
+    def template_fire_at(self, template, now):
+        """テンプレートから次にタスクを生成する日（その日の0時）"""
+        generation_date = template.next_generation_date(timezone.localdate(now))
+        if generation_date is None:
+            return None
+        return self._start_of_day(generation_date)
+
+    def _start_of_day(self, day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    # --- 実行 -----------------------------------------------------------
+
+    def run_due(self, now=None):
+        """実行時刻を迎えた項目を処理し、次回の予定を登録する。処理した件数を返す"""
+        now = now or timezone.now()
+        if self._last_refreshed and now - self._last_refreshed >= self.refresh_interval:
+            try:
+                self.refresh(now)
+            except Exception as e:
+                # DB の再起動などの一時的なエラーでデーモンを止めず、次のループで再試行する
+                logger.exception(f'Scheduler refresh failed: {e}')
+                self._log(f'予定の再読み込み中にエラー: {str(e)}')
+
+        due = self.pop_due(now)
+        fanout = NotificationFanout()
+        recurring_ids = [obj_id for kind, obj_id in due if kind == 'recurring']
+        if recurring_ids:
+            try:
+                self._run_recurring(recurring_ids, now, fanout)
+            except Exception as e:
+                logger.exception(f'Scheduled recurring generation failed: {e}')
+                self._log(f'繰り返しタスクの生成中にエラー: {str(e)}')
+                for task_id in recurring_ids:
+                    self.schedule('recurring', task_id, now + RECURRING_RETRY_INTERVAL)
+
+        for kind, obj_id in due:
+            try:
+                if kind == 'template':
+                    self._run_template(obj_id, now)
+                elif kind == 'deadlines':
+                    call_command('check_task_deadlines', stdout=self.stdout)
+                    self.schedule('deadlines', None, now + self.deadline_interval)
+                elif kind == 'analytics':
+                    # 日付をまたいで停止したタイマーも反映するため前日分から再計算する
+                    call_command('precompute_daily_analytics', days=1, stdout=self.stdout)
+                    self.schedule('analytics', None, now + self.analytics_interval)
+                elif kind == 'reload':
+                    self.load(now)
+            except Exception as e:
+                logger.exception(f'Scheduled job {kind}:{obj_id} failed: {e}')
+                self._log(f'{kind}:{obj_id} の実行中にエラー: {str(e)}')
+        try:
+            fanout.flush()
+        except Exception as e:
+            logger.exception(f'Scheduled notification flush failed: {e}')
+            self._log(f'通知の作成中にエラー: {str(e)}')
+        return len(due)
+
+    def _run_recurring(self, task_ids, now, fanout):
+        """実行時刻を迎えた繰り返しタスクの次回インスタンスをまとめて生成する"""
+        # 完了取り消しや change_status 側での生成済みなど、対象外になったものはここで除かれる
+        tasks = list(self._recurring_tasks().filter(id__in=task_ids))
+        generated = Task.generate_next_instances(tasks)
+        for task in tasks:
+            new_task = generated.get(task.id)
+            if not new_task:
+                # 繰り返し終了日を過ぎたものは予定から外し、それ以外は時間をおいて再試行する
+                if self.recurring_fire_at(task, now) is not None:
+                    self.schedule('recurring', task.id, now + RECURRING_RETRY_INTERVAL)
+                continue
+            self._log(f'繰り返しタスク生成: {new_task.title} (ID: {new_task.id})')
+            fanout.add(
+                new_task,
+                [new_task.assignee_id],
+                'assignment',
+                f'新しい繰り返しタスク「{new_task.title}」が割り当てられました。'
+            )
+
+    def _run_template(self, template_id, now):
+        template = self._templates().filter(id=template_id).first()
+        if not template:
+            return
+        today = timezone.localdate(now)
+        if template.should_generate_on(today):
+            new_task = template.generate_task()
+            if new_task:
+                self._log(f'テンプレートからタスク生成: {new_task.title} (ID: {new_task.id})')
+        # 当日分は処理済みなので翌日以降の予定を登録する
+        next_date = template.next_generation_date(today + timedelta(days=1))
+        self.schedule('template', template.id, self._start_of_day(next_date) if next_date else None)
+
+    def _log(self, message):
+        if self.stdout:
+            self.stdout.write(message)
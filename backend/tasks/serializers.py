@@ -106,23 +106,16 @@ class TaskCommentSerializer(serializers.ModelSerializer):
             ).filter(
                 # 複数の名前パターンを試す
                 Q(first_name__icontains=mention) | 
-                Q(last_name__icontains=mention) |
-                Q(username__icontains=mention)
+                Q(last_name__icontains=mention)
             ).distinct()
             
-            # マッチしたユーザーにメンション関連付けと通知作成
-            for mentioned_user in mentioned_users:
+            # マッチしたユーザーにメンション関連付け
+            # （メンション通知は TaskCommentViewSet.perform_create でまとめて作成する）
+            comment.mentioned_users.add(*[
+                mentioned_user for mentioned_user in mentioned_users
                 # 同じユーザーは除外
-                if mentioned_user.id != comment.user.id:
-                    comment.mentioned_users.add(mentioned_user)
-                    
-                    # 通知作成
-                    TaskNotification.objects.create(
-                        user=mentioned_user,
-                        task=comment.task,
-                        notification_type='mention',
-                        content=f'{comment.user.get_full_name()}さんがタスク「{comment.task.title}」のコメントであなたをメンションしました。'
-                    )
+                if mentioned_user.id != comment.user.id
+            ])
 
 
 class TaskTimerSerializer(serializers.ModelSerializer):
@@ -170,6 +163,14 @@ class TaskSerializer(serializers.ModelSerializer):
     worker_data = serializers.SerializerMethodField()
     reviewer_data = serializers.SerializerMethodField()
     
+    # 一覧・詳細で参照するリレーション（行ごとの追加クエリを避けるため JOIN で取得する）
+    select_related_fields = (
+        'status', 'category', 'client', 'fiscal_year',
+        'creator', 'assignee', 'worker', 'reviewer', 'approver',
+    )
+    # 一覧表示で ?defer= により読み込みを省略できる重いカラム
+    deferrable_fields = ('description',)
+    
     class Meta:
         model = Task
         fields = [
@@ -188,6 +189,21 @@ class TaskSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('business', 'creator', 'created_at', 'updated_at')
     
+    @classmethod
+    def setup_eager_loading(cls, queryset, deferred_fields=()):
+        """シリアライズに必要なリレーションをまとめて取得するロードプロファイルを適用する"""
+        queryset = queryset.select_related(*cls.select_related_fields)
+        if deferred_fields:
+            queryset = queryset.defer(*deferred_fields)
+        return queryset
+    
+    def get_fields(self):
+        """ビューが遅延読み込みしたカラムは出力しない"""
+        fields = super().get_fields()
+        for field_name in self.context.get('deferred_fields', ()):
+            fields.pop(field_name, None)
+        return fields
+    
     def get_status_data(self, obj):
         """ステータス情報を一貫した形式で返す"""
         if obj.status:
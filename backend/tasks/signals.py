@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from business.models import Business
+from business.models import Business, BusinessClosure
+from clients.models import ClientTaskTemplate, FiscalYear, TaskTemplateSchedule
+from .forecast import invalidate_forecast
 from .models import TaskCategory, TaskStatus, Task
 
 
@@ -17,4 +19,38 @@ def create_default_task_metadata(sender, instance, created, **kwargs):
         TaskStatus.create_defaults(instance)
         
         # テンプレートは setup_templates コマンドで作成されるため、
-        # ここでは基本的なタスクメタデータの作成のみを行う
\ No newline at end of file
+        # ここでは基本的なタスクメタデータの作成のみを行う
+
+
+@receiver(post_save, sender=Task)
+def invalidate_forecast_on_task_save(sender, instance, created, **kwargs):
+    """繰り返し設定が追加・変更されたタスクのビジネスの予測キャッシュを無効化する"""
+    if (created and instance.is_recurring) or getattr(instance, '_forecast_changed', False):
+        invalidate_forecast(instance.business_id)
+
+
+@receiver(post_delete, sender=Task)
+def invalidate_forecast_on_task_delete(sender, instance, **kwargs):
+    if instance.is_recurring:
+        invalidate_forecast(instance.business_id)
+
+
+@receiver(post_save, sender=ClientTaskTemplate)
+@receiver(post_delete, sender=ClientTaskTemplate)
+def invalidate_forecast_on_template_change(sender, instance, **kwargs):
+    invalidate_forecast(instance.client.business_id)
+
+
+@receiver(post_save, sender=FiscalYear)
+@receiver(post_delete, sender=FiscalYear)
+def invalidate_forecast_on_fiscal_year_change(sender, instance, **kwargs):
+    invalidate_forecast(instance.client.business_id)
+
+
+@receiver(post_save, sender=TaskTemplateSchedule)
+@receiver(post_delete, sender=TaskTemplateSchedule)
+@receiver(post_save, sender=BusinessClosure)
+@receiver(post_delete, sender=BusinessClosure)
+def invalidate_forecast_on_calendar_change(sender, instance, **kwargs):
+    """スケジュール設定・休業日の変更（営業日指定の繰り返しに影響）"""
+    invalidate_forecast(instance.business_id)
@@ -1,3 +1,511 @@
+from datetime import date, datetime
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from business.models import Business
+from clients.models import Client, ClientTaskTemplate, FiscalYear, TaskTemplateSchedule
+from users.models import User
+from .models import NotificationOutbox, Task, TaskCategory, TaskNotification, TaskStatus
+from .outbox import OutboxDispatcher
+from .scheduler import TaskScheduler
+from .views import TaskCommentViewSet, TaskViewSet
+
+
+class TaskViewSetLoadProfileTests(TestCase):
+    """TaskViewSet の一覧・詳細がリレーションを JOIN で取得することを確認する"""
+
+    task_count = 500
+    # 認証・ページング無しでの一覧取得は 1 クエリに収まる想定（多少の余裕を持たせる）
+    max_list_queries = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Load Profile Business')
+        cls.user = User.objects.create_user(
+            email='owner@example.com', password='password', first_name='Owner',
+            business=cls.business
+        )
+        members = [
+            User.objects.create_user(
+                email=f'member{i}@example.com', password='password', first_name=f'Member{i}',
+                business=cls.business
+            )
+            for i in range(3)
+        ]
+        status = TaskStatus.objects.filter(business=cls.business).first() or TaskStatus.objects.create(
+            business=cls.business, name='未着手'
+        )
+        category = TaskCategory.objects.create(business=cls.business, name='一般')
+        client = Client.objects.create(business=cls.business, client_code='LP-001', name='Client')
+        fiscal_year = FiscalYear.objects.create(
+            client=client, fiscal_period=1, start_date='2024-04-01', end_date='2025-03-31'
+        )
+        workspace = cls.business.workspaces.first()
+        Task.objects.bulk_create([
+            Task(
+                title=f'Task {i}',
+                description='x' * 2000,
+                business=cls.business,
+                workspace=workspace,
+                status=status,
+                category=category,
+                client=client,
+                fiscal_year=fiscal_year,
+                creator=cls.user,
+                assignee=members[0],
+                worker=members[0],
+                reviewer=members[1],
+                approver=members[2],
+            )
+            for i in range(cls.task_count)
+        ])
+
+    def _list(self, **params):
+        request = APIRequestFactory().get('/api/tasks/', params)
+        force_authenticate(request, user=self.user)
+        view = TaskViewSet.as_view({'get': 'list'}, pagination_class=None)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+            response.render()
+        return response, queries
+
+    def test_list_query_count_is_constant(self):
+        response, queries = self._list()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), self.task_count)
+        self.assertLessEqual(len(queries), self.max_list_queries)
+
+        row = response.data[0]
+        self.assertEqual(row['status_data']['name'], '未着手')
+        self.assertEqual(row['category_name'], '一般')
+        self.assertEqual(row['client_data']['client_code'], 'LP-001')
+        self.assertEqual(row['fiscal_period'], 1)
+        self.assertEqual(row['reviewer_name'], 'Member1')
+        self.assertEqual(row['approver_name'], 'Member2')
+
+    def test_list_includes_description_by_default(self):
+        response, queries = self._list()
+
+        self.assertEqual(response.data[0]['description'], 'x' * 2000)
+        self.assertLessEqual(len(queries), self.max_list_queries)
+
+    def test_list_can_defer_description(self):
+        response, queries = self._list(defer='description')
+
+        self.assertNotIn('description', response.data[0])
+        self.assertNotIn('"tasks_task"."description"', queries.captured_queries[-1]['sql'])
+
+    def test_list_rejects_unknown_deferred_field(self):
+        response, _ = self._list(defer='title')
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_retrieve_includes_description(self):
+        task = Task.objects.first()
+        request = APIRequestFactory().get(f'/api/tasks/{task.id}/')
+        force_authenticate(request, user=self.user)
+        view = TaskViewSet.as_view({'get': 'retrieve'})
+        response = view(request, pk=task.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['description'], 'x' * 2000)
+
+
+class TaskPaginationTests(TestCase):
+    """キーセット方式と件数省略方式のページネーションを確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Pagination Business')
+        cls.user = User.objects.create_user(
+            email='pager@example.com', password='password', business=cls.business
+        )
+        Task.objects.bulk_create([
+            Task(title=f'Task {i}', business=cls.business, workspace=cls.business.workspaces.first())
+            for i in range(25)
+        ])
+
+    def _list(self, **params):
+        request = APIRequestFactory().get('/api/tasks/', params)
+        force_authenticate(request, user=self.user)
+        return TaskViewSet.as_view({'get': 'list'})(request)
+
+    def test_keyset_walks_every_task_once(self):
+        seen = []
+        params = {'pagination': 'keyset'}
+        while True:
+            response = self._list(**params)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            params = {'cursor': parse_qs(urlparse(response.data['next']).query)['cursor'][0]}
+
+        expected = list(Task.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_returns_404(self):
+        self.assertEqual(self._list(cursor='not-a-cursor').status_code, 404)
+
+    def test_keyset_rejects_other_ordering(self):
+        self.assertEqual(self._list(pagination='keyset', ordering='due_date').status_code, 400)
+        self.assertEqual(self._list(pagination='keyset', ordering='-created_at').status_code, 200)
+
+    def test_count_can_be_omitted(self):
+        response = self._list(count='false', page=3)
+
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+
+class NotificationOutboxTests(TestCase):
+    """ステータス変更の通知がアウトボックス経由で送信されることを確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Outbox Business')
+        cls.user = User.objects.create_user(
+            email='outbox@example.com', password='password', business=cls.business
+        )
+        cls.task = Task.objects.create(
+            title='Outbox Task', business=cls.business, workspace=cls.business.workspaces.first(),
+            creator=cls.user
+        )
+        cls.status, _ = TaskStatus.objects.get_or_create(business=cls.business, name='作業中')
+
+    def _change_status(self):
+        request = APIRequestFactory().post(
+            f'/api/tasks/{self.task.id}/change-status/', {'status_id': self.status.id}, format='json'
+        )
+        force_authenticate(request, user=self.user)
+        return TaskViewSet.as_view({'post': 'change_status'})(request, pk=self.task.id)
+
+    def _dispatcher(self, side_effect=None):
+        session = mock.Mock()
+        session.post.return_value.raise_for_status.side_effect = side_effect
+        return OutboxDispatcher(session=session, base_url='http://ws.test', secret='s3cret'), session
+
+    def test_change_status_enqueues_without_http_call(self):
+        with mock.patch('requests.post') as post:
+            response = self._change_status()
+
+        self.assertEqual(response.status_code, 200)
+        post.assert_not_called()
+        entry = NotificationOutbox.objects.get(event_type='task_status')
+        self.assertEqual(entry.payload['new_status'], '作業中')
+        # 受信者宛ての通知も同じトランザクションで1行にまとめて書き込まれる
+        entry = NotificationOutbox.objects.get(event_type='task_notification')
+        self.assertEqual([n['user_id'] for n in entry.payload['notifications']], [self.user.id])
+
+    def test_dispatch_marks_sent(self):
+        self._change_status()
+        dispatcher, session = self._dispatcher()
+
+        self.assertEqual(dispatcher.dispatch_batch(), (2, 0))
+        self.assertEqual(
+            [call[0][0] for call in session.post.call_args_list],
+            ['http://ws.test/api/notify_users', 'http://ws.test/api/notify_task_status']
+        )
+        self.assertEqual(session.post.call_args.kwargs['headers'], {'X-Notify-Secret': 's3cret'})
+        self.assertFalse(NotificationOutbox.objects.filter(sent_at__isnull=True).exists())
+
+    def test_dispatch_backs_off_when_server_is_down(self):
+        self._change_status()
+        dispatcher, session = self._dispatcher()
+        session.post.side_effect = requests.ConnectionError('down')
+
+        self.assertEqual(dispatcher.dispatch_batch(), (0, 1))
+        self.assertTrue(dispatcher.server_unavailable)
+        # 最初の行で打ち切るため、残りの行は試行されない
+        self.assertEqual(
+            list(NotificationOutbox.objects.order_by('id').values_list('sent_at', 'attempts')), [(None, 1), (None, 0)]
+        )
+        # バックオフ中の行は再送されず、まだ試行していない行だけが送信される
+        self.assertEqual(dispatcher.dispatch_batch(), (0, 1))
+        self.assertEqual(
+            list(NotificationOutbox.objects.order_by('id').values_list('attempts', flat=True)), [1, 1]
+        )
+        self.assertEqual(dispatcher.dispatch_batch(), (0, 0))
+
+
+class NotificationFanoutTests(TestCase):
+    """コメント通知が受信者ごとに1回だけ、1回の INSERT で作成されることを確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Fanout Business')
+        cls.actor = User.objects.create_user(
+            email='actor@example.com', password='password', first_name='Actor', business=cls.business
+        )
+        cls.creator = User.objects.create_user(
+            email='creator@example.com', password='password', first_name='Creator', business=cls.business
+        )
+        cls.mentioned = User.objects.create_user(
+            email='mentioned@example.com', password='password', first_name='Mentioned', business=cls.business
+        )
+        cls.task = Task.objects.create(
+            title='Fanout Task', business=cls.business, workspace=cls.business.workspaces.first(),
+            creator=cls.creator, assignee=cls.mentioned, worker=cls.actor, reviewer=cls.creator
+        )
+
+    def test_comment_notifies_each_recipient_once(self):
+        request = APIRequestFactory().post(
+            '/api/tasks/comments/', {'task': self.task.id, 'content': 'ご確認ください @Mentioned'}, format='json'
+        )
+        force_authenticate(request, user=self.actor)
+        with CaptureQueriesContext(connection) as queries:
+            response = TaskCommentViewSet.as_view({'post': 'create'})(request)
+
+        self.assertEqual(response.status_code, 201)
+        notifications = dict(TaskNotification.objects.values_list('user_id', 'notification_type'))
+        self.assertEqual(notifications, {self.mentioned.id: 'mention', self.creator.id: 'comment'})
+        inserts = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('INSERT INTO "tasks_tasknotification"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+
+class CheckTaskDeadlinesTests(TestCase):
+    """期限通知コマンドが役割ごとに通知し、再実行しても重複しないことを確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Deadline Business')
+        cls.assignee, cls.reviewer, cls.approver = [
+            User.objects.create_user(
+                email=f'deadline{i}@example.com', password='password', business=cls.business
+            )
+            for i in range(3)
+        ]
+        workspace = cls.business.workspaces.first()
+        now = timezone.now()
+        cls.overdue = Task.objects.create(
+            title='Overdue', business=cls.business, workspace=workspace, due_date=now - timezone.timedelta(days=1),
+            assignee=cls.assignee, worker=cls.assignee, reviewer=cls.reviewer, approver=cls.approver
+        )
+        cls.due_soon = Task.objects.create(
+            title='Due soon', business=cls.business, workspace=workspace, due_date=now + timezone.timedelta(days=1),
+            assignee=cls.assignee, reviewer=cls.reviewer, approver=cls.approver
+        )
+        Task.objects.create(
+            title='Later', business=cls.business, workspace=workspace, due_date=now + timezone.timedelta(days=10),
+            assignee=cls.assignee
+        )
+
+    def _run(self):
+        call_command('check_task_deadlines', business=self.business.id, batch_size=1, stdout=StringIO())
+
+    def test_notifies_each_role_once_per_day(self):
+        self._run()
+        self._run()
+
+        notifications = set(TaskNotification.objects.values_list('task_id', 'user_id', 'notification_type'))
+        self.assertEqual(notifications, {
+            (self.overdue.id, self.assignee.id, 'overdue'),
+            (self.overdue.id, self.reviewer.id, 'overdue'),
+            (self.overdue.id, self.approver.id, 'overdue'),
+            (self.due_soon.id, self.assignee.id, 'due_soon'),
+            (self.due_soon.id, self.reviewer.id, 'due_soon'),
+        })
+        self.assertEqual(TaskNotification.objects.count(), 5)
+
+
+class TaskSchedulerTests(TestCase):
+    """スケジューラーが実行時刻順に処理し、生成済みの項目を再実行しないことを確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Scheduler Business')
+        cls.user = User.objects.create_user(
+            email='scheduler@example.com', password='password', business=cls.business
+        )
+        cls.client_obj = Client.objects.create(business=cls.business, client_code='SC-001', name='Client')
+        cls.schedule = TaskTemplateSchedule.objects.create(
+            business=cls.business, name='月初', schedule_type='monthly_start', recurrence='monthly'
+        )
+
+    def test_queue_pops_in_fire_order_and_skips_rescheduled(self):
+        scheduler = TaskScheduler()
+        now = timezone.now()
+        scheduler.schedule('template', 1, now + timezone.timedelta(minutes=5))
+        scheduler.schedule('template', 2, now - timezone.timedelta(minutes=5))
+        scheduler.schedule('recurring', 3, now - timezone.timedelta(minutes=10))
+        # 予定を後ろにずらした項目は古い時刻では取り出されない
+        scheduler.schedule('template', 2, now + timezone.timedelta(hours=1))
+
+        self.assertEqual(scheduler.pop_due(now), [('recurring', 3)])
+        self.assertEqual(scheduler.next_fire_at(), now + timezone.timedelta(minutes=5))
+
+    def test_template_next_generation_date(self):
+        template_task = Task.objects.create(
+            title='月次処理', business=self.business, workspace=self.business.workspaces.first(), is_template=True
+        )
+        template = ClientTaskTemplate.objects.create(
+            client=self.client_obj, title='月次処理', schedule=self.schedule, template_task=template_task
+        )
+        self.assertEqual(template.next_generation_date(date(2024, 5, 2)), date(2024, 6, 1))
+
+        template.last_generated_at = timezone.make_aware(datetime(2024, 6, 1, 9, 0))
+        self.assertEqual(template.next_generation_date(date(2024, 6, 1)), date(2024, 7, 1))
+
+    def test_recurring_task_generated_once(self):
+        Task.objects.create(
+            title='Weekly', business=self.business, workspace=self.business.workspaces.first(),
+            is_recurring=True, recurrence_pattern='weekly',
+            due_date=timezone.now(), completed_at=timezone.now() - timezone.timedelta(minutes=1)
+        )
+        scheduler = TaskScheduler(stdout=StringIO())
+        scheduler.load()
+        scheduler.run_due()
+        scheduler.refresh(timezone.now() + timezone.timedelta(seconds=1))
+        scheduler.run_due()
+
+        self.assertEqual(Task.objects.filter(title='Weekly').count(), 2)
+        self.assertEqual(len(scheduler), 3)  # 期限通知チェック・日次分析の事前計算・日次の再読み込みのみ
+
+    def test_refresh_error_does_not_stop_run_due(self):
+        scheduler = TaskScheduler(stdout=StringIO())
+        scheduler.load()
+        last_refreshed = scheduler._last_refreshed
+        later = timezone.now() + scheduler.refresh_interval
+
+        with mock.patch.object(scheduler, '_recurring_tasks', side_effect=OperationalError('server closed')):
+            scheduler.run_due(later)
+
+        # 読み込めなかった期間は次回の refresh で読み直す
+        self.assertEqual(scheduler._last_refreshed, last_refreshed)
+        scheduler.run_due(later)
+        self.assertEqual(scheduler._last_refreshed, later)
+
+    def test_command_reacquires_lock_after_reconnect(self):
+        class Stop(Exception):
+            pass
+
+        command = 'tasks.management.commands.run_scheduler'
+        scheduler = mock.Mock()
+        scheduler.next_fire_at.return_value = None
+        # 再接続でロックを失い、他のプロセスが保持している間は待機してから取り直す
+        acquire = mock.Mock(side_effect=[True, False, False, True])
+        sleeps = mock.Mock(side_effect=[None, None, Stop])
+        db = mock.MagicMock(vendor='postgresql', connection=None)
+
+        with mock.patch(f'{command}.TaskScheduler', return_value=scheduler), \
+                mock.patch(f'{command}.Command._acquire_lock', acquire), \
+                mock.patch(f'{command}.close_old_connections') as close_old_connections, \
+                mock.patch(f'{command}.connection', db), \
+                mock.patch(f'{command}.time.sleep', sleeps), \
+                self.assertRaises(Stop):
+            call_command('run_scheduler', stdout=StringIO())
+
+        self.assertEqual(acquire.call_count, 4)
+        self.assertEqual(close_old_connections.call_count, 1)
+        self.assertEqual(scheduler.load.call_count, 2)
+        self.assertEqual(scheduler.run_due.call_count, 2)
+
+
+class RecurringGenerationTests(TestCase):
+    """繰り返しタスクの次回インスタンスがチャンク単位でまとめて生成されることを確認する"""
+
+    task_count = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.due_date = timezone.make_aware(datetime(2024, 4, 10, 9, 0))
+        for name in ('Recurring A', 'Recurring B'):
+            business = Business.objects.create(name=name)
+            Task.objects.bulk_create([
+                Task(
+                    title=f'{name} {i}', business=business, workspace=business.workspaces.first(),
+                    is_recurring=True, recurrence_pattern='monthly', monthday=10,
+                    due_date=cls.due_date, completed_at=cls.due_date
+                )
+                for i in range(cls.task_count // 2)
+            ])
+
+    def test_command_generates_in_batches_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command('generate_recurring_tasks', batch_size=10, stdout=StringIO())
+
+        new_tasks = Task.objects.filter(parent_task__isnull=False).select_related('status')
+        self.assertEqual(new_tasks.count(), self.task_count)
+        self.assertTrue(all(task.due_date == self.due_date.replace(month=5) for task in new_tasks))
+        self.assertTrue(all(task.status.name == '未着手' for task in new_tasks))
+        self.assertFalse(Task.objects.filter(parent_task__isnull=True, last_generated_date__isnull=True).exists())
+        # タスク数に比例せず、チャンク数（3）に比例したクエリ数に収まる
+        self.assertLess(len(queries), 30)
+
+        call_command('generate_recurring_tasks', stdout=StringIO())
+        self.assertEqual(Task.objects.filter(parent_task__isnull=False).count(), self.task_count)
+
+
+class TaskForecastTests(TestCase):
+    """繰り返しタスク・テンプレートの発生予定の展開とキャッシュ無効化を確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Forecast Business')
+        cls.user = User.objects.create_user(
+            email='forecast@example.com', password='password', business=cls.business
+        )
+        cls.task = Task.objects.create(
+            title='Monthly report', business=cls.business, workspace=cls.business.workspaces.first(),
+            is_recurring=True, recurrence_pattern='monthly', monthday=20,
+            due_date=timezone.make_aware(datetime(2024, 4, 20, 9, 0))
+        )
+        client = Client.objects.create(business=cls.business, client_code='FC-001', name='Client')
+        schedule = TaskTemplateSchedule.objects.create(
+            business=cls.business, name='月初', schedule_type='monthly_start', recurrence='quarterly'
+        )
+        template_task = Task.objects.create(
+            title='Quarterly', business=cls.business, workspace=cls.business.workspaces.first(), is_template=True
+        )
+        ClientTaskTemplate.objects.create(
+            client=client, title='Quarterly', schedule=schedule, template_task=template_task
+        )
+
+    def _forecast(self, **params):
+        request = APIRequestFactory().get('/api/tasks/forecast/', params)
+        force_authenticate(request, user=self.user)
+        return TaskViewSet.as_view({'get': 'forecast'})(request)
+
+    def test_expands_tasks_and_templates_in_date_order(self):
+        response = self._forecast(start='2024-04-01', months=6)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        task_dates = [o['date'] for o in results if o['source_type'] == 'task']
+        self.assertEqual(task_dates, [date(2024, month, 20) for month in range(4, 10)])
+        # 既存の未完了タスク自体は projected=False、それ以降は予定
+        self.assertEqual(
+            [o['projected'] for o in results if o['source_type'] == 'task'], [False] + [True] * 5
+        )
+        # 四半期ごとのテンプレートは4月・7月に生成され、期限は5日（休日なら翌営業日）
+        template_dates = [o['generation_date'] for o in results if o['source_type'] == 'template']
+        self.assertEqual(template_dates, [date(2024, 4, 1), date(2024, 7, 1)])
+        self.assertEqual([o['date'] for o in results], sorted(o['date'] for o in results))
+
+    def test_cache_is_invalidated_when_recurrence_changes(self):
+        self._forecast(start='2024-04-01', months=3)
+        with CaptureQueriesContext(connection) as queries:
+            self._forecast(start='2024-04-01', months=3)
+        self.assertLessEqual(len(queries), 2)  # 認証ユーザーのビジネス参照程度
 
-# Create your tests here.
+        self.task.monthday = 25
+        self.task.save()
+        response = self._forecast(start='2024-04-01', months=3)
+        self.assertIn(date(2024, 5, 25), [o['date'] for o in response.data['results']])
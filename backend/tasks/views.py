@@ -1,7 +1,10 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
+from datetime import datetime
 from .models import (
     Task, TaskCategory, TaskStatus, TaskComment, 
     TaskAttachment, TaskTimer, TaskHistory, TaskNotification,
@@ -13,6 +16,10 @@ from .serializers import (
     TaskTimerSerializer, TaskHistorySerializer, TaskNotificationSerializer,
     TaskTemplateSerializer, TaskScheduleSerializer, TemplateChildTaskSerializer
 )
+from .pagination import TaskPagination
+from .outbox import enqueue_websocket_event
+from .notifications import NotificationFanout, notify
+from .forecast import forecast_window, get_forecast
 from business.permissions import IsSameBusiness
 from django.db.models import Q
 from rest_framework.filters import SearchFilter, OrderingFilter
@@ -21,6 +28,7 @@ class TaskViewSet(viewsets.ModelViewSet):
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsSameBusiness]
+    pagination_class = TaskPagination
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'due_date', 'start_date', 'completed_at', 'updated_at']
@@ -87,9 +95,33 @@ class TaskViewSet(viewsets.ModelViewSet):
             instance.completed_at = timezone.now()
             instance.save()
     
+    def get_deferred_fields(self):
+        """
+        一覧表示で ?defer=description のように指定された重いカラムを読み込まない。
+        指定がなければ従来通り全カラムを返す（一覧の行をそのまま編集に使うクライアントのため）。
+        """
+        if self.action != 'list':
+            return ()
+        requested = [name.strip() for name in self.request.query_params.get('defer', '').split(',') if name.strip()]
+        deferrable = self.get_serializer_class().deferrable_fields
+        invalid = [name for name in requested if name not in deferrable]
+        if invalid:
+            raise ValidationError({'defer': f'Cannot defer: {", ".join(invalid)} (allowed: {", ".join(deferrable)})'})
+        return tuple(requested)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['deferred_fields'] = self.get_deferred_fields()
+        return context
+    
     def get_queryset(self):
-        # スーパークラスのクエリセットを取得
-        queryset = super().get_queryset()
+        # スーパークラスのクエリセットを取得（ビジネス単位に限定し、複合インデックスを使えるようにする）
+        queryset = super().get_queryset().filter(business=self.request.user.business)
+        
+        # シリアライザが参照するリレーションをJOINで取得（ロードプロファイル）
+        queryset = self.get_serializer_class().setup_eager_loading(
+            queryset, self.get_deferred_fields()
+        )
         
         # フィルタリング処理
         # ここでURLから取得したクエリパラメータでフィルタリングします
@@ -334,6 +366,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         return Response(response_data)
         
     @action(detail=True, methods=['post'], url_path='change-status')
+    @transaction.atomic
     def change_status(self, request, pk=None):
         """タスクのステータスを変更するエンドポイント"""
         task = self.get_object()
@@ -381,77 +414,45 @@ class TaskViewSet(viewsets.ModelViewSet):
                     print(f"[DEBUG] Task {task.id} is not recurring or has no pattern - recurring: {task.is_recurring}, pattern: {task.recurrence_pattern}")
                 
                 # 通知作成（ステータス変更）
-                TaskNotification.objects.create(
-                    user=task.assignee if task.assignee else task.creator,
-                    task=task,
-                    notification_type='status_change',
-                    content=f'タスク「{task.title}」のステータスが「{old_status.name if old_status else "未設定"}」から「{new_status.name}」に変更されました。'
+                notify(
+                    task,
+                    [task.assignee or task.creator],
+                    'status_change',
+                    f'タスク「{task.title}」のステータスが「{old_status.name if old_status else "未設定"}」から「{new_status.name}」に変更されました。'
                 )
                 
-                # WebSocketでステータス変更を通知
-                try:
-                    import requests
-                    import json
-                    
-                    # FastAPIサーバーのエンドポイント
-                    websocket_url = "http://websocket:8001/api/notify_task_status"
-                    
-                    # 通知データを作成
-                    notification_data = {
-                        "type": "status_change",
-                        "task_id": task.id,
-                        "task_title": task.title,
-                        "old_status": old_status.name if old_status else "未設定",
-                        "new_status": new_status.name,
-                        "user_name": request.user.get_full_name() or request.user.username
-                    }
-                    
-                    # FastAPIサーバーに通知を送信
-                    requests.post(
-                        websocket_url,
-                        json=notification_data,
-                        timeout=2
-                    )
-                except Exception as e:
-                    print(f"WebSocket通知の送信に失敗しました: {str(e)}")
-                
-                return Response(response_data)
-            
-            # 完了ステータス以外への変更の場合
-            # 通知作成（ステータス変更）
-            TaskNotification.objects.create(
-                user=task.assignee if task.assignee else task.creator,
-                task=task,
-                notification_type='status_change',
-                content=f'タスク「{task.title}」のステータスが「{old_status.name if old_status else "未設定"}」から「{new_status.name}」に変更されました。'
-            )
-            
-            # WebSocketでステータス変更を通知
-            try:
-                import requests
-                import json
-                
-                # FastAPIサーバーのエンドポイント
-                websocket_url = "http://websocket:8001/api/notify_task_status"
-                
-                # 通知データを作成
-                notification_data = {
+                # WebSocketでステータス変更を通知（アウトボックス経由で非同期に送信）
+                enqueue_websocket_event('task_status', {
                     "type": "status_change",
                     "task_id": task.id,
                     "task_title": task.title,
                     "old_status": old_status.name if old_status else "未設定",
                     "new_status": new_status.name,
+                    "user_id": request.user.id,
                     "user_name": request.user.get_full_name() or request.user.username
-                }
+                })
                 
-                # FastAPIサーバーに通知を送信
-                requests.post(
-                    websocket_url,
-                    json=notification_data,
-                    timeout=2
-                )
-            except Exception as e:
-                print(f"WebSocket通知の送信に失敗しました: {str(e)}")
+                return Response(response_data)
+            
+            # 完了ステータス以外への変更の場合
+            # 通知作成（ステータス変更）
+            notify(
+                task,
+                [task.assignee or task.creator],
+                'status_change',
+                f'タスク「{task.title}」のステータスが「{old_status.name if old_status else "未設定"}」から「{new_status.name}」に変更されました。'
+            )
+            
+            # WebSocketでステータス変更を通知（アウトボックス経由で非同期に送信）
+            enqueue_websocket_event('task_status', {
+                "type": "status_change",
+                "task_id": task.id,
+                "task_title": task.title,
+                "old_status": old_status.name if old_status else "未設定",
+                "new_status": new_status.name,
+                "user_id": request.user.id,
+                "user_name": request.user.get_full_name() or request.user.username
+            })
             
             serializer = self.get_serializer(task)
             return Response(serializer.data)
@@ -551,6 +552,37 @@ class TaskViewSet(viewsets.ModelViewSet):
         
         return Response(next_dates)
 
+    
+    @action(detail=False, methods=['get'], url_path='forecast')
+    def forecast(self, request):
+        """
+        ビジネスの全繰り返しタスク・テンプレートを期間内の発生予定に展開するエンドポイント
+        ?start=YYYY-MM-DD（省略時は今日）&months=12（最大24）
+        """
+        start = request.query_params.get('start')
+        try:
+            start = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+            months = int(request.query_params.get('months', 12))
+        except ValueError:
+            return Response(
+                {"detail": "start は YYYY-MM-DD、months は整数で指定してください"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= months <= 24:
+            return Response(
+                {"detail": "months は1〜24で指定してください"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        start, end = forecast_window(start, months)
+        occurrences = get_forecast(request.user.business_id, start, end)
+        return Response({
+            "start": start,
+            "end": end,
+            "count": len(occurrences),
+            "results": occurrences,
+        })
+
 
 class TaskCategoryViewSet(viewsets.ModelViewSet):
     queryset = TaskCategory.objects.all()
@@ -598,98 +630,58 @@ class TaskCommentViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    @transaction.atomic
     def perform_create(self, serializer):
         """コメント作成と通知処理"""
         # コメント作成
         comment = serializer.save(user=self.request.user)
         task = comment.task
         
+        actor = self.request.user
+        fanout = NotificationFanout()
+        
         # ステータス変更通知の処理
-        current_status = task.status
         if 'status_change' in comment.content.lower():
             # コメント内容にステータス変更の記述があれば通知
-            TaskNotification.objects.create(
-                user=task.assignee or task.creator,
-                task=task,
-                notification_type='status_change',
-                content=f'{self.request.user.get_full_name()}さんがタスク「{task.title}」のステータスを変更しました。'
+            fanout.add(
+                task,
+                [task.assignee or task.creator],
+                'status_change',
+                f'{actor.get_full_name()}さんがタスク「{task.title}」のステータスを変更しました。'
             )
         
-        # コメント通知を作成
-        # コメントした人以外のタスク関係者に通知
-        recipients = set()
-        
-        # タスク作成者
-        if task.creator and task.creator != self.request.user:
-            recipients.add(task.creator)
-            
-        # 現在の担当者
-        if task.assignee and task.assignee != self.request.user:
-            recipients.add(task.assignee)
-            
-        # 作業者
-        if task.worker and task.worker != self.request.user:
-            recipients.add(task.worker)
-            
-        # レビュアー
-        if task.reviewer and task.reviewer != self.request.user:
-            recipients.add(task.reviewer)
-        
-        # メンションされたユーザーを追加
-        if comment.mentioned_users.exists():
-            for mentioned_user in comment.mentioned_users.all():
-                if mentioned_user != self.request.user:
-                    recipients.add(mentioned_user)
-        
-        # それぞれに通知を作成
-        for recipient in recipients:
-            # 通知タイプとメッセージを判断
-            notification_type = 'comment'
-            content = f'{self.request.user.get_full_name()}さんがタスク「{task.title}」にコメントしました。'
-            
-            # メンションされたユーザーには特別な通知を作成
-            if comment.mentioned_users.filter(id=recipient.id).exists():
-                notification_type = 'mention'
-                content = f'{self.request.user.get_full_name()}さんがタスク「{task.title}」のコメントであなたをメンションしました。'
-            
-            TaskNotification.objects.create(
-                user=recipient,
-                task=task,
-                notification_type=notification_type,
-                content=content
-            )
+        # メンションされたユーザーには特別な通知を作成
+        mentioned_users = list(comment.mentioned_users.all())
+        fanout.add(
+            task,
+            mentioned_users,
+            'mention',
+            f'{actor.get_full_name()}さんがタスク「{task.title}」のコメントであなたをメンションしました。',
+            exclude=[actor]
+        )
         
-        # コメント作成をWebSocketに通知
-        try:
-            import requests
-            import json
-            from django.conf import settings
-            
-            # FastAPIサーバーのエンドポイント
-            # 環境変数から取得するか、settings.pyに設定しておくのが理想的だが、
-            # 今回は直接指定する簡易実装
-            websocket_url = "http://websocket:8001/api/notify_task_comment"
-            
-            # 通知データを作成
-            notification_data = {
-                "type": "comment",
-                "task_id": task.id,
-                "task_title": task.title,
-                "comment_id": comment.id,
-                "user_name": self.request.user.get_full_name() or self.request.user.username,
-                "content": comment.content,
-                "created_at": comment.created_at.isoformat(),
-                "mentioned_user_ids": [user.id for user in comment.mentioned_users.all()]
-            }
-            
-            # FastAPIサーバーに通知を送信
-            requests.post(
-                websocket_url,
-                json=notification_data,
-                timeout=2  # タイムアウト設定
-            )
-        except Exception as e:
-            print(f"WebSocket通知の送信に失敗しました: {str(e)}")
+        # コメントした人・メンション済みの人以外のタスク関係者（作成者・担当者・作業者・レビュアー）に通知
+        fanout.add(
+            task,
+            [task.creator, task.assignee, task.worker, task.reviewer],
+            'comment',
+            f'{actor.get_full_name()}さんがタスク「{task.title}」にコメントしました。',
+            exclude=[actor] + mentioned_users
+        )
+        fanout.flush()
+        
+        # コメント作成をWebSocketに通知（アウトボックス経由で非同期に送信）
+        enqueue_websocket_event('task_comment', {
+            "type": "comment",
+            "task_id": task.id,
+            "task_title": task.title,
+            "comment_id": comment.id,
+            "user_id": self.request.user.id,
+            "user_name": self.request.user.get_full_name() or self.request.user.username,
+            "content": comment.content,
+            "created_at": comment.created_at.isoformat(),
+            "mentioned_user_ids": [user.id for user in mentioned_users]
+        })
         
         return comment
         
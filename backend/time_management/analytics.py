@@ -0,0 +1,238 @@
+"""
+Daily analytics computation.
+
+Works on plain rows (see ``entry_rows``) so a day's entries can be fetched
+in one query and reduced in memory. The hourly histogram is computed with a
+sweep over interval endpoints instead of one query per hour.
+``precompute_daily_analytics`` applies the same computation to every user
+and day of a date range in one streamed pass.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Break, DailyAnalytics, TimeEntry
+
+HOUR = timedelta(hours=1)
+
+ENTRY_FIELDS = {
+    'task_title': F('task__title'),
+    'task_status': F('task__status__name'),
+    'task_completed_at': F('task__completed_at'),
+}
+ENTRY_VALUES = (
+    'id', 'task_id', 'start_time', 'end_time', 'duration', 'is_billable', 'productivity_score',
+)
+
+# DailyAnalytics fields filled in by compute_daily_analytics
+ANALYTICS_FIELDS = (
+    'total_hours', 'billable_hours', 'break_time', 'productivity_score', 'task_completion_rate',
+    'tasks_worked', 'tasks_completed', 'hourly_data', 'task_data',
+)
+
+
+def entry_rows(time_entries):
+    """The time entry columns compute_daily_analytics needs, as dict rows."""
+    return time_entries.values(*ENTRY_VALUES, **ENTRY_FIELDS)
+
+
+def compute_daily_analytics(entries, target_date, break_duration=None):
+    """
+    DailyAnalytics field values for one user and day.
+
+    ``entries`` are rows from entry_rows() for entries starting on target_date;
+    ``break_duration`` is the total duration of their breaks.
+    """
+    entries = list(entries)
+    total = timedelta(0)
+    billable = timedelta(0)
+    scores = []
+    tasks = {}
+    for entry in entries:
+        duration = entry['duration'] or timedelta(0)
+        total += duration
+        if entry['is_billable']:
+            billable += duration
+        if entry['productivity_score'] is not None:
+            scores.append(entry['productivity_score'])
+
+        if entry['task_id'] is not None:
+            task = tasks.setdefault(entry['task_id'], {
+                'task_id': entry['task_id'],
+                'title': entry['task_title'],
+                'status': entry['task_status'] or 'unknown',
+                'completed_at': entry['task_completed_at'],
+                'duration': timedelta(0),
+                'entry_count': 0,
+            })
+            task['duration'] += duration
+            task['entry_count'] += 1
+
+    # Tasks worked on this day that were also completed on this day
+    tasks_worked = len(tasks)
+    tasks_completed = sum(
+        1 for task in tasks.values()
+        if task['completed_at'] and _local_date(task['completed_at']) == target_date
+    )
+
+    task_data = [
+        {
+            'task_id': task['task_id'],
+            'title': task['title'],
+            'status': task['status'],
+            'hours': task['duration'].total_seconds() / 3600,
+            'entry_count': task['entry_count'],
+        }
+        for task in sorted(tasks.values(), key=lambda task: task['task_id'])
+    ]
+
+    return {
+        'total_hours': total.total_seconds() / 3600,
+        'billable_hours': billable.total_seconds() / 3600,
+        'break_time': (break_duration or timedelta(0)).total_seconds() / 3600,
+        'productivity_score': sum(scores) / len(scores) if scores else 0,
+        'task_completion_rate': (tasks_completed / tasks_worked * 100) if tasks_worked > 0 else 0,
+        'tasks_worked': tasks_worked,
+        'tasks_completed': tasks_completed,
+        'hourly_data': {'hours': hourly_distribution(entries, target_date)},
+        'task_data': {'tasks': task_data},
+    }
+
+
+def precompute_daily_analytics(start_date, end_date, user_ids=None, batch_size=1000, exclude_user_ids=None):
+    """
+    Create or update DailyAnalytics for every user and day between start_date
+    and end_date (inclusive), optionally limited to or excluding some users.
+    Returns the number of rows written.
+
+    Time entries are streamed in (user, start time) order and reduced one
+    (business, user, day) group at a time; rows are upserted in batches.
+    Existing rows whose entries have since been deleted are reset to zero.
+    """
+    time_entries = TimeEntry.objects.filter(start_time__date__range=(start_date, end_date))
+    breaks = Break.objects.filter(
+        time_entry__start_time__date__range=(start_date, end_date),
+        duration__isnull=False
+    )
+    existing = DailyAnalytics.objects.filter(date__range=(start_date, end_date))
+    if user_ids is not None:
+        time_entries = time_entries.filter(user_id__in=user_ids)
+        breaks = breaks.filter(time_entry__user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+    if exclude_user_ids:
+        time_entries = time_entries.exclude(user_id__in=exclude_user_ids)
+        breaks = breaks.exclude(time_entry__user_id__in=exclude_user_ids)
+        existing = existing.exclude(user_id__in=exclude_user_ids)
+
+    break_durations = {
+        (row['time_entry__business_id'], row['time_entry__user_id'], row['day']): row['total']
+        for row in breaks.values(
+            'time_entry__business_id', 'time_entry__user_id', day=TruncDate('time_entry__start_time')
+        ).annotate(total=Sum('duration')).order_by()
+    }
+    stale = set(existing.values_list('business_id', 'user_id', 'date'))
+
+    rows = time_entries.values(
+        *ENTRY_VALUES, 'business_id', 'user_id', **ENTRY_FIELDS
+    ).order_by('user_id', 'business_id', 'start_time').iterator(chunk_size=batch_size)
+
+    written = 0
+    batch = []
+    for key, entries in groupby(rows, key=_group_key):
+        stale.discard(key)
+        batch.append(_analytics(key, compute_daily_analytics(entries, key[2], break_durations.get(key))))
+        if len(batch) >= batch_size:
+            written += _upsert(batch)
+            batch = []
+
+    for key in stale:
+        batch.append(_analytics(key, compute_daily_analytics([], key[2])))
+        if len(batch) >= batch_size:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+    return written
+
+
+def _group_key(row):
+    return row['business_id'], row['user_id'], _local_date(row['start_time'])
+
+
+def _analytics(key, values):
+    business_id, user_id, day = key
+    return DailyAnalytics(business_id=business_id, user_id=user_id, date=day, **values)
+
+
+def _upsert(batch):
+    DailyAnalytics.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['user', 'date', 'business'],
+        update_fields=[*ANALYTICS_FIELDS, 'updated_at']
+    )
+    return len(batch)
+
+
+def hourly_distribution(entries, target_date):
+    """
+    Minutes worked and number of overlapping entries for each hour of the day.
+
+    Only stopped entries (with an end_time) are counted. Minutes come from a
+    single sweep over the sorted interval endpoints; the per-hour entry count
+    is the number of entries started before the hour ends minus those that
+    ended before it began, found by binary search.
+    """
+    day_start = timezone.make_aware(datetime.combine(target_date, datetime.min.time()))
+    day_end = day_start + 24 * HOUR
+
+    intervals = [(entry['start_time'], entry['end_time']) for entry in entries if entry['end_time']]
+    starts = sorted(start for start, _ in intervals)
+    ends = sorted(end for _, end in intervals)
+
+    # +1 at each start and -1 at each end (clipped to the day), in time order
+    events = []
+    for start, end in intervals:
+        start, end = max(start, day_start), min(end, day_end)
+        if end > start:
+            events.append((start, 1))
+            events.append((end, -1))
+    events.sort()
+
+    seconds = [0.0] * 24
+    active = 0
+    previous = None
+    for moment, delta in events:
+        if active and moment > previous:
+            _spread(seconds, day_start, previous, moment, active)
+        active += delta
+        previous = moment
+
+    hours = []
+    for hour in range(24):
+        hour_start = day_start + hour * HOUR
+        hour_end = hour_start + HOUR
+        entry_count = bisect_left(starts, hour_end) - bisect_right(ends, hour_start)
+        hours.append({
+            'hour': hour,
+            'time': seconds[hour] / 60,  # in minutes
+            'entry_count': entry_count,
+        })
+    return hours
+
+
+def _spread(seconds, day_start, start, end, weight):
+    """Add weight × the part of [start, end) falling into each hour bucket."""
+    while start < end:
+        hour = int((start - day_start) / HOUR)
+        boundary = min(end, day_start + (hour + 1) * HOUR)
+        seconds[hour] += weight * (boundary - start).total_seconds()
+        start = boundary
+
+
+def _local_date(value):
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
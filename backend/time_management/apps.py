@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TimeManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'time_management'
+    
+    def ready(self):
+        # Register signals
+        import time_management.signals
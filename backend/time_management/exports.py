@@ -0,0 +1,137 @@
+"""
+Streaming exports for time reports.
+
+Rows are produced by generators and written out in small chunks, so memory
+use does not depend on the size of the report. Raw time entries are read
+with ``iterator(chunk_size=...)``, which uses a server-side cursor on
+PostgreSQL.
+"""
+import csv
+import io
+import tempfile
+
+from django.http import StreamingHttpResponse
+
+# Rows fetched from the database per cursor round trip
+EXPORT_CHUNK_SIZE = 2000
+# CSV rows buffered before a chunk is sent to the client
+CSV_ROWS_PER_CHUNK = 500
+# Bytes read per chunk when streaming a finished XLSX file
+FILE_CHUNK_SIZE = 64 * 1024
+
+ENTRY_COLUMNS = (
+    ('Entry ID', 'id'),
+    ('Start Time', 'start_time'),
+    ('End Time', 'end_time'),
+    ('Hours', 'duration'),
+    ('User ID', 'user_id'),
+    ('User Email', 'user__email'),
+    ('User Name', 'user__first_name'),
+    ('Task ID', 'task_id'),
+    ('Task Title', 'task__title'),
+    ('Client ID', 'client_id'),
+    ('Client Name', 'client__name'),
+    ('Billable', 'is_billable'),
+    ('Approved', 'is_approved'),
+    ('Productivity Score', 'productivity_score'),
+    ('Description', 'description'),
+)
+
+
+def iter_summary_rows(report):
+    """The pre-summarised report.data as table rows (same layout as before)."""
+    data = report.data or {}
+    yield ['Report Name', report.name]
+    yield ['Period', f"{report.start_date} to {report.end_date}"]
+    yield ['Generated At', data.get('generated_at', '')]
+    yield ['Total Hours', f"{data.get('total_hours', 0):.2f}"]
+    yield ['Entry Count', data.get('entry_count', 0)]
+    yield []
+
+    sections = (
+        ('User Data', ['User ID', 'User Name'], 'user_data', ('user_id', 'user_name')),
+        ('Task Data', ['Task ID', 'Task Title'], 'task_data', ('task_id', 'task_title')),
+        ('Client Data', ['Client ID', 'Client Name'], 'client_data', ('client_id', 'client_name')),
+    )
+    for index, (title, header, key, fields) in enumerate(sections):
+        if index:
+            yield []
+        yield [title]
+        yield header + ['Hours', 'Entry Count']
+        for row in data.get(key, []):
+            yield [row.get(field, '') for field in fields] + [
+                f"{row.get('hours', 0):.2f}",
+                row.get('entry_count', 0)
+            ]
+
+
+def iter_entry_rows(time_entries, chunk_size=EXPORT_CHUNK_SIZE):
+    """Header plus one row per time entry, read in chunks from the database."""
+    yield [label for label, _ in ENTRY_COLUMNS]
+    rows = (
+        time_entries
+        .order_by('start_time', 'id')
+        .values_list(*[field for _, field in ENTRY_COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+    duration_index = [field for _, field in ENTRY_COLUMNS].index('duration')
+    for row in rows:
+        row = list(row)
+        duration = row[duration_index]
+        row[duration_index] = round(duration.total_seconds() / 3600, 4) if duration else ''
+        for i, value in enumerate(row):
+            if hasattr(value, 'isoformat'):
+                row[i] = value.isoformat()
+        yield row
+
+
+def iter_csv(rows, rows_per_chunk=CSV_ROWS_PER_CHUNK):
+    """Encode rows as CSV text, yielding every rows_per_chunk rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_xlsx(rows, title='Report'):
+    """
+    Write rows to an XLSX workbook and stream the file.
+
+    openpyxl's write-only mode flushes each row to a temporary file, so memory
+    stays flat; the zip container can only be sent once the sheet is complete.
+    """
+    from openpyxl import Workbook
+
+    with tempfile.TemporaryFile() as output:
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(title=title[:31])
+        for row in rows:
+            sheet.append(row)
+        workbook.save(output)
+
+        output.seek(0)
+        while True:
+            chunk = output.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def streaming_export(rows, file_format, filename):
+    """StreamingHttpResponse for rows in 'csv' or 'xlsx' format."""
+    if file_format == 'xlsx':
+        content = iter_xlsx(rows)
+        content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        content = iter_csv(rows)
+        content_type = 'text/csv'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
@@ -0,0 +1,300 @@
+"""
+Bulk import of time entries from CSV or JSON lines.
+
+The pipeline is: parse rows -> resolve every foreign key with one
+``in_bulk`` per model -> validate each row -> check overlaps per user with a
+sorted interval sweep (including the user's existing entries) -> insert the
+valid rows with ``bulk_create`` in chunks. Errors are reported per row
+instead of failing the whole file.
+"""
+import csv
+import io
+import itertools
+import json
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from clients.models import Client, FiscalYear
+from tasks.models import Task
+from users.models import User
+from .models import TimeEntry
+from .rollup import refresh_cells, rollup_cell
+
+# Upper bound on rows per request, to keep a single import within memory
+MAX_IMPORT_ROWS = 50000
+IMPORT_BATCH_SIZE = 1000
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f'}
+
+
+class ImportFormatError(ValueError):
+    """The uploaded data could not be read as CSV or JSON lines."""
+
+
+def parse_rows(stream, file_format):
+    """
+    Yield (row number, dict) from a binary stream of CSV (with a header row)
+    or JSON lines. Row numbers are 1-based data rows.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(text), 1):
+            yield number, {key.strip(): (value or '').strip() for key, value in row.items() if key}
+    elif file_format == 'jsonl':
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                raise ImportFormatError(f'Row {number} is not a JSON object')
+            yield number, row
+    else:
+        raise ImportFormatError(f'Unsupported format: {file_format}')
+
+
+class TimeEntryImporter:
+    """Validate and insert time entry rows for one business."""
+
+    def __init__(self, business, user, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+        self.business = business
+        # Rows without user_id / user_email are imported for this user
+        self.user = user
+        # Only staff and the business owner may import entries for other members
+        self.can_import_for_others = user.is_staff or business.owner_id == user.id
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+
+    def run(self, rows):
+        """Import rows from parse_rows(). Returns a summary with per-row errors."""
+        # Stop reading one row past the limit instead of parsing an oversized upload to the end
+        rows = list(itertools.islice(rows, MAX_IMPORT_ROWS + 1))
+        if len(rows) > MAX_IMPORT_ROWS:
+            raise ImportFormatError(f'Too many rows (maximum {MAX_IMPORT_ROWS})')
+
+        lookups = self._resolve(rows)
+        errors = {}
+        entries = []
+        for number, row in rows:
+            entry, row_errors = self._build(row, lookups)
+            if row_errors:
+                errors[number] = row_errors
+            else:
+                entries.append((number, entry))
+
+        for number, message in self._overlaps(entries).items():
+            errors.setdefault(number, {})['start_time'] = message
+        entries = [entry for number, entry in entries if number not in errors]
+
+        created = 0
+        if entries and not self.dry_run:
+            created = self._insert(entries)
+
+        return {
+            'row_count': len(rows),
+            'created': created,
+            'valid': len(entries),
+            'dry_run': self.dry_run,
+            'errors': [{'row': number, 'errors': errors[number]} for number in sorted(errors)],
+        }
+
+    # --- foreign keys ---------------------------------------------------
+
+    def _resolve(self, rows):
+        """Resolve all referenced tasks, clients, fiscal years and users (one query per model)."""
+        ids = defaultdict(set)
+        emails = set()
+        for _, row in rows:
+            for field in ('task_id', 'client_id', 'fiscal_year_id', 'user_id'):
+                value = _int(row.get(field))
+                if value:
+                    ids[field].add(value)
+            if row.get('user_email'):
+                emails.add(str(row['user_email']).strip().lower())
+
+        users = User.objects.filter(business=self.business)
+        return {
+            'task_id': Task.objects.filter(business=self.business).in_bulk(ids['task_id']),
+            'client_id': Client.objects.filter(business=self.business).in_bulk(ids['client_id']),
+            'fiscal_year_id': FiscalYear.objects.filter(
+                client__business=self.business
+            ).in_bulk(ids['fiscal_year_id']),
+            'user_id': users.in_bulk(ids['user_id']),
+            'user_email': {
+                user.email.lower(): user for user in users.filter(email__in=emails)
+            } if emails else {},
+        }
+
+    # --- row validation -------------------------------------------------
+
+    def _build(self, row, lookups):
+        errors = {}
+
+        start_time = _datetime(row.get('start_time'))
+        if start_time is None:
+            errors['start_time'] = 'A valid ISO 8601 start time is required'
+        end_time = _datetime(row.get('end_time'))
+        if end_time is None and row.get('duration') not in (None, ''):
+            hours = _float(row.get('duration'))
+            if hours is None or hours <= 0:
+                errors['duration'] = 'Duration must be a positive number of hours'
+            elif start_time:
+                try:
+                    end_time = start_time + timedelta(hours=hours)
+                except OverflowError:
+                    errors['duration'] = 'Duration is out of range'
+        if end_time is None and 'duration' not in errors:
+            errors['end_time'] = 'A valid end time or duration is required'
+        elif start_time and end_time and end_time <= start_time:
+            errors['end_time'] = 'End time must be after start time'
+
+        related = {}
+        for field, name in (('task_id', 'task'), ('client_id', 'client'), ('fiscal_year_id', 'fiscal_year')):
+            value = row.get(field)
+            if value in (None, ''):
+                continue
+            obj = lookups[field].get(_int(value))
+            if obj is None:
+                errors[field] = f'Invalid {name.replace("_", " ")} ID'
+            else:
+                related[name] = obj
+
+        user = self.user
+        if row.get('user_id') not in (None, ''):
+            user = lookups['user_id'].get(_int(row['user_id']))
+            if user is None:
+                errors['user_id'] = 'Invalid user ID'
+        elif row.get('user_email'):
+            user = lookups['user_email'].get(str(row['user_email']).strip().lower())
+            if user is None:
+                errors['user_email'] = 'Unknown user email'
+        if user is not None and user != self.user and not self.can_import_for_others:
+            errors['user_id' if row.get('user_id') not in (None, '') else 'user_email'] = (
+                'Only staff can import time entries for other users'
+            )
+
+        is_billable = _bool(row.get('is_billable'), default=True)
+        if is_billable is None:
+            errors['is_billable'] = 'Must be true or false'
+
+        if errors:
+            return None, errors
+        return TimeEntry(
+            user=user,
+            business=self.business,
+            start_time=start_time,
+            end_time=end_time,
+            duration=end_time - start_time,
+            description=str(row.get('description') or ''),
+            is_billable=is_billable,
+            **related
+        ), None
+
+    # --- overlaps -------------------------------------------------------
+
+    def _overlaps(self, entries):
+        """
+        Rows overlapping another imported row or an existing entry of the same user.
+
+        Intervals are sorted by start time per user and swept once, keeping the
+        interval that reaches furthest so far: O(n log n) per user.
+        """
+        by_user = defaultdict(list)
+        for number, entry in entries:
+            by_user[entry.user_id].append((entry.start_time, entry.end_time, number, None))
+        if not by_user:
+            return {}
+
+        # Existing entries of the same users within the imported period (one query)
+        first_start = min(interval[0] for intervals in by_user.values() for interval in intervals)
+        last_end = max(interval[1] for intervals in by_user.values() for interval in intervals)
+        existing = TimeEntry.objects.overlapping(first_start, last_end).filter(
+            user_id__in=by_user.keys(),
+            end_time__isnull=False
+        ).values_list('user_id', 'start_time', 'end_time', 'id')
+        for user_id, start, end, entry_id in existing:
+            by_user[user_id].append((start, end, None, entry_id))
+
+        overlaps = {}
+        for intervals in by_user.values():
+            intervals.sort(key=lambda interval: (interval[0], interval[1]))
+            furthest = None
+            for interval in intervals:
+                start, end, number, _ = interval
+                if furthest and start < furthest[1]:
+                    other = furthest[2]
+                    if number is not None:
+                        overlaps.setdefault(number, _overlap_message(furthest))
+                    elif other is not None:
+                        overlaps.setdefault(other, _overlap_message(interval))
+                if furthest is None or end > furthest[1]:
+                    furthest = interval
+        return overlaps
+
+    # --- insert ---------------------------------------------------------
+
+    def _insert(self, entries):
+        created = 0
+        with transaction.atomic():
+            for i in range(0, len(entries), self.batch_size):
+                created += len(TimeEntry.objects.bulk_create(entries[i:i + self.batch_size]))
+            # bulk_create bypasses the rollup signals
+            refresh_cells(rollup_cell(entry) for entry in entries)
+        return created
+
+
+def _overlap_message(interval):
+    if interval[2] is not None:
+        return f'Overlaps row {interval[2]}'
+    return f'Overlaps existing time entry {interval[3]}'
+
+
+def _datetime(value):
+    if value in (None, ''):
+        return None
+    try:
+        parsed = parse_datetime(str(value).strip())
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    """A finite float, or None ('nan' and 'inf' parse as floats but are not valid numbers here)."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _bool(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return None
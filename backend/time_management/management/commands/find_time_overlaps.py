@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+from time_management.models import TimeEntry
+from time_management.overlaps import iter_overlap_clusters
+
+
+class Command(BaseCommand):
+    help = 'List clusters of overlapping time entries (same user, intersecting intervals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            help='Only scan this business ID'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Only scan this user ID'
+        )
+        parser.add_argument(
+            '--start',
+            help='Only entries starting on or after this date (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--end',
+            help='Only entries starting on or before this date (YYYY-MM-DD)'
+        )
+
+    def handle(self, *args, **options):
+        time_entries = TimeEntry.objects.all()
+        if options['business']:
+            time_entries = time_entries.filter(business_id=options['business'])
+        if options['user']:
+            time_entries = time_entries.filter(user_id=options['user'])
+        if options['start']:
+            time_entries = time_entries.filter(start_time__date__gte=parse_date(options['start']))
+        if options['end']:
+            time_entries = time_entries.filter(start_time__date__lte=parse_date(options['end']))
+
+        count = 0
+        overlap_seconds = 0
+        for cluster in iter_overlap_clusters(time_entries):
+            count += 1
+            overlap_seconds += cluster['overlap'].total_seconds()
+            self.stdout.write(
+                f"user {cluster['user_id']}: {cluster['start_time'].isoformat()} - "
+                f"{cluster['end_time'].isoformat()} entries {cluster['entry_ids']} "
+                f"overlap {cluster['overlap'].total_seconds() / 3600:.2f}h"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Found {count} overlap clusters ({overlap_seconds / 3600:.2f} hours counted more than once)'
+        ))
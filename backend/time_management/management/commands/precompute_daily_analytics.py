@@ -0,0 +1,97 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from time_management.analytics import precompute_daily_analytics
+from time_management.models import TimeEntry
+
+
+class Command(BaseCommand):
+    help = 'Precompute DailyAnalytics for every user of every business over a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='First date to compute (YYYY-MM-DD, default: --days before today)'
+        )
+        parser.add_argument(
+            '--end',
+            help='Last date to compute (YYYY-MM-DD, default: today)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Number of days before the end date to include when --start is omitted (default: 1)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker processes; users are split evenly between them (default: 1)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows read per cursor fetch and written per upsert (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        end_date = self._parse_date(options['end']) if options['end'] else timezone.localdate()
+        if options['start']:
+            start_date = self._parse_date(options['start'])
+        else:
+            start_date = end_date - timedelta(days=options['days'])
+        if start_date > end_date:
+            raise CommandError('--start must not be after --end')
+
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size']
+        if workers == 1:
+            written = precompute_daily_analytics(start_date, end_date, batch_size=batch_size)
+        else:
+            written = self._run_parallel(start_date, end_date, workers, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed {written} daily analytics rows for {start_date} to {end_date}'
+        ))
+
+    def _run_parallel(self, start_date, end_date, workers, batch_size):
+        """Split the users across a process pool, each worker with its own connection."""
+        user_ids = list(
+            TimeEntry.objects.filter(start_time__date__range=(start_date, end_date))
+            .values_list('user_id', flat=True).distinct().order_by('user_id')
+        )
+        chunks = [user_ids[i::workers] for i in range(workers) if user_ids[i::workers]]
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('fork')) as pool:
+            futures = [
+                pool.submit(_precompute_chunk, start_date, end_date, chunk, batch_size)
+                for chunk in chunks
+            ]
+            written = sum(future.result() for future in futures)
+
+        # Rows of users without entries in the range (deleted since the last run)
+        written += precompute_daily_analytics(
+            start_date, end_date, batch_size=batch_size, exclude_user_ids=user_ids
+        )
+        return written
+
+    def _parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}')
+
+
+def _precompute_chunk(start_date, end_date, user_ids, batch_size):
+    try:
+        return precompute_daily_analytics(start_date, end_date, user_ids=user_ids, batch_size=batch_size)
+    finally:
+        connections.close_all()
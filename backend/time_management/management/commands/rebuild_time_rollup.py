@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from time_management.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the time rollup table from time entries (backfill or repair after bulk changes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            help='Only rebuild rollups for this business ID'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rollup rows written per insert (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        created = rebuild_rollup(
+            business_id=options['business'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} time rollup rows'))
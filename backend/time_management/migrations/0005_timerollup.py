@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:20
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0004_businessclosure'),
+        ('tasks', '0012_task_recurring_updated_index'),
+        ('clients', '0014_client_website'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('time_management', '0004_timeentry_fiscal_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='date')),
+                ('duration', models.DurationField(default=datetime.timedelta(0), verbose_name='duration')),
+                ('billable_duration', models.DurationField(default=datetime.timedelta(0), verbose_name='billable duration')),
+                ('entry_count', models.IntegerField(default=0, verbose_name='entry count')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to='business.business')),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to='clients.client')),
+                ('task', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to='tasks.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'time rollup',
+                'verbose_name_plural': 'time rollups',
+                'indexes': [models.Index(fields=['business', 'user', 'date'], name='tm_rollup_user_date_idx')],
+                'unique_together': {('business', 'user', 'date', 'task', 'client')},
+            },
+        ),
+    ]
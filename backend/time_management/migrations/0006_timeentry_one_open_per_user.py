@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def stop_duplicate_open_entries(apps, schema_editor):
+    """Stop all but the latest running entry of each user, at the start of the next one."""
+    TimeEntry = apps.get_model('time_management', 'TimeEntry')
+
+    user_ids = (
+        TimeEntry.objects.filter(end_time__isnull=True)
+        .values('user_id').annotate(open_count=Count('id')).filter(open_count__gt=1)
+        .values_list('user_id', flat=True)
+    )
+    for user_id in list(user_ids):
+        entries = list(TimeEntry.objects.filter(user_id=user_id, end_time__isnull=True).order_by('start_time', 'id'))
+        for entry, following in zip(entries, entries[1:]):
+            entry.end_time = following.start_time
+            entry.duration = entry.end_time - entry.start_time
+            entry.save(update_fields=['end_time', 'duration'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_management', '0005_timerollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(stop_duplicate_open_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timeentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('end_time__isnull', True)), fields=('user',), name='tm_timeentry_one_open_per_user'),
+        ),
+    ]
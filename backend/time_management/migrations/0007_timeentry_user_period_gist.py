@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDEX_NAME = 'tm_timeentry_user_period_gist'
+
+
+# Rows with end_time < start_time are clamped to an empty range; tstzrange() raises on them otherwise
+PERIOD_EXPRESSION = (
+    'tstzrange(start_time, CASE WHEN end_time < start_time THEN start_time ELSE end_time END)'
+)
+
+
+def create_period_index(apps, schema_editor):
+    """GiST index over (user, entry period) for overlap lookups (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # btree_gist provides the GiST operator class for the integer user_id column
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON time_management_timeentry '
+        f'USING gist (user_id, ({PERIOD_EXPRESSION}))'
+    )
+
+
+def drop_period_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('time_management', '0006_timeentry_one_open_per_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_period_index, drop_period_index),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import connection, models
+from django.db.models import BooleanField, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -7,6 +10,60 @@ from datetime import timedelta
 User = get_user_model()
 
 
+class TimeEntryQuerySet(models.QuerySet):
+    """QuerySet for time entries with break-adjusted durations computed in SQL."""
+    
+    def with_net_duration(self):
+        """
+        Annotate break_duration (total of the entry's finished breaks) and
+        net_duration (duration minus breaks, zero while the timer is running).
+        """
+        breaks = Break.objects.filter(
+            time_entry=OuterRef('pk'),
+            duration__isnull=False
+        ).order_by().values('time_entry').annotate(total=Sum('duration')).values('total')
+        
+        return self.annotate(
+            break_duration=Coalesce(Subquery(breaks, output_field=DurationField()), Value(timedelta(0))),
+        ).annotate(
+            net_duration=ExpressionWrapper(
+                Coalesce(F('duration') - F('break_duration'), Value(timedelta(0))),
+                output_field=DurationField()
+            )
+        )
+    
+    def break_duration_total(self):
+        """Total duration of finished breaks of these entries (one query)."""
+        return Break.objects.filter(
+            time_entry__in=self.order_by().values('pk'),
+            duration__isnull=False
+        ).aggregate(total=Sum('duration'))['total'] or timedelta(0)
+    
+    def overlapping(self, start, end):
+        """
+        Entries whose interval intersects [start, end); running entries are open-ended
+        and entries ending before they start never match.
+        On PostgreSQL this is a tstzrange && lookup served by tm_timeentry_user_period_gist
+        (the expression must stay identical to the index's).
+        """
+        if connection.vendor == 'postgresql':
+            return self.filter(RawSQL(
+                'tstzrange("time_management_timeentry"."start_time", CASE WHEN '
+                '"time_management_timeentry"."end_time" < "time_management_timeentry"."start_time" '
+                'THEN "time_management_timeentry"."start_time" ELSE "time_management_timeentry"."end_time" END)'
+                ' && tstzrange(%s, %s)',
+                (start, end),
+                output_field=BooleanField()
+            ))
+        return self.filter(
+            Q(end_time__isnull=True) | Q(end_time__gt=start) & Q(end_time__gt=F('start_time')), start_time__lt=end
+        )
+
+
+class TimeEntryManager(models.Manager.from_queryset(TimeEntryQuerySet)):
+    """Manager for time entries."""
+
+
 class TimeEntry(models.Model):
     """Time entry for tracking time spent on tasks."""
     
@@ -70,10 +127,20 @@ class TimeEntry(models.Model):
         related_name='time_entries'
     )
     
+    objects = TimeEntryManager()
+    
     class Meta:
         verbose_name = _('time entry')
         verbose_name_plural = _('time entries')
         ordering = ['-start_time']
+        constraints = [
+            # At most one running timer per user; also serves the active timer lookup
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(end_time__isnull=True),
+                name='tm_timeentry_one_open_per_user'
+            ),
+        ]
     
     def __str__(self):
         if self.task:
@@ -95,7 +162,13 @@ class TimeEntry(models.Model):
             self.save()
     
     def effective_duration(self):
-        """Calculate effective duration by subtracting breaks."""
+        """
+        Calculate effective duration by subtracting breaks.
+        Use TimeEntry.objects.with_net_duration() for lists of entries.
+        """
+        # Already computed by with_net_duration()
+        if hasattr(self, 'net_duration'):
+            return self.net_duration
         if not self.duration:
             return timedelta(0)
             
@@ -154,6 +227,59 @@ class DailyAnalytics(models.Model):
         return f"Daily Analytics for {self.user.get_full_name()} on {self.date}"
 
 
+class TimeRollup(models.Model):
+    """
+    Per (business, user, day, task, client) totals of time entries.
+
+    Kept up to date by the TimeEntry save/delete signals (see rollup.py) so
+    dashboards can read period totals without scanning raw time entries.
+    Rebuild with the ``rebuild_time_rollup`` management command.
+    """
+    
+    business = models.ForeignKey(
+        'business.Business',
+        on_delete=models.CASCADE,
+        related_name='time_rollups'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='time_rollups'
+    )
+    date = models.DateField(_('date'))
+    task = models.ForeignKey(
+        'tasks.Task',
+        on_delete=models.CASCADE,
+        related_name='time_rollups',
+        null=True,
+        blank=True
+    )
+    client = models.ForeignKey(
+        'clients.Client',
+        on_delete=models.CASCADE,
+        related_name='time_rollups',
+        null=True,
+        blank=True
+    )
+    
+    duration = models.DurationField(_('duration'), default=timedelta(0))
+    billable_duration = models.DurationField(_('billable duration'), default=timedelta(0))
+    entry_count = models.IntegerField(_('entry count'), default=0)
+    
+    updated_at = models.DateTimeField(_('updated at'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('time rollup')
+        verbose_name_plural = _('time rollups')
+        unique_together = ('business', 'user', 'date', 'task', 'client')
+        indexes = [
+            models.Index(fields=['business', 'user', 'date'], name='tm_rollup_user_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Time rollup for user {self.user_id} on {self.date}"
+
+
 class TimeReport(models.Model):
     """Saved time reports."""
     
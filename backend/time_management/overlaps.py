@@ -0,0 +1,107 @@
+"""
+Overlapping time entry detection.
+
+Entries of the same user whose intervals intersect are grouped into
+clusters (connected components of the overlap relation). Entries are read in
+(user, start time) order and swept once, extending the current cluster while
+the next entry starts before the cluster ends, so detection is O(n log n)
+for the sort plus O(n) for the sweep. Running entries are treated as ending
+now; entries that end before they start are treated as zero length.
+
+On PostgreSQL the GiST index ``tm_timeentry_user_period_gist`` over
+(user_id, tstzrange(start_time, end_time)) backs
+``TimeEntryQuerySet.overlapping`` range lookups.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+OVERLAP_CHUNK_SIZE = 2000
+
+# Report filter values for filters['overlap']
+OVERLAP_EXCLUDE = 'exclude'
+OVERLAP_MERGE = 'merge'
+
+
+def iter_overlap_clusters(time_entries, chunk_size=OVERLAP_CHUNK_SIZE):
+    """
+    Yield overlap clusters of the given time entries.
+
+    Each cluster is a dict with user_id, start_time, end_time (of the union),
+    entry_ids, duration (sum of the entries), merged_duration (length of the
+    union) and overlap (time counted more than once).
+    """
+    now = timezone.now()
+    rows = (
+        time_entries
+        .order_by('user_id', 'start_time', 'id')
+        .values_list('id', 'user_id', 'start_time', 'end_time')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    cluster = None
+    for entry_id, user_id, start, end in rows:
+        end = max(end, start) if end else max(now, start)
+        if cluster and cluster['user_id'] == user_id and start < cluster['end_time']:
+            cluster['entry_ids'].append(entry_id)
+            cluster['duration'] += end - start
+            cluster['end_time'] = max(cluster['end_time'], end)
+            continue
+
+        if cluster and len(cluster['entry_ids']) > 1:
+            yield _finish(cluster)
+        cluster = {
+            'user_id': user_id,
+            'start_time': start,
+            'end_time': end,
+            'entry_ids': [entry_id],
+            'duration': end - start,
+        }
+
+    if cluster and len(cluster['entry_ids']) > 1:
+        yield _finish(cluster)
+
+
+def overlap_summary(time_entries):
+    """Clusters plus totals, with durations in hours (for the API and reports)."""
+    clusters = []
+    overlap_by_user = {}
+    for cluster in iter_overlap_clusters(time_entries):
+        overlap_by_user[cluster['user_id']] = (
+            overlap_by_user.get(cluster['user_id'], timedelta(0)) + cluster['overlap']
+        )
+        clusters.append({
+            'user_id': cluster['user_id'],
+            'start_time': cluster['start_time'].isoformat(),
+            'end_time': cluster['end_time'].isoformat(),
+            'entry_ids': cluster['entry_ids'],
+            'hours': _hours(cluster['duration']),
+            'merged_hours': _hours(cluster['merged_duration']),
+            'overlap_hours': _hours(cluster['overlap']),
+        })
+
+    return {
+        'cluster_count': len(clusters),
+        'entry_count': sum(len(cluster['entry_ids']) for cluster in clusters),
+        'overlap_hours': _hours(sum(overlap_by_user.values(), timedelta(0))),
+        'users': [
+            {'user_id': user_id, 'overlap_hours': _hours(overlap)}
+            for user_id, overlap in sorted(overlap_by_user.items())
+        ],
+        'clusters': clusters,
+    }
+
+
+def overlapping_entry_ids(time_entries):
+    """Ids of entries that overlap another entry of the same user."""
+    return [entry_id for cluster in iter_overlap_clusters(time_entries) for entry_id in cluster['entry_ids']]
+
+
+def _finish(cluster):
+    cluster['merged_duration'] = cluster['end_time'] - cluster['start_time']
+    cluster['overlap'] = cluster['duration'] - cluster['merged_duration']
+    return cluster
+
+
+def _hours(duration):
+    return duration.total_seconds() / 3600 if duration else 0
@@ -0,0 +1,73 @@
+"""
+Named date periods for summaries.
+
+Presets are resolved relative to a given day; fiscal years come from
+``clients.FiscalYear`` and custom ranges are passed as ``name:start:end``.
+Every period is an inclusive (start_date, end_date) pair, as expected by
+``rollup.summarize_periods``.
+"""
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.utils.dateparse import parse_date
+
+DEFAULT_PERIODS = ('today', 'this_week', 'this_month')
+
+
+def _this_week(today):
+    start = today - timedelta(days=today.weekday())
+    return start, today
+
+
+def _last_week(today):
+    end = today - timedelta(days=today.weekday() + 1)
+    return end - timedelta(days=6), end
+
+
+def _last_month(today):
+    end = today.replace(day=1) - timedelta(days=1)
+    return end.replace(day=1), end
+
+
+PRESETS = {
+    'today': lambda today: (today, today),
+    'yesterday': lambda today: (today - timedelta(days=1), today - timedelta(days=1)),
+    'this_week': _this_week,
+    'last_week': _last_week,
+    'last_7_days': lambda today: (today - timedelta(days=6), today),
+    'this_month': lambda today: (today.replace(day=1), today),
+    'last_month': _last_month,
+    'last_30_days': lambda today: (today - timedelta(days=29), today),
+    'this_quarter': lambda today: (today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1), today),
+    'this_year': lambda today: (today.replace(month=1, day=1), today),
+    'last_12_months': lambda today: (today - relativedelta(years=1) + timedelta(days=1), today),
+}
+
+
+def resolve_periods(names, today, custom=(), fiscal_years=()):
+    """
+    {name: (start_date, end_date)} for preset names, custom 'name:start:end'
+    strings and FiscalYear objects (named 'fiscal_year_<id>').
+    Raises ValueError for unknown presets or malformed ranges.
+    """
+    periods = {}
+    for name in names:
+        if name not in PRESETS:
+            raise ValueError(f'Unknown period: {name}')
+        periods[name] = PRESETS[name](today)
+
+    for value in custom:
+        try:
+            name, start, end = value.split(':')
+            start, end = parse_date(start), parse_date(end)
+        except ValueError:
+            start = end = None
+        if not start or not end or not name.isidentifier():
+            raise ValueError(f'Custom periods must be name:YYYY-MM-DD:YYYY-MM-DD, got {value}')
+        if start > end:
+            raise ValueError(f'Period {name} ends before it starts')
+        periods[name] = (start, end)
+
+    for fiscal_year in fiscal_years:
+        periods[f'fiscal_year_{fiscal_year.id}'] = (fiscal_year.start_date, fiscal_year.end_date)
+    return periods
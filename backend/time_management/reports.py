@@ -0,0 +1,235 @@
+"""
+Report engine for time reports.
+
+Every breakdown is computed with a handful of GROUP BY queries
+(``values(...).annotate(...)``) and pivoted in memory, so the number of
+queries does not grow with the number of users, tasks, clients or days.
+"""
+from datetime import date, datetime, timedelta
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .overlaps import OVERLAP_EXCLUDE, OVERLAP_MERGE, iter_overlap_clusters, overlapping_entry_ids
+
+# report_format -> (truncate function, label format)
+CHART_FORMATS = {
+    'daily': (TruncDay, '%Y-%m-%d'),
+    'weekly': (TruncWeek, 'Week %W, %Y'),
+    'monthly': (TruncMonth, '%B %Y'),
+}
+
+
+def apply_report_filters(time_entries, filters):
+    """
+    Narrow time entries down by the report's user/task/client filters.
+    With filters['overlap'] == 'exclude', entries overlapping another entry
+    of the same user are left out.
+    """
+    for key, value in (filters or {}).items():
+        if key == 'user_id' and value:
+            time_entries = time_entries.filter(user_id=value)
+        elif key == 'task_id' and value:
+            time_entries = time_entries.filter(task_id=value)
+        elif key == 'client_id' and value:
+            time_entries = time_entries.filter(client_id=value)
+    if (filters or {}).get('overlap') == OVERLAP_EXCLUDE:
+        time_entries = time_entries.exclude(id__in=overlapping_entry_ids(time_entries))
+    return time_entries
+
+
+def build_report_data(time_entries, overlap=None):
+    """
+    Totals plus per-user, per-task and per-client breakdowns (4 queries).
+    net_hours are hours minus breaks, computed in the database.
+
+    With overlap='merge', time counted more than once by overlapping entries
+    of the same user is subtracted from the total and per-user hours (task and
+    client hours still attribute each entry in full).
+    """
+    time_entries = time_entries.with_net_duration()
+    totals = time_entries.aggregate(total=Sum('duration'), net=Sum('net_duration'), entry_count=Count('id'))
+
+    user_data = [
+        {
+            'user_id': row['user_id'],
+            'user_name': row['user__first_name'],
+            'hours': _hours(row['total']),
+            'net_hours': _hours(row['net']),
+            'entry_count': row['entry_count'],
+        }
+        for row in _grouped(time_entries, 'user_id', 'user__first_name')
+    ]
+    task_data = [
+        {
+            'task_id': row['task_id'],
+            'task_title': row['task__title'],
+            'hours': _hours(row['total']),
+            'net_hours': _hours(row['net']),
+            'entry_count': row['entry_count'],
+        }
+        for row in _grouped(time_entries.filter(task__isnull=False), 'task_id', 'task__title')
+    ]
+    client_data = [
+        {
+            'client_id': row['client_id'],
+            'client_name': row['client__name'],
+            'hours': _hours(row['total']),
+            'net_hours': _hours(row['net']),
+            'entry_count': row['entry_count'],
+        }
+        for row in _grouped(time_entries.filter(client__isnull=False), 'client_id', 'client__name')
+    ]
+
+    data = {
+        'entry_count': totals['entry_count'],
+        'total_hours': _hours(totals['total']),
+        'total_net_hours': _hours(totals['net']),
+        'user_data': user_data,
+        'task_data': task_data,
+        'client_data': client_data,
+    }
+    if overlap == OVERLAP_MERGE:
+        _merge_overlaps(data, time_entries)
+    return data
+
+
+def _merge_overlaps(data, time_entries):
+    """Subtract double-counted time from total and per-user hours (one query)."""
+    overlap_by_user = {}
+    for cluster in iter_overlap_clusters(time_entries.filter(end_time__isnull=False)):
+        overlap_by_user[cluster['user_id']] = overlap_by_user.get(cluster['user_id'], 0) + _hours(cluster['overlap'])
+
+    for row in data['user_data']:
+        overlap = overlap_by_user.get(row['user_id'], 0)
+        row['overlap_hours'] = overlap
+        row['hours'] -= overlap
+        row['net_hours'] = max(row['net_hours'] - overlap, 0)
+    total_overlap = sum(overlap_by_user.values())
+    data['overlap_hours'] = total_overlap
+    data['total_hours'] -= total_overlap
+    data['total_net_hours'] = max(data['total_net_hours'] - total_overlap, 0)
+
+
+def build_chart_data(time_entries, report_format, start_date, end_date, users=None):
+    """
+    Chart labels and datasets for a daily/weekly/monthly report (1 query).
+
+    When ``users`` (the report's ``user_data``) is given, one dataset is built
+    per user; otherwise a single "Hours" dataset is returned.
+    Returns an empty dict for other report formats.
+    """
+    if report_format not in CHART_FORMATS:
+        return {}
+    trunc, label_format = CHART_FORMATS[report_format]
+
+    buckets = report_buckets(report_format, start_date, end_date)
+    index = {bucket: i for i, bucket in enumerate(buckets)}
+
+    group_by = ['bucket', 'user_id'] if users is not None else ['bucket']
+    rows = (
+        time_entries
+        .annotate(bucket=trunc('start_time'))
+        .values(*group_by)
+        .annotate(total=Sum('duration'))
+        .order_by()
+    )
+
+    series = {}
+    for row in rows:
+        i = index.get(_local_date(row['bucket']))
+        if i is None:
+            continue
+        data = series.setdefault(row.get('user_id'), [0] * len(buckets))
+        data[i] = round(_hours(row['total']), 1)
+
+    datasets = []
+    if users is None:
+        datasets.append({
+            'label': 'Hours',
+            'data': series.get(None, [0] * len(buckets)),
+            'backgroundColor': 'rgba(54, 162, 235, 0.5)',
+            'borderColor': 'rgba(54, 162, 235, 1)',
+            'borderWidth': 1
+        })
+    else:
+        for user in users:
+            user_id = user['user_id']
+            color = f'{user_id * 50 % 255}, {(user_id * 30 + 100) % 255}, {(user_id * 70 + 50) % 255}'
+            datasets.append({
+                'label': user['user_name'],
+                'data': series.get(user_id, [0] * len(buckets)),
+                'backgroundColor': f'rgba({color}, 0.5)',
+                'borderColor': f'rgba({color}, 1)',
+                'borderWidth': 1
+            })
+
+    return {
+        'labels': [bucket.strftime(label_format) for bucket in buckets],
+        'datasets': datasets
+    }
+
+
+def report_buckets(report_format, start_date, end_date):
+    """Start dates of the daily/weekly (Monday)/monthly buckets covering the period."""
+    if report_format == 'daily':
+        return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    buckets = []
+    if report_format == 'weekly':
+        current = start_date - timedelta(days=start_date.weekday())
+        while current <= end_date:
+            buckets.append(current)
+            current += timedelta(days=7)
+    elif report_format == 'monthly':
+        current = start_date.replace(day=1)
+        while current <= end_date:
+            buckets.append(current)
+            if current.month == 12:
+                current = date(current.year + 1, 1, 1)
+            else:
+                current = date(current.year, current.month + 1, 1)
+    return buckets
+
+
+def average_by_bucket(rows, fields, bucket_index, size):
+    """
+    Average per-day rows into chart buckets, over the days that have data.
+
+    Returns one list of ``size`` values per field; durations become hours.
+    """
+    sums = [[0] * size for _ in fields]
+    days = [0] * size
+    for row in rows:
+        i = bucket_index(row['date'])
+        if not 0 <= i < size:
+            continue
+        days[i] += 1
+        for values, field in zip(sums, fields):
+            value = row[field]
+            values[i] += _hours(value) if isinstance(value, timedelta) else (value or 0)
+
+    return [
+        [round(total / count, 1) if count else 0 for total, count in zip(values, days)]
+        for values in sums
+    ]
+
+
+def _grouped(time_entries, *fields):
+    return (
+        time_entries
+        .values(*fields)
+        .annotate(total=Sum('duration'), net=Sum('net_duration'), entry_count=Count('id'))
+        .order_by(*fields)
+    )
+
+
+def _local_date(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def _hours(duration):
+    return duration.total_seconds() / 3600 if duration else 0
@@ -0,0 +1,164 @@
+"""
+Time rollup maintenance.
+
+``TimeRollup`` holds one row per (business, user, day, task, client) cell.
+Whenever a time entry is saved or deleted, only the cells it left and
+entered are recounted, so the table stays exact without scanning other
+entries. Deleting a client moves its cells to client=None (see signals.py),
+since the entries' SET_NULL update sends no signals. ``rebuild_rollup``
+recreates the rows from scratch for backfills and after other bulk
+operations that bypass signals.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import TimeEntry, TimeRollup, User
+
+CELL_FIELDS = ('business_id', 'user_id', 'date', 'task_id', 'client_id')
+
+
+def rollup_cell(entry):
+    """The rollup cell a time entry belongs to, as a tuple of CELL_FIELDS."""
+    if not entry.start_time or not entry.business_id or not entry.user_id:
+        return None
+    return (
+        entry.business_id,
+        entry.user_id,
+        timezone.localdate(entry.start_time) if timezone.is_aware(entry.start_time) else entry.start_time.date(),
+        entry.task_id,
+        entry.client_id,
+    )
+
+
+def refresh_cells(cells):
+    """Recount the given rollup cells from their time entries."""
+    cells_by_user = {}
+    for cell in {cell for cell in cells if cell}:
+        cells_by_user.setdefault(cell[1], []).append(cell)
+
+    for user_id, user_cells in cells_by_user.items():
+        with transaction.atomic():
+            # Delete and re-create instead of update_or_create: rows with a NULL
+            # task/client are not covered by the unique constraint, so concurrent
+            # refreshes of a user's cells are serialized on the user row instead
+            list(User.objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+            for cell in user_cells:
+                business_id, user_id, day, task_id, client_id = cell
+                totals = TimeEntry.objects.filter(
+                    business_id=business_id,
+                    user_id=user_id,
+                    start_time__date=day,
+                    task_id=task_id,
+                    client_id=client_id,
+                ).aggregate(**_totals())
+
+                TimeRollup.objects.filter(**dict(zip(CELL_FIELDS, cell))).delete()
+                if totals['entry_count']:
+                    TimeRollup.objects.create(**dict(zip(CELL_FIELDS, cell)), **_defaults(totals))
+
+
+def client_fallback_cells(client):
+    """The client=None cells that a client's rollup rows fall back to when the client is deleted."""
+    return [
+        (business_id, user_id, day, task_id, None)
+        for business_id, user_id, day, task_id in TimeRollup.objects.filter(client=client).values_list(
+            'business_id', 'user_id', 'date', 'task_id'
+        )
+    ]
+
+
+def rebuild_rollup(business_id=None, batch_size=1000):
+    """Recreate rollup rows from all time entries (optionally for one business)."""
+    time_entries = TimeEntry.objects.all()
+    rollups = TimeRollup.objects.all()
+    if business_id:
+        time_entries = time_entries.filter(business_id=business_id)
+        rollups = rollups.filter(business_id=business_id)
+
+    rows = (
+        time_entries
+        .annotate(date=TruncDate('start_time'))
+        .values(*CELL_FIELDS)
+        .annotate(**_totals())
+        .order_by()
+    )
+
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(TimeRollup(**{field: row[field] for field in CELL_FIELDS}, **_defaults(row)))
+            if len(batch) >= batch_size:
+                TimeRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            TimeRollup.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def summarize_periods(rollups, periods):
+    """
+    Hours, billable hours and entry counts for several date periods in one query.
+
+    ``periods`` maps a name to an inclusive (start_date, end_date) pair.
+    """
+    aggregates = _period_aggregates(periods)
+    totals = rollups.aggregate(**aggregates) if aggregates else {}
+    return _period_values(totals, periods)
+
+
+def summarize_periods_by_user(rollups, periods):
+    """
+    summarize_periods() for every user of the rollups, still in one query
+    (one GROUP BY user row with a conditional sum per period).
+    Returns {user_id: {period name: values}}.
+    """
+    aggregates = _period_aggregates(periods)
+    if not aggregates:
+        return {}
+    rows = rollups.values('user_id').annotate(**aggregates).order_by('user_id')
+    return {row['user_id']: _period_values(row, periods) for row in rows}
+
+
+def _period_aggregates(periods):
+    aggregates = {}
+    for name, (start, end) in periods.items():
+        in_period = Q(date__gte=start, date__lte=end)
+        aggregates[f'{name}_duration'] = Sum('duration', filter=in_period)
+        aggregates[f'{name}_billable_duration'] = Sum('billable_duration', filter=in_period)
+        aggregates[f'{name}_entry_count'] = Sum('entry_count', filter=in_period)
+    return aggregates
+
+
+def _period_values(totals, periods):
+    return {
+        name: {
+            'hours': (totals[f'{name}_duration'] or timedelta(0)).total_seconds() / 3600,
+            'billable_hours': (totals[f'{name}_billable_duration'] or timedelta(0)).total_seconds() / 3600,
+            'entry_count': totals[f'{name}_entry_count'] or 0,
+        }
+        for name in periods
+    }
+
+
+def _totals():
+    return {
+        'total': Sum('duration'),
+        'billable': Sum('duration', filter=Q(is_billable=True)),
+        'entry_count': Count('id'),
+    }
+
+
+def _defaults(totals):
+    return {
+        'duration': totals['total'] or timedelta(0),
+        'billable_duration': totals['billable'] or timedelta(0),
+        'entry_count': totals['entry_count'],
+    }
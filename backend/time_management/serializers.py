@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import TimeEntry, TimeReport, Break, DailyAnalytics
+from .overlaps import OVERLAP_EXCLUDE, OVERLAP_MERGE
 from tasks.models import Task
 from clients.models import Client
 
@@ -152,10 +153,20 @@ class TimeEntryCreateUpdateSerializer(serializers.ModelSerializer):
             except FiscalYear.DoesNotExist:
                 raise serializers.ValidationError({'fiscal_year_id': 'Invalid fiscal year ID'})
         
-        # Validate start and end times
-        if 'start_time' in attrs and 'end_time' in attrs:
-            if attrs['end_time'] and attrs['start_time'] > attrs['end_time']:
-                raise serializers.ValidationError({'end_time': 'End time must be after start time'})
+        # Validate start and end times (partial updates compare against the stored values)
+        start_time = attrs['start_time'] if 'start_time' in attrs else getattr(self.instance, 'start_time', None)
+        end_time = attrs['end_time'] if 'end_time' in attrs else getattr(self.instance, 'end_time', None)
+        if start_time and end_time and start_time > end_time:
+            raise serializers.ValidationError({'end_time': 'End time must be after start time'})
+        
+        # Only one running entry per user
+        if end_time is None:
+            user = self.instance.user if self.instance else self.context['request'].user
+            running = TimeEntry.objects.filter(user=user, end_time__isnull=True)
+            if self.instance:
+                running = running.exclude(pk=self.instance.pk)
+            if running.exists():
+                raise serializers.ValidationError({'end_time': 'You already have an active timer'})
         
         return attrs
 
@@ -200,7 +211,7 @@ class TimeReportCreateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = TimeReport
-        fields = ('id', 'name', 'description', 'start_date', 'end_date', 'filters')
+        fields = ('id', 'name', 'description', 'start_date', 'end_date', 'filters', 'chart_type', 'report_format')
     
     def validate(self, attrs):
         # Validate start and end dates
@@ -208,6 +219,12 @@ class TimeReportCreateSerializer(serializers.ModelSerializer):
             if attrs['start_date'] > attrs['end_date']:
                 raise serializers.ValidationError({'end_date': 'End date must be after start date'})
         
+        # Overlapping entries can be left out or merged into one span
+        filters = attrs.get('filters') or {}
+        overlap = filters.get('overlap') if isinstance(filters, dict) else None
+        if overlap not in (None, '', OVERLAP_EXCLUDE, OVERLAP_MERGE):
+            raise serializers.ValidationError({'filters': f"overlap must be '{OVERLAP_EXCLUDE}' or '{OVERLAP_MERGE}'"})
+        
         return attrs
 
 
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from clients.models import Client
+from .models import TimeEntry
+from .rollup import client_fallback_cells, refresh_cells, rollup_cell
+from .timers import invalidate_active_timer
+
+ROLLUP_FIELDS = {'business_id', 'user_id', 'start_time', 'task_id', 'client_id'}
+
+
+@receiver(post_init, sender=TimeEntry)
+def remember_rollup_cell(sender, instance, **kwargs):
+    """Remember the rollup cell the entry was loaded with, to recount it if the entry moves."""
+    # Deferred fields are left alone so that .only()/.defer() querysets do not trigger extra queries
+    if instance.pk and not instance.get_deferred_fields() & ROLLUP_FIELDS:
+        instance._rollup_cell = rollup_cell(instance)
+    else:
+        instance._rollup_cell = None
+
+
+@receiver(post_save, sender=TimeEntry)
+def update_rollup_on_save(sender, instance, **kwargs):
+    """
+    Recount the rollup cells a time entry left and entered (also covers stop_timer)
+    and drop the user's cached active timer.
+    """
+    cell = rollup_cell(instance)
+    refresh_cells([instance._rollup_cell, cell])
+    instance._rollup_cell = cell
+    invalidate_active_timer(instance.user_id)
+
+
+@receiver(post_delete, sender=TimeEntry)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    refresh_cells([instance._rollup_cell, rollup_cell(instance)])
+    invalidate_active_timer(instance.user_id)
+
+
+@receiver(pre_delete, sender=Client)
+def remember_client_rollup_cells(sender, instance, **kwargs):
+    """
+    The client's entries are moved to client=None by a bulk SET_NULL update
+    (no TimeEntry signals) while its rollup rows cascade away; remember the
+    cells those hours move to.
+    """
+    instance._rollup_cells = client_fallback_cells(instance)
+
+
+@receiver(post_delete, sender=Client)
+def update_rollup_on_client_delete(sender, instance, **kwargs):
+    refresh_cells(getattr(instance, '_rollup_cells', ()))
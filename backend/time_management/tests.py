@@ -1,3 +1,800 @@
+import itertools
+import json
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from business.models import Business
+from clients.models import Client, FiscalYear
+from tasks.models import Task
+from users.models import User
+from .analytics import hourly_distribution
+from .exports import iter_csv
+from .imports import ImportFormatError, TimeEntryImporter
+from .overlaps import iter_overlap_clusters
+from .periods import resolve_periods
+from .reports import apply_report_filters, build_report_data
+from .models import Break, DailyAnalytics, TimeEntry, TimeReport, TimeRollup
+from .rollup import rebuild_rollup
+from .timers import get_active_timer
+from .views import (
+    DailyAnalyticsViewSet, DashboardSummaryView, GenerateReportView, PeriodSummaryView, StartTimeEntryViewSet,
+    TimeEntryViewSet, TimeReportViewSet
+)
+
+
+def _aware(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class ReportEngineTests(TestCase):
+    """Report generation uses a fixed number of GROUP BY queries."""
+
+    user_count = 6
+    # Session/report inserts plus the 5 aggregate queries, with some headroom
+    max_queries = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Report Business')
+        cls.users = [
+            User.objects.create_user(
+                email=f'reporter{i}@example.com', password='password', first_name=f'Reporter{i}',
+                business=cls.business
+            )
+            for i in range(cls.user_count)
+        ]
+        cls.client_obj = Client.objects.create(business=cls.business, client_code='RP-001', name='Client')
+
+        entries = []
+        for i, user in enumerate(cls.users):
+            for day in range(1, 32):
+                start = _aware(2024, 1, day, 9)
+                entries.append(TimeEntry(
+                    user=user,
+                    business=cls.business,
+                    client=cls.client_obj if day % 2 else None,
+                    start_time=start,
+                    end_time=start + timedelta(hours=i + 1),
+                    duration=timedelta(hours=i + 1),
+                ))
+        # Outside the report period
+        entries.append(TimeEntry(
+            user=cls.users[0], business=cls.business, start_time=_aware(2024, 2, 1, 9),
+            duration=timedelta(hours=5)
+        ))
+        TimeEntry.objects.bulk_create(entries)
+
+    def _generate(self, **data):
+        request = APIRequestFactory().post('/api/time-management/reports/generate/', {
+            'name': 'January',
+            'start_date': '2024-01-01',
+            'end_date': '2024-01-31',
+            **data
+        }, format='json')
+        force_authenticate(request, user=self.users[0])
+        with CaptureQueriesContext(connection) as ctx:
+            response = GenerateReportView.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['data'], len(ctx.captured_queries)
+
+    def test_monthly_report_query_count_is_constant(self):
+        data, queries = self._generate(report_format='daily')
+
+        self.assertLessEqual(queries, self.max_queries)
+        self.assertEqual(data['entry_count'], self.user_count * 31)
+        self.assertAlmostEqual(data['total_hours'], 31 * sum(range(1, self.user_count + 1)))
+
+        by_user = {row['user_id']: row for row in data['user_data']}
+        self.assertEqual(by_user[self.users[2].id]['hours'], 31 * 3)
+        self.assertEqual(by_user[self.users[2].id]['entry_count'], 31)
+        self.assertEqual(data['client_data'][0]['entry_count'], self.user_count * 16)
+
+        chart = data['chart_data']
+        self.assertEqual(len(chart['labels']), 31)
+        self.assertEqual(chart['labels'][0], '2024-01-01')
+        self.assertEqual(len(chart['datasets']), self.user_count)
+        dataset = next(d for d in chart['datasets'] if d['label'] == 'Reporter2')
+        self.assertEqual(dataset['data'], [3.0] * 31)
+
+    def test_weekly_chart_for_single_user(self):
+        data, _ = self._generate(report_format='weekly', filters={'user_id': self.users[1].id})
+
+        chart = data['chart_data']
+        # 2024-01-01 is a Monday: five weekly buckets, the last one holds 29-31
+        self.assertEqual(chart['labels'][0], date(2024, 1, 1).strftime('Week %W, %Y'))
+        self.assertEqual(len(chart['datasets']), 1)
+        self.assertEqual(chart['datasets'][0]['data'], [14.0, 14.0, 14.0, 14.0, 6.0])
+        self.assertEqual(data['entry_count'], 31)
+
+
+class TimeRollupTests(TestCase):
+    """The rollup follows time entry changes and feeds the dashboard."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Rollup Business')
+        cls.user = User.objects.create_user(
+            email='rollup@example.com', password='password', first_name='Rollup',
+            business=cls.business
+        )
+        cls.client_obj = Client.objects.create(business=cls.business, client_code='RU-001', name='Client')
+
+    def _cells(self):
+        return {
+            (row.date, row.client_id): (row.duration, row.billable_duration, row.entry_count)
+            for row in TimeRollup.objects.filter(user=self.user)
+        }
+
+    def test_rollup_follows_save_stop_move_and_delete(self):
+        day = date(2024, 3, 4)
+        start = _aware(2024, 3, 4, 9)
+        entry = TimeEntry.objects.create(
+            user=self.user, business=self.business, client=self.client_obj, start_time=start
+        )
+        # A running timer is counted but has no duration yet
+        self.assertEqual(self._cells(), {(day, self.client_obj.id): (timedelta(0), timedelta(0), 1)})
+
+        TimeEntry.objects.create(
+            user=self.user, business=self.business, client=self.client_obj, start_time=start,
+            end_time=start + timedelta(hours=1), is_billable=False
+        )
+        entry = TimeEntry.objects.get(pk=entry.pk)
+        entry.end_time = start + timedelta(hours=2)
+        entry.save()
+        self.assertEqual(
+            self._cells(), {(day, self.client_obj.id): (timedelta(hours=3), timedelta(hours=2), 2)}
+        )
+
+        # Moving the entry to another day and client updates both cells
+        entry.start_time = _aware(2024, 3, 5, 9)
+        entry.end_time = _aware(2024, 3, 5, 10)
+        entry.client = None
+        entry.save()
+        self.assertEqual(self._cells(), {
+            (day, self.client_obj.id): (timedelta(hours=1), timedelta(0), 1),
+            (date(2024, 3, 5), None): (timedelta(hours=1), timedelta(hours=1), 1),
+        })
+
+        entry.delete()
+        self.assertEqual(self._cells(), {(day, self.client_obj.id): (timedelta(hours=1), timedelta(0), 1)})
+
+        expected = self._cells()
+        TimeRollup.objects.all().delete()
+        self.assertEqual(rebuild_rollup(self.business.id), 1)
+        self.assertEqual(self._cells(), expected)
+
+    def test_client_delete_moves_hours_to_no_client(self):
+        day = date(2024, 3, 4)
+        start = _aware(2024, 3, 4, 9)
+        client = Client.objects.create(business=self.business, client_code='RU-002', name='Deleted')
+        TimeEntry.objects.create(
+            user=self.user, business=self.business, client=client, start_time=start,
+            end_time=start + timedelta(hours=2)
+        )
+        TimeEntry.objects.create(
+            user=self.user, business=self.business, start_time=start, end_time=start + timedelta(hours=1)
+        )
+
+        client.delete()
+        self.assertEqual(self._cells(), {(day, None): (timedelta(hours=3), timedelta(hours=3), 2)})
+
+    def test_dashboard_reads_rollup(self):
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(today, datetime.min.time())) + timedelta(hours=1)
+        TimeEntry.objects.create(
+            user=self.user, business=self.business, start_time=start, end_time=start + timedelta(minutes=90)
+        )
+
+        request = APIRequestFactory().get('/api/time-management/dashboard/')
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = DashboardSummaryView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['today']['hours'], 1.5)
+        self.assertEqual(response.data['today']['entry_count'], 1)
+        self.assertEqual(response.data['this_month']['hours'], 1.5)
+        # Rollup aggregate and active timer lookup
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+
+class DailyAnalyticsGenerateTests(TestCase):
+    """DailyAnalyticsViewSet.generate reads the day in a constant number of queries."""
+
+    entry_count = 240
+    task_count = 12
+    # User, entries and breaks, plus update_or_create (select, insert and savepoints)
+    max_queries = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Analytics Business')
+        cls.user = User.objects.create_user(
+            email='analytics@example.com', password='password', first_name='Analytics',
+            business=cls.business
+        )
+        workspace = cls.business.workspaces.first()
+        cls.tasks = [
+            Task.objects.create(title=f'Task {i}', business=cls.business, workspace=workspace, creator=cls.user)
+            for i in range(cls.task_count)
+        ]
+        cls.tasks[0].completed_at = _aware(2024, 5, 10, 18)
+        cls.tasks[0].save()
+
+        # Six-minute entries every six minutes from 00:00, cycling through the tasks
+        entries = []
+        for i in range(cls.entry_count):
+            start = _aware(2024, 5, 10) + timedelta(minutes=6 * i)
+            entries.append(TimeEntry(
+                user=cls.user, business=cls.business, task=cls.tasks[i % cls.task_count],
+                start_time=start, end_time=start + timedelta(minutes=6), duration=timedelta(minutes=6),
+                productivity_score=50 + i % 2 * 10
+            ))
+        TimeEntry.objects.bulk_create(entries)
+        Break.objects.create(
+            time_entry=TimeEntry.objects.order_by('start_time').first(),
+            start_time=_aware(2024, 5, 10, 0, 1), end_time=_aware(2024, 5, 10, 0, 4),
+            duration=timedelta(minutes=3)
+        )
+
+    def test_generate_benchmark(self):
+        request = APIRequestFactory().post('/api/time-management/analytics/generate/?date=2024-05-10')
+        force_authenticate(request, user=self.user)
+        view = DailyAnalyticsViewSet.as_view({'post': 'generate'})
+        with CaptureQueriesContext(connection) as ctx:
+            response = view(request)
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertLessEqual(len(ctx.captured_queries), self.max_queries)
+        entry_queries = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT "time_management_timeentry"')]
+        self.assertEqual(len(entry_queries), 1)
+
+        data = response.data
+        self.assertEqual(data['total_hours'], 24)
+        self.assertEqual(data['break_time'], 0.05)
+        self.assertEqual(data['productivity_score'], 55)
+        self.assertEqual(data['tasks_worked'], self.task_count)
+        self.assertEqual(data['tasks_completed'], 1)
+
+        hours = data['hourly_data']['hours']
+        self.assertEqual([hour['time'] for hour in hours], [60.0] * 24)
+        # Entries ending exactly on an hour boundary are not counted in the next hour
+        self.assertEqual([hour['entry_count'] for hour in hours], [10] * 24)
+        tasks = data['task_data']['tasks']
+        self.assertEqual(tasks[0]['task_id'], self.tasks[0].id)
+        self.assertEqual(tasks[0]['entry_count'], self.entry_count // self.task_count)
+        self.assertEqual(tasks[0]['hours'], 2)
+
+    def test_hourly_distribution_splits_overlapping_entries(self):
+        entries = [
+            {'start_time': _aware(2024, 5, 10, 9, 30), 'end_time': _aware(2024, 5, 10, 11, 0)},
+            {'start_time': _aware(2024, 5, 10, 10, 45), 'end_time': _aware(2024, 5, 10, 10, 50)},
+            # Running timer and an entry crossing midnight
+            {'start_time': _aware(2024, 5, 10, 12, 0), 'end_time': None},
+            {'start_time': _aware(2024, 5, 10, 23, 30), 'end_time': _aware(2024, 5, 11, 1, 0)},
+        ]
+        hours = hourly_distribution(entries, date(2024, 5, 10))
+
+        self.assertEqual(hours[9], {'hour': 9, 'time': 30.0, 'entry_count': 1})
+        self.assertEqual(hours[10], {'hour': 10, 'time': 65.0, 'entry_count': 2})
+        self.assertEqual(hours[11]['entry_count'], 0)
+        self.assertEqual(hours[12]['time'], 0)
+        self.assertEqual(hours[23], {'hour': 23, 'time': 30.0, 'entry_count': 1})
+
+
+class PrecomputeDailyAnalyticsTests(TestCase):
+    """precompute_daily_analytics fills DailyAnalytics for all users in one pass."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Precompute Business')
+        cls.users = [
+            User.objects.create_user(
+                email=f'precompute{i}@example.com', password='password', business=cls.business
+            )
+            for i in range(3)
+        ]
+        entries = []
+        for i, user in enumerate(cls.users[:2]):
+            for day in (1, 2):
+                for hour in (9, 13):
+                    start = _aware(2024, 7, day, hour)
+                    entries.append(TimeEntry(
+                        user=user, business=cls.business, start_time=start,
+                        end_time=start + timedelta(hours=i + 1), duration=timedelta(hours=i + 1),
+                        is_billable=hour == 9
+                    ))
+        TimeEntry.objects.bulk_create(entries)
+        # Left over from entries that have since been deleted
+        DailyAnalytics.objects.create(business=cls.business, user=cls.users[2], date=date(2024, 7, 1), total_hours=5)
+        # Outside the range, left untouched
+        DailyAnalytics.objects.create(business=cls.business, user=cls.users[2], date=date(2024, 6, 30), total_hours=5)
+
+    def test_command_upserts_all_users(self):
+        DailyAnalytics.objects.create(business=self.business, user=self.users[0], date=date(2024, 7, 1), total_hours=99)
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('precompute_daily_analytics', start='2024-07-01', end='2024-07-02', stdout=StringIO())
+
+        # Constant number of queries, independent of users and days
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+        analytics = {
+            (row.user_id, row.date): row
+            for row in DailyAnalytics.objects.filter(date__range=(date(2024, 7, 1), date(2024, 7, 2)))
+        }
+        self.assertEqual(len(analytics), 5)
+        self.assertEqual(analytics[(self.users[0].id, date(2024, 7, 1))].total_hours, 2)
+        self.assertEqual(analytics[(self.users[1].id, date(2024, 7, 2))].total_hours, 4)
+        self.assertEqual(analytics[(self.users[1].id, date(2024, 7, 2))].billable_hours, 2)
+        self.assertEqual(analytics[(self.users[1].id, date(2024, 7, 2))].hourly_data['hours'][13]['time'], 60)
+        self.assertEqual(analytics[(self.users[2].id, date(2024, 7, 1))].total_hours, 0)
+        self.assertEqual(DailyAnalytics.objects.get(user=self.users[2], date=date(2024, 6, 30)).total_hours, 5)
+
+
+class TimeReportExportTests(TestCase):
+    """Report exports are streamed in chunks."""
+
+    entry_count = 1200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Export Business')
+        cls.user = User.objects.create_user(
+            email='export@example.com', password='password', first_name='Export',
+            business=cls.business
+        )
+        start = _aware(2024, 8, 1, 9)
+        TimeEntry.objects.bulk_create([
+            TimeEntry(
+                user=cls.user, business=cls.business, start_time=start + timedelta(minutes=i),
+                end_time=start + timedelta(minutes=i + 30), duration=timedelta(minutes=30),
+                description=f'Entry {i}'
+            )
+            for i in range(cls.entry_count)
+        ])
+        cls.report = TimeReport.objects.create(
+            business=cls.business, creator=cls.user, name='August report',
+            start_date=date(2024, 8, 1), end_date=date(2024, 8, 31)
+        )
+
+    def _export(self, path, **params):
+        request = APIRequestFactory().get(f'/api/time-management/reports/{self.report.id}/{path}/', params)
+        force_authenticate(request, user=self.user)
+        action = 'export_csv' if path == 'export/csv' else 'export_xlsx'
+        response = TimeReportViewSet.as_view({'get': action})(request, pk=self.report.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_entries_csv_is_streamed_in_chunks(self):
+        response = self._export('export/csv', rows='entries')
+        chunks = list(response.streaming_content)
+
+        self.assertGreater(len(chunks), 1)
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(len(lines), self.entry_count + 1)
+        self.assertTrue(lines[0].startswith('Entry ID,Start Time,End Time,Hours'))
+        self.assertIn(',0.5,', lines[1])
+        self.assertIn('attachment; filename="August_report_entries.csv"', response['Content-Disposition'])
+
+    def test_summary_csv_generates_report(self):
+        content = b''.join(self._export('export/csv').streaming_content).decode()
+
+        self.assertIn('Total Hours,600.00', content)
+        self.assertIn('Export,600.00,1200', content)
+
+    def test_entries_xlsx(self):
+        from openpyxl import load_workbook
+
+        content = b''.join(self._export('export/xlsx', rows='entries').streaming_content)
+        sheet = load_workbook(BytesIO(content), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+
+        self.assertEqual(len(rows), self.entry_count + 1)
+        self.assertEqual(rows[1][-1], 'Entry 0')
+
+    def test_iter_csv_chunks(self):
+        chunks = list(iter_csv(([i] for i in range(5)), rows_per_chunk=2))
+        self.assertEqual(chunks, ['0\r\n1\r\n', '2\r\n3\r\n', '4\r\n'])
+
+
+class NetDurationTests(TestCase):
+    """Break-adjusted durations are computed in SQL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Net Business')
+        cls.user = User.objects.create_user(
+            email='net@example.com', password='password', first_name='Net', business=cls.business
+        )
+        start = _aware(2024, 9, 2, 9)
+        cls.with_breaks = TimeEntry.objects.create(
+            user=cls.user, business=cls.business, start_time=start, end_time=start + timedelta(hours=4)
+        )
+        for minutes in (0, 60):
+            Break.objects.create(
+                time_entry=cls.with_breaks, start_time=start + timedelta(minutes=minutes),
+                end_time=start + timedelta(minutes=minutes + 15)
+            )
+        # A running break does not count yet
+        Break.objects.create(time_entry=cls.with_breaks, start_time=start + timedelta(hours=3))
+        cls.without_breaks = TimeEntry.objects.create(
+            user=cls.user, business=cls.business, start_time=start, end_time=start + timedelta(hours=1)
+        )
+        cls.running = TimeEntry.objects.create(user=cls.user, business=cls.business, start_time=start)
+
+    def test_net_duration_matches_effective_duration(self):
+        entries = TimeEntry.objects.filter(user=self.user).with_net_duration()
+        with self.assertNumQueries(1):
+            net = {entry.id: entry.effective_duration() for entry in entries}
+
+        for entry in TimeEntry.objects.filter(user=self.user):
+            self.assertEqual(net[entry.id], entry.effective_duration())
+        self.assertEqual(net[self.with_breaks.id], timedelta(hours=3, minutes=30))
+        self.assertEqual(net[self.running.id], timedelta(0))
+        self.assertEqual(TimeEntry.objects.filter(user=self.user).break_duration_total(), timedelta(minutes=30))
+
+    def test_report_net_hours(self):
+        data = build_report_data(TimeEntry.objects.filter(user=self.user))
+
+        self.assertEqual(data['total_hours'], 5)
+        self.assertEqual(data['total_net_hours'], 4.5)
+        self.assertEqual(data['user_data'][0]['net_hours'], 4.5)
+
+
+class ActiveTimerTests(TestCase):
+    """One running timer per user, looked up from the cache and switched atomically."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Timer Business')
+        cls.user = User.objects.create_user(
+            email='timer@example.com', password='password', business=cls.business
+        )
+        cls.task = Task.objects.create(
+            title='Timed task', business=cls.business, workspace=cls.business.workspaces.first(), creator=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _post(self, action, data=None):
+        request = APIRequestFactory().post(f'/api/time-management/timer/{action}/', data or {}, format='json')
+        force_authenticate(request, user=self.user)
+        return StartTimeEntryViewSet.as_view({'post': action})(request)
+
+    def test_start_uses_cached_lookup_and_rejects_second_timer(self):
+        # "No timer" is not cached, so a timer started by another process is seen right away
+        self.assertIsNone(get_active_timer(self.user.id))
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_active_timer(self.user.id))
+
+        response = self._post('create', {'task_id': self.task.id})
+        self.assertEqual(response.status_code, 200)
+        entry_id = response.data['id']
+
+        self.assertEqual(get_active_timer(self.user.id).id, entry_id)
+        # Served from the cache
+        with self.assertNumQueries(0):
+            self.assertEqual(get_active_timer(self.user.id).id, entry_id)
+
+        response = self._post('create')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['time_entry']['id'], entry_id)
+
+        TimeEntry.objects.get(pk=entry_id).stop_timer()
+        self.assertIsNone(get_active_timer(self.user.id))
+
+    def test_switch_stops_and_starts_in_one_step(self):
+        first = self._post('switch', {'task_id': self.task.id})
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNone(first.data['stopped_entry'])
+
+        second = self._post('switch', {'description': 'Next'})
+        self.assertEqual(second.status_code, 200)
+        stopped = TimeEntry.objects.get(pk=first.data['time_entry']['id'])
+        started = TimeEntry.objects.get(pk=second.data['time_entry']['id'])
+
+        self.assertEqual(second.data['stopped_entry']['id'], stopped.id)
+        self.assertEqual(stopped.end_time, started.start_time)
+        self.assertEqual(get_active_timer(self.user.id), started)
+        self.assertEqual(TimeEntry.objects.filter(user=self.user, end_time__isnull=True).count(), 1)
+
+    def test_database_rejects_second_open_entry(self):
+        TimeEntry.objects.create(user=self.user, business=self.business, start_time=timezone.now())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TimeEntry.objects.create(user=self.user, business=self.business, start_time=timezone.now())
+
+
+class TimeEntryImportTests(TestCase):
+    """Bulk import validates rows in memory and inserts them in chunks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Import Business')
+        cls.user = User.objects.create_user(
+            email='import@example.com', password='password', business=cls.business
+        )
+        cls.colleague = User.objects.create_user(
+            email='colleague@example.com', password='password', business=cls.business
+        )
+        cls.task = Task.objects.create(
+            title='Imported task', business=cls.business, workspace=cls.business.workspaces.first(), creator=cls.user
+        )
+        cls.client_obj = Client.objects.create(business=cls.business, client_code='IM-001', name='Client')
+        cls.existing = TimeEntry.objects.create(
+            user=cls.user, business=cls.business,
+            start_time=_aware(2024, 10, 1, 9), end_time=_aware(2024, 10, 1, 10)
+        )
+
+    def _import(self, body, content_type, dry_run=False, user=None):
+        path = '/api/time-management/entries/import/' + ('?dry_run=true' if dry_run else '')
+        request = APIRequestFactory().post(path, body, content_type=content_type)
+        force_authenticate(request, user=user or self.user)
+        return TimeEntryViewSet.as_view({'post': 'bulk_import'})(request)
+
+    def test_csv_rows_are_validated_per_row(self):
+        body = '\n'.join([
+            'start_time,end_time,duration,task_id,client_id,user_email,is_billable,description',
+            f'2024-10-01T10:00:00,2024-10-01T12:00:00,,{self.task.id},{self.client_obj.id},,true,ok',
+            '2024-10-01T11:00:00,,1,,,,,overlaps row 1',
+            '2024-10-01T08:30:00,2024-10-01T09:30:00,,,,,,overlaps existing',
+            '2024-10-01T13:00:00,,1.5,999999,,,,bad task',
+            '2024-10-01T11:00:00,2024-10-01T12:00:00,,,,colleague@example.com,no,other user',
+            'not a date,,,,,,,bad date',
+        ])
+        response = self._import(body, 'text/csv')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['row_count'], 6)
+        self.assertEqual(response.data['created'], 1)
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(errors[2], {'start_time': 'Overlaps row 1'})
+        self.assertEqual(errors[3], {'start_time': f'Overlaps existing time entry {self.existing.id}'})
+        self.assertEqual(errors[4], {'task_id': 'Invalid task ID'})
+        # Members cannot import entries for colleagues
+        self.assertEqual(errors[5], {'user_email': 'Only staff can import time entries for other users'})
+        self.assertIn('start_time', errors[6])
+
+        imported = TimeEntry.objects.get(description='ok')
+        self.assertEqual(imported.duration, timedelta(hours=2))
+        self.assertEqual(imported.task, self.task)
+        # The rollup is refreshed even though bulk_create skips signals
+        self.assertEqual(
+            TimeRollup.objects.get(user=self.user, task=self.task).duration, timedelta(hours=2)
+        )
+
+    def test_jsonl_import_runs_in_constant_queries(self):
+        lines = [
+            json.dumps({
+                'start_time': (_aware(2024, 11, 1) + timedelta(minutes=10 * i)).isoformat(),
+                'duration': 1 / 6,
+                'task_id': self.task.id,
+            })
+            for i in range(3000)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._import('\n'.join(lines), 'application/x-ndjson', dry_run=True)
+        self.assertEqual(response.data['valid'], 3000)
+        self.assertEqual(response.data['created'], 0)
+        # Foreign keys and existing entries, independent of the row count
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+        response = self._import('\n'.join(lines), 'application/x-ndjson')
+        self.assertEqual(response.data['created'], 3000)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(TimeEntry.objects.filter(task=self.task).count(), 3000)
+
+    def test_staff_can_import_for_others_and_non_finite_durations_are_row_errors(self):
+        staff = User.objects.create_user(
+            email='import-staff@example.com', password='password', business=self.business, is_staff=True
+        )
+        body = '\n'.join([
+            'start_time,duration,user_email,is_billable,description',
+            '2024-10-02T11:00:00,1,colleague@example.com,no,other user',
+            '2024-10-02T13:00:00,nan,,,not a number',
+            '2024-10-02T14:00:00,inf,,,infinite',
+            '2024-10-02T15:00:00,1e300,,,too long',
+        ])
+        response = self._import(body, 'text/csv', user=staff)
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['created'], 1)
+        other = TimeEntry.objects.get(description='other user')
+        self.assertEqual(other.user, self.colleague)
+        self.assertFalse(other.is_billable)
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(set(errors), {2, 3, 4})
+        self.assertTrue(all('duration' in row_errors for row_errors in errors.values()))
+
+    def test_rejects_unreadable_jsonl(self):
+        response = self._import('[1, 2]', 'application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+
+    def test_oversized_upload_stops_reading_past_the_limit(self):
+        read = []
+
+        def rows():
+            for number in itertools.count(1):
+                read.append(number)
+                yield number, {}
+
+        with mock.patch('time_management.imports.MAX_IMPORT_ROWS', 10), self.assertRaises(ImportFormatError):
+            TimeEntryImporter(self.business, self.user).run(rows())
+        self.assertEqual(len(read), 11)
+
+
+class OverlapDetectionTests(TestCase):
+    """Overlapping entries are grouped into clusters per user."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Overlap Business')
+        cls.user = User.objects.create_user(
+            email='overlap@example.com', password='password', business=cls.business
+        )
+        cls.other = User.objects.create_user(
+            email='overlap-other@example.com', password='password', business=cls.business
+        )
+
+        def entry(user, start, end):
+            return TimeEntry.objects.create(
+                user=user, business=cls.business,
+                start_time=_aware(2024, 9, 2, *start), end_time=_aware(2024, 9, 2, *end)
+            )
+
+        # 9:00-11:00, 10:00-12:00 and 11:30-13:00 chain into one cluster (9:00-13:00)
+        cls.chain = [entry(cls.user, (9,), (11,)), entry(cls.user, (10,), (12,)), entry(cls.user, (11, 30), (13,))]
+        # Touching but not overlapping
+        cls.after = entry(cls.user, (13,), (14,))
+        # Same time as the chain, but another user
+        cls.other_entry = entry(cls.other, (10,), (11,))
+
+    def test_clusters(self):
+        clusters = list(iter_overlap_clusters(TimeEntry.objects.filter(business=self.business)))
+
+        self.assertEqual(len(clusters), 1)
+        cluster = clusters[0]
+        self.assertEqual(cluster['user_id'], self.user.id)
+        self.assertEqual(cluster['entry_ids'], [entry.id for entry in self.chain])
+        self.assertEqual(cluster['duration'], timedelta(hours=5, minutes=30))
+        self.assertEqual(cluster['merged_duration'], timedelta(hours=4))
+        self.assertEqual(cluster['overlap'], timedelta(hours=1, minutes=30))
+
+    def test_overlapping_lookup(self):
+        found = TimeEntry.objects.overlapping(_aware(2024, 9, 2, 12, 30), _aware(2024, 9, 2, 13))
+        self.assertEqual(set(found), {self.chain[2]})
+
+    def test_overlapping_ignores_inverted_entries(self):
+        # Legacy rows can end before they start; they must not break or match the lookup
+        TimeEntry.objects.filter(pk=self.after.pk).update(end_time=_aware(2024, 9, 2, 12))
+        found = TimeEntry.objects.overlapping(_aware(2024, 9, 2, 12, 30), _aware(2024, 9, 2, 13, 30))
+        self.assertEqual(set(found), {self.chain[2]})
+
+    def test_partial_update_rejects_start_after_stored_end(self):
+        request = APIRequestFactory().patch(
+            f'/api/time-management/entries/{self.after.id}/',
+            {'start_time': _aware(2024, 9, 2, 15).isoformat()}, format='json'
+        )
+        force_authenticate(request, user=self.user)
+        response = TimeEntryViewSet.as_view({'patch': 'partial_update'})(request, pk=self.after.id)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_time', response.data)
+
+    def test_endpoint(self):
+        request = APIRequestFactory().get('/api/time-management/entries/overlaps/', {'all_users': 'true'})
+        force_authenticate(request, user=self.user)
+        response = TimeEntryViewSet.as_view({'get': 'overlaps'})(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['cluster_count'], 1)
+        self.assertEqual(response.data['entry_count'], 3)
+        self.assertAlmostEqual(response.data['overlap_hours'], 1.5)
+        self.assertEqual(response.data['clusters'][0]['merged_hours'], 4)
+
+    def test_report_overlap_modes(self):
+        time_entries = TimeEntry.objects.filter(business=self.business)
+
+        merged = build_report_data(time_entries, overlap='merge')
+        self.assertAlmostEqual(merged['total_hours'], 7.5 - 1.5)
+        self.assertAlmostEqual(merged['overlap_hours'], 1.5)
+        user_row = next(row for row in merged['user_data'] if row['user_id'] == self.user.id)
+        self.assertAlmostEqual(user_row['hours'], 5)
+
+        excluded = build_report_data(apply_report_filters(time_entries, {'overlap': 'exclude'}))
+        self.assertEqual(excluded['entry_count'], 2)
+        self.assertAlmostEqual(excluded['total_hours'], 2)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('find_time_overlaps', business=self.business.id, stdout=out)
+        self.assertIn('Found 1 overlap clusters (1.50 hours', out.getvalue())
+
+
+class PeriodSummaryTests(TestCase):
+    """Any set of periods is summarised in one conditional-aggregation query."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = Business.objects.create(name='Summary Business')
+        cls.users = [
+            User.objects.create_user(email=f'summary{i}@example.com', password='password', business=cls.business)
+            for i in range(3)
+        ]
+        cls.business.owner = cls.users[0]
+        cls.business.save()
+        cls.client_obj = Client.objects.create(business=cls.business, client_code='SU-001', name='Client')
+        cls.fiscal_year = FiscalYear.objects.create(
+            client=cls.client_obj, fiscal_period=1, start_date=date(2024, 4, 1), end_date=date(2025, 3, 31)
+        )
+        today = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+        for i, user in enumerate(cls.users):
+            for start in (today + timedelta(hours=1), _aware(2024, 6, 3, 9), _aware(2025, 4, 1, 9)):
+                TimeEntry.objects.create(
+                    user=user, business=cls.business, start_time=start, end_time=start + timedelta(hours=i + 1),
+                    is_billable=i != 0
+                )
+
+    def _get(self, params, user=None):
+        request = APIRequestFactory().get('/api/time-management/summary/', params)
+        force_authenticate(request, user=user or self.users[0])
+        return PeriodSummaryView.as_view()(request)
+
+    def test_resolve_periods(self):
+        periods = resolve_periods(
+            ['last_week', 'last_month', 'this_quarter'], date(2024, 3, 13), custom=['q1:2024-01-01:2024-03-31']
+        )
+        self.assertEqual(periods['last_week'], (date(2024, 3, 4), date(2024, 3, 10)))
+        self.assertEqual(periods['last_month'], (date(2024, 2, 1), date(2024, 2, 29)))
+        self.assertEqual(periods['this_quarter'], (date(2024, 1, 1), date(2024, 3, 13)))
+        self.assertEqual(periods['q1'], (date(2024, 1, 1), date(2024, 3, 31)))
+        with self.assertRaises(ValueError):
+            resolve_periods(['next_year'], date(2024, 3, 13))
+
+    def test_current_user(self):
+        response = self._get({'periods': 'today', 'fiscal_year_id': self.fiscal_year.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals']['today']['hours'], 1)
+        self.assertEqual(response.data['totals'][f'fiscal_year_{self.fiscal_year.id}']['entry_count'], 1)
+        self.assertEqual(response.data['totals']['today']['billable_hours'], 0)
+        self.assertNotIn('users', response.data)
+
+    def test_team_breakdown_in_one_query(self):
+        fiscal_year = f'fiscal_year_{self.fiscal_year.id}'
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._get({
+                'periods': 'today,this_year', 'fiscal_year_id': self.fiscal_year.id,
+                'range': 'june:2024-06-01:2024-06-30', 'by_user': 'true',
+            })
+
+        self.assertEqual(response.status_code, 200)
+        # Fiscal years, the grouped rollup aggregate and user names
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual([row['user_id'] for row in response.data['users']], [user.id for user in self.users])
+        self.assertEqual(response.data['users'][2]['periods']['june']['hours'], 3)
+        self.assertEqual(response.data['totals']['june']['hours'], 1 + 2 + 3)
+        self.assertEqual(response.data['totals'][fiscal_year]['billable_hours'], 2 + 3)
+        self.assertEqual(response.data['totals']['today']['entry_count'], 3)
+
+    def test_team_breakdown_requires_owner_or_staff(self):
+        member = self.users[1]
+        self.assertEqual(self._get({'periods': 'today', 'by_user': 'true'}, user=member).status_code, 403)
+
+        member.is_staff = True
+        self.assertEqual(self._get({'periods': 'today', 'by_user': 'true'}, user=member).status_code, 200)
 
-# Create your tests here.
+    def test_invalid_parameters(self):
+        self.assertEqual(self._get({'periods': 'someday'}).status_code, 400)
+        self.assertEqual(self._get({'range': 'bad:2024-02-01:2024-01-01'}).status_code, 400)
+        self.assertEqual(self._get({'fiscal_year_id': 999999}).status_code, 400)
@@ -0,0 +1,84 @@
+"""
+Active timer lookup.
+
+Each user has at most one running time entry (enforced by the partial
+unique constraint ``tm_timeentry_one_open_per_user``). That entry is cached
+per user and invalidated, immediately and again on commit, whenever one of
+the user's entries is saved or deleted, so finding the running timer is a
+cache hit with no query. "No timer" is never cached: a timer started in
+another process, or between our read and the cache write, could otherwise
+stay hidden; that lookup is a single query on the partial unique index
+instead.
+"""
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import TimeEntry
+
+ACTIVE_TIMER_CACHE_TIMEOUT = 60 * 5
+
+
+def get_active_timer(user_id):
+    """The user's running time entry, or None."""
+    key = _key(user_id)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+
+    entry = TimeEntry.objects.filter(user_id=user_id, end_time__isnull=True).first()
+    if entry:
+        cache.set(key, entry, ACTIVE_TIMER_CACHE_TIMEOUT)
+    return entry
+
+
+def invalidate_active_timer(user_id):
+    """Forget the cached timer now and again once the current transaction commits."""
+    key = _key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class ActiveTimerExists(Exception):
+    """The user already has a running timer."""
+
+    def __init__(self, time_entry):
+        super().__init__('You already have an active timer')
+        self.time_entry = time_entry
+
+
+def start_timer(user, stop_current=False, **fields):
+    """
+    Start a new time entry for the user.
+
+    With stop_current, the running entry (if any) is stopped at the same
+    instant in the same transaction; otherwise ActiveTimerExists is raised.
+    Returns (new_entry, stopped_entry).
+    """
+    with transaction.atomic():
+        # Lock the running entry so concurrent switches serialise on it
+        current = TimeEntry.objects.select_for_update().filter(user=user, end_time__isnull=True).first()
+        now = timezone.now()
+        if current:
+            if not stop_current:
+                raise ActiveTimerExists(current)
+            current.end_time = max(now, current.start_time)
+            current.duration = current.end_time - current.start_time
+            current.save()
+
+        try:
+            # Savepoint so a lost race surfaces as ActiveTimerExists, not a broken transaction
+            with transaction.atomic():
+                entry = TimeEntry.objects.create(
+                    user=user,
+                    business=user.business,
+                    start_time=now,
+                    **fields
+                )
+        except IntegrityError:
+            raise ActiveTimerExists(get_active_timer(user.id))
+    return entry, current
+
+
+def _key(user_id):
+    return f'time_management:active_timer:{user_id}'
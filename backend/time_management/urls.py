@@ -12,7 +12,9 @@ router.register(r'timer', views.StartTimeEntryViewSet, basename='timer')
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', views.DashboardSummaryView.as_view(), name='dashboard'),
+    path('summary/', views.PeriodSummaryView.as_view(), name='period-summary'),
     path('timer/start/', views.StartTimeEntryViewSet.as_view({'post': 'create'}), name='start-time-entry'),
+    path('timer/switch/', views.StartTimeEntryViewSet.as_view({'post': 'switch'}), name='switch-time-entry'),
     path('timer/active/', views.StartTimeEntryViewSet.as_view({'get': 'active'}), name='active-time-entry'),
     path('timer/<int:entry_id>/stop/', views.StopTimeEntryViewSet.as_view({'post': 'create'}), name='stop-time-entry'),
     path('entries/<int:entry_id>/breaks/start/', views.StartBreakView.as_view(), name='start-break'),
@@ -1,3 +1,6 @@
+import csv
+import io
+
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -8,7 +11,15 @@ from django.utils import timezone
 from django.db.models import Sum, Count, F, Q, Avg, Min, Max
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
-from .models import TimeEntry, TimeReport, Break, DailyAnalytics
+from .models import TimeEntry, TimeReport, Break, DailyAnalytics, TimeRollup
+from .reports import apply_report_filters, build_report_data, build_chart_data, average_by_bucket
+from .rollup import summarize_periods, summarize_periods_by_user
+from .periods import DEFAULT_PERIODS, resolve_periods
+from .analytics import compute_daily_analytics, entry_rows
+from .exports import iter_entry_rows, iter_summary_rows, streaming_export
+from .timers import ActiveTimerExists, get_active_timer, start_timer
+from .imports import ImportFormatError, TimeEntryImporter, parse_rows
+from .overlaps import overlap_summary
 from .serializers import (
     TimeEntrySerializer, TimeEntryCreateUpdateSerializer, BreakSerializer,
     BreakCreateUpdateSerializer, TimeReportSerializer, TimeReportCreateSerializer,
@@ -84,6 +95,49 @@ class TimeEntryViewSet(viewsets.ModelViewSet):
             business=self.request.user.business
         )
     
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Import time entries from CSV (with a header row) or JSON lines.
+        
+        Send a multipart 'file' field or the raw body with Content-Type text/csv or
+        application/x-ndjson. Columns: start_time, end_time or duration (hours), task_id,
+        client_id, fiscal_year_id, description, is_billable, user_id or user_email
+        (other users only for staff and the business owner).
+        Pass ?file_format=csv|jsonl to override detection and ?dry_run=true to validate
+        without saving.
+        """
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if not upload:
+                return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+            stream = upload.file
+            file_format = 'csv' if upload.name.lower().endswith('.csv') else 'jsonl'
+        else:
+            # Raw body; read directly since no DRF parser handles these content types
+            stream = io.BytesIO(request.body)
+            file_format = 'csv' if content_type == 'text/csv' else 'jsonl'
+        
+        dry_run = request.query_params.get('dry_run', '').lower() == 'true'
+        importer = TimeEntryImporter(request.user.business, request.user, dry_run=dry_run)
+        try:
+            result = importer.run(parse_rows(stream, request.query_params.get('file_format', file_format)))
+        except (ImportFormatError, UnicodeDecodeError, csv.Error) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        response_status = status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK
+        return Response(result, status=response_status)
+    
+    @action(detail=False, methods=['get'])
+    def overlaps(self, request):
+        """
+        Clusters of overlapping time entries (same user, intersecting intervals).
+        Accepts the same user/task/client/date filters as the list; pass
+        ?all_users=true to scan the whole business.
+        """
+        return Response(overlap_summary(self.get_queryset()))
+    
     @action(detail=True, methods=['get'])
     def breaks(self, request, pk=None):
         """Get breaks for a time entry."""
@@ -170,79 +224,18 @@ class TimeReportViewSet(viewsets.ModelViewSet):
         report = self.get_object()
         
         # Generate report data
-        time_entries = TimeEntry.objects.filter(
-            business=report.business,
-            start_time__date__gte=report.start_date,
-            start_time__date__lte=report.end_date
+        time_entries = apply_report_filters(
+            TimeEntry.objects.filter(
+                business=report.business,
+                start_time__date__gte=report.start_date,
+                start_time__date__lte=report.end_date
+            ),
+            report.filters
         )
         
-        # Apply filters
-        filters = report.filters or {}
-        for key, value in filters.items():
-            if key == 'user_id' and value:
-                time_entries = time_entries.filter(user_id=value)
-            elif key == 'task_id' and value:
-                time_entries = time_entries.filter(task_id=value)
-            elif key == 'client_id' and value:
-                time_entries = time_entries.filter(client_id=value)
-        
-        # Calculate total duration
-        total_duration = time_entries.aggregate(
-            total=Sum('duration', filter=Q(duration__isnull=False))
-        )['total'] or timedelta(0)
-        
-        # Calculate data by user
-        user_data = []
-        for user_id, user_name in time_entries.values_list('user__id', 'user__first_name').distinct():
-            user_entries = time_entries.filter(user__id=user_id)
-            user_duration = user_entries.aggregate(
-                total=Sum('duration', filter=Q(duration__isnull=False))
-            )['total'] or timedelta(0)
-            
-            user_data.append({
-                'user_id': user_id,
-                'user_name': user_name,
-                'hours': user_duration.total_seconds() / 3600,
-                'entry_count': user_entries.count()
-            })
-        
-        # Calculate data by task
-        task_data = []
-        for task_id, task_title in time_entries.filter(task__isnull=False).values_list('task__id', 'task__title').distinct():
-            task_entries = time_entries.filter(task__id=task_id)
-            task_duration = task_entries.aggregate(
-                total=Sum('duration', filter=Q(duration__isnull=False))
-            )['total'] or timedelta(0)
-            
-            task_data.append({
-                'task_id': task_id,
-                'task_title': task_title,
-                'hours': task_duration.total_seconds() / 3600,
-                'entry_count': task_entries.count()
-            })
-        
-        # Calculate data by client
-        client_data = []
-        for client_id, client_name in time_entries.filter(client__isnull=False).values_list('client__id', 'client__name').distinct():
-            client_entries = time_entries.filter(client__id=client_id)
-            client_duration = client_entries.aggregate(
-                total=Sum('duration', filter=Q(duration__isnull=False))
-            )['total'] or timedelta(0)
-            
-            client_data.append({
-                'client_id': client_id,
-                'client_name': client_name,
-                'hours': client_duration.total_seconds() / 3600,
-                'entry_count': client_entries.count()
-            })
-        
         # Store report data
         report.data = {
-            'entry_count': time_entries.count(),
-            'total_hours': total_duration.total_seconds() / 3600,
-            'user_data': user_data,
-            'task_data': task_data,
-            'client_data': client_data,
+            **build_report_data(time_entries, overlap=(report.filters or {}).get('overlap')),
             'generated_at': timezone.now().isoformat()
         }
         report.save()
@@ -252,70 +245,39 @@ class TimeReportViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'], url_path='export/csv')
     def export_csv(self, request, pk=None):
-        """Export a time report as CSV."""
+        """
+        Export a time report as CSV.
+        Pass ?rows=entries to export the raw time entries of the report period instead of the summary.
+        """
+        return self._export(request, pk, 'csv')
+    
+    @action(detail=True, methods=['get'], url_path='export/xlsx')
+    def export_xlsx(self, request, pk=None):
+        """Export a time report as XLSX (same options as export/csv)."""
+        return self._export(request, pk, 'xlsx')
+    
+    def _export(self, request, pk, file_format):
+        """Stream the report summary or its raw time entries."""
         report = self.get_object()
+        filename = report.name.replace(" ", "_")
+        
+        if request.query_params.get('rows') == 'entries':
+            time_entries = apply_report_filters(
+                TimeEntry.objects.filter(
+                    business=report.business,
+                    start_time__date__gte=report.start_date,
+                    start_time__date__lte=report.end_date
+                ),
+                report.filters
+            )
+            return streaming_export(iter_entry_rows(time_entries), file_format, f'{filename}_entries')
         
         # Ensure report data is generated
         if not report.data:
             self.generate(request, pk)
             report.refresh_from_db()
         
-        import csv
-        import io
-        from django.http import HttpResponse
-        
-        # Create CSV buffer
-        buffer = io.StringIO()
-        writer = csv.writer(buffer)
-        
-        # Write header
-        writer.writerow(['Report Name', report.name])
-        writer.writerow(['Period', f"{report.start_date} to {report.end_date}"])
-        writer.writerow(['Generated At', report.data.get('generated_at', '')])
-        writer.writerow(['Total Hours', f"{report.data.get('total_hours', 0):.2f}"])
-        writer.writerow(['Entry Count', report.data.get('entry_count', 0)])
-        writer.writerow([])
-        
-        # Write user data
-        writer.writerow(['User Data'])
-        writer.writerow(['User ID', 'User Name', 'Hours', 'Entry Count'])
-        for user in report.data.get('user_data', []):
-            writer.writerow([
-                user.get('user_id', ''),
-                user.get('user_name', ''),
-                f"{user.get('hours', 0):.2f}",
-                user.get('entry_count', 0)
-            ])
-        writer.writerow([])
-        
-        # Write task data
-        writer.writerow(['Task Data'])
-        writer.writerow(['Task ID', 'Task Title', 'Hours', 'Entry Count'])
-        for task in report.data.get('task_data', []):
-            writer.writerow([
-                task.get('task_id', ''),
-                task.get('task_title', ''),
-                f"{task.get('hours', 0):.2f}",
-                task.get('entry_count', 0)
-            ])
-        writer.writerow([])
-        
-        # Write client data
-        writer.writerow(['Client Data'])
-        writer.writerow(['Client ID', 'Client Name', 'Hours', 'Entry Count'])
-        for client in report.data.get('client_data', []):
-            writer.writerow([
-                client.get('client_id', ''),
-                client.get('client_name', ''),
-                f"{client.get('hours', 0):.2f}",
-                client.get('entry_count', 0)
-            ])
-        
-        # Create HTTP response
-        response = HttpResponse(buffer.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{report.name.replace(" ", "_")}.csv"'
-        
-        return response
+        return streaming_export(iter_summary_rows(report), file_format, filename)
 
 
 class DashboardSummaryView(APIView):
@@ -324,62 +286,27 @@ class DashboardSummaryView(APIView):
     
     def get(self, request):
         """Get dashboard summary."""
-        now = timezone.now()
-        start_of_week = now - timedelta(days=now.weekday())
-        start_of_month = now.replace(day=1)
-        
-        # Get time entries for different periods
-        time_entries = TimeEntry.objects.filter(
-            business=request.user.business
-        )
+        periods = resolve_periods(DEFAULT_PERIODS, timezone.localdate())
         
-        # Filter by user if requested
+        # Filter by user if requested, default to current user's entries
         user_id = request.query_params.get('user_id')
-        if user_id:
-            time_entries = time_entries.filter(user_id=user_id)
-        else:
-            # Default to current user's entries
-            time_entries = time_entries.filter(user=request.user)
-        
-        # Calculate stats
-        today_entries = time_entries.filter(start_time__date=now.date())
-        this_week_entries = time_entries.filter(start_time__gte=start_of_week)
-        this_month_entries = time_entries.filter(start_time__gte=start_of_month)
-        
-        # Calculate total durations
-        today_duration = today_entries.aggregate(
-            total=Sum('duration', filter=Q(duration__isnull=False))
-        )['total'] or timedelta(0)
-        
-        week_duration = this_week_entries.aggregate(
-            total=Sum('duration', filter=Q(duration__isnull=False))
-        )['total'] or timedelta(0)
+        rollups = TimeRollup.objects.filter(
+            business=request.user.business,
+            user_id=user_id or request.user.id,
+            date__gte=min(start for start, _ in periods.values()),
+            date__lte=max(end for _, end in periods.values())
+        )
         
-        month_duration = this_month_entries.aggregate(
-            total=Sum('duration', filter=Q(duration__isnull=False))
-        )['total'] or timedelta(0)
+        # Calculate stats for all periods in one query
+        periods = summarize_periods(rollups, periods)
         
         # Get current active timer if any
         active_timer = None
         if not user_id or str(request.user.id) == user_id:
-            active_timer = time_entries.filter(
-                user=request.user,
-                end_time__isnull=True
-            ).first()
+            active_timer = get_active_timer(request.user.id)
         
         summary_data = {
-            'today': {
-                'hours': today_duration.total_seconds() / 3600,
-                'entry_count': today_entries.count()
-            },
-            'this_week': {
-                'hours': week_duration.total_seconds() / 3600,
-                'entry_count': this_week_entries.count()
-            },
-            'this_month': {
-                'hours': month_duration.total_seconds() / 3600,
-                'entry_count': this_month_entries.count()
-            },
+            **periods,
             'has_active_timer': active_timer is not None,
             'active_timer': active_timer
         }
@@ -388,6 +315,91 @@ class DashboardSummaryView(APIView):
         return Response(serializer.data)
 
 
+class PeriodSummaryView(APIView):
+    """API view to summarise hours over any set of named periods."""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """
+        Hours, billable hours and entry counts per period, in one query.
+        
+        Query parameters:
+        - periods: comma-separated presets (today, yesterday, this_week, last_week,
+          last_7_days, this_month, last_month, last_30_days, this_quarter, this_year,
+          last_12_months); defaults to today,this_week,this_month
+        - range: custom period as name:YYYY-MM-DD:YYYY-MM-DD (repeatable)
+        - fiscal_year_id: clients.FiscalYear to include as fiscal_year_<id> (repeatable)
+        - user_id: summarise this user instead of the current user
+        - by_user=true: summarise the whole business with a per-user breakdown
+          (staff and the business owner only)
+        """
+        business = request.user.business
+        by_user = request.query_params.get('by_user', '').lower() == 'true'
+        if by_user and not (request.user.is_staff or business.owner_id == request.user.id):
+            return Response(
+                {'error': 'Only staff and the business owner can view hours per user'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        names = [name for name in request.query_params.get('periods', '').split(',') if name]
+        
+        from clients.models import FiscalYear
+        fiscal_year_ids = request.query_params.getlist('fiscal_year_id')
+        try:
+            fiscal_years = list(FiscalYear.objects.filter(client__business=business, id__in=fiscal_year_ids))
+        except ValueError:
+            return Response({'error': 'Invalid fiscal year ID'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(fiscal_years) != len(set(fiscal_year_ids)):
+            return Response({'error': 'Invalid fiscal year ID'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            periods = resolve_periods(
+                names or ([] if fiscal_years or request.query_params.getlist('range') else DEFAULT_PERIODS),
+                timezone.localdate(),
+                custom=request.query_params.getlist('range'),
+                fiscal_years=fiscal_years
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Only read rollup rows that fall into at least one period
+        rollups = TimeRollup.objects.filter(
+            business=business,
+            date__gte=min(start for start, _ in periods.values()),
+            date__lte=max(end for _, end in periods.values())
+        )
+        if not by_user:
+            rollups = rollups.filter(user_id=request.query_params.get('user_id') or request.user.id)
+        
+        data = {
+            'periods': {
+                name: {'start_date': start, 'end_date': end}
+                for name, (start, end) in periods.items()
+            },
+        }
+        if not by_user:
+            data['totals'] = summarize_periods(rollups, periods)
+            return Response(data)
+        
+        # One GROUP BY user query; business totals are the sum of the user rows
+        summaries = summarize_periods_by_user(rollups, periods)
+        totals = {name: {'hours': 0, 'billable_hours': 0, 'entry_count': 0} for name in periods}
+        for summary in summaries.values():
+            for name, values in summary.items():
+                for key, value in values.items():
+                    totals[name][key] += value
+        users = User.objects.filter(id__in=summaries.keys()).only('id', 'first_name', 'last_name', 'email')
+        data['totals'] = totals
+        data['users'] = [
+            {
+                'user_id': user.id,
+                'user_name': user.get_full_name(),
+                'periods': summaries[user.id],
+            }
+            for user in sorted(users, key=lambda user: user.id)
+        ]
+        return Response(data)
+
+
 class StartTimeEntryViewSet(viewsets.ViewSet):
     """API view to start and manage time entries."""
     permission_classes = [permissions.IsAuthenticated]
@@ -396,18 +408,12 @@ class StartTimeEntryViewSet(viewsets.ViewSet):
         """Get the active time entry for the current user or for a specific task."""
         task_id = request.query_params.get('task_id')
         
-        # Base query for active time entries
-        query_filter = {
-            'user': request.user,
-            'end_time__isnull': True
-        }
+        # Get the active time entry (cached per user)
+        active_timer = get_active_timer(request.user.id)
         
         # Add task filter if specified
-        if task_id:
-            query_filter['task_id'] = task_id
-        
-        # Get the active time entry
-        active_timer = TimeEntry.objects.filter(**query_filter).first()
+        if active_timer and task_id and str(active_timer.task_id) != task_id:
+            active_timer = None
         
         if active_timer:
             serializer = TimeEntrySerializer(active_timer)
@@ -417,147 +423,77 @@ class StartTimeEntryViewSet(viewsets.ViewSet):
     
     def create(self, request):
         """Start a time entry."""
+        return self._start(request, stop_current=False)
+    
+    @action(detail=False, methods=['post'])
+    def start_timer(self, request):
+        """Alias for create."""
+        return self.create(request)
+    
+    @action(detail=False, methods=['post'])
+    def switch(self, request):
+        """Stop the active timer (if any) and start a new one in a single transaction."""
+        return self._start(request, stop_current=True)
+    
+    def _start(self, request, stop_current):
         # Validate request data
         serializer = TimerStartSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Check if there's already an active timer
-        active_timer = TimeEntry.objects.filter(
-            user=request.user,
-            end_time__isnull=True
-        ).first()
+        fields, error = self._entry_fields(request, serializer.validated_data)
+        if error:
+            return error
         
-        if active_timer:
-            active_serializer = TimeEntrySerializer(active_timer)
+        try:
+            time_entry, stopped_entry = start_timer(request.user, stop_current=stop_current, **fields)
+        except ActiveTimerExists as e:
             return Response(
                 {
-                    'error': 'You already have an active timer',
-                    'time_entry': active_serializer.data
+                    'error': str(e),
+                    'time_entry': TimeEntrySerializer(e.time_entry).data if e.time_entry else None
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # Get task if provided
-        task = None
-        if serializer.validated_data.get('task_id'):
-            from tasks.models import Task
-            try:
-                task = Task.objects.get(
-                    id=serializer.validated_data['task_id'],
-                    business=request.user.business
-                )
-            except Task.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid task ID'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Get client if provided
-        client = None
-        if serializer.validated_data.get('client_id'):
-            from clients.models import Client
-            try:
-                client = Client.objects.get(
-                    id=serializer.validated_data['client_id'],
-                    business=request.user.business
-                )
-            except Client.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid client ID'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Get fiscal year if provided
-        fiscal_year = None
-        if serializer.validated_data.get('fiscal_year_id'):
-            from clients.models import FiscalYear
-            try:
-                fiscal_year = FiscalYear.objects.get(
-                    id=serializer.validated_data['fiscal_year_id'],
-                    client__business=request.user.business
-                )
-            except FiscalYear.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid fiscal year ID'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        
-        # Create a new time entry
-        entry_data = {
-            'user': request.user,
-            'business': request.user.business,
-            'start_time': timezone.now(),
-            'task': task,
-            'client': client,
-            'description': serializer.validated_data.get('description', '')
-        }
-        
-        # Add fiscal year reference if available in the model
-        from django.db.models import Field
-        time_entry_fields = [f.name for f in TimeEntry._meta.get_fields()]
-        if 'fiscal_year' in time_entry_fields and fiscal_year is not None:
-            entry_data['fiscal_year'] = fiscal_year
-            
-        time_entry = TimeEntry.objects.create(**entry_data)
         
         response_serializer = TimeEntrySerializer(time_entry)
-        return Response(response_serializer.data)
+        if not stop_current:
+            return Response(response_serializer.data)
+        return Response({
+            'time_entry': response_serializer.data,
+            'stopped_entry': TimeEntrySerializer(stopped_entry).data if stopped_entry else None
+        })
     
-    @action(detail=False, methods=['post'])
-    def start_timer(self, request):
-        """Alias for create."""
-        return self.create(request)
+    def _entry_fields(self, request, data):
+        """Resolve task, client and fiscal year for a new time entry. Returns (fields, error response)."""
+        fields = {'description': data.get('description', '')}
+        
+        # Get task if provided
+        if data.get('task_id'):
+            try:
+                fields['task'] = Task.objects.get(id=data['task_id'], business=request.user.business)
+            except Task.DoesNotExist:
+                return None, Response({'error': 'Invalid task ID'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Get client if provided
-        client = None
-        if serializer.validated_data.get('client_id'):
+        if data.get('client_id'):
             from clients.models import Client
             try:
-                client = Client.objects.get(
-                    id=serializer.validated_data['client_id'],
-                    business=request.user.business
-                )
+                fields['client'] = Client.objects.get(id=data['client_id'], business=request.user.business)
             except Client.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid client ID'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                return None, Response({'error': 'Invalid client ID'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Get fiscal year if provided
-        fiscal_year = None
-        if serializer.validated_data.get('fiscal_year_id'):
+        if data.get('fiscal_year_id'):
             from clients.models import FiscalYear
             try:
-                fiscal_year = FiscalYear.objects.get(
-                    id=serializer.validated_data['fiscal_year_id'],
+                fields['fiscal_year'] = FiscalYear.objects.get(
+                    id=data['fiscal_year_id'],
                     client__business=request.user.business
                 )
             except FiscalYear.DoesNotExist:
-                return Response(
-                    {'error': 'Invalid fiscal year ID'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                return None, Response({'error': 'Invalid fiscal year ID'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Create a new time entry
-        entry_data = {
-            'user': request.user,
-            'business': request.user.business,
-            'start_time': timezone.now(),
-            'task': task,
-            'client': client,
-            'description': serializer.validated_data.get('description', '')
-        }
-        
-        # Add fiscal year reference if available in the model
-        from django.db.models import Field
-        time_entry_fields = [f.name for f in TimeEntry._meta.get_fields()]
-        if 'fiscal_year' in time_entry_fields and fiscal_year is not None:
-            entry_data['fiscal_year'] = fiscal_year
-            
-        time_entry = TimeEntry.objects.create(**entry_data)
-        
-        response_serializer = TimeEntrySerializer(time_entry)
-        return Response(response_serializer.data)
+        return fields, None
 
 
 class StopTimeEntryViewSet(viewsets.ViewSet):
@@ -705,112 +641,16 @@ class DailyAnalyticsViewSet(viewsets.ModelViewSet):
             start_time__date=target_date
         )
         
-        # Calculate total hours
-        total_duration = time_entries.aggregate(
-            total=Sum('duration', filter=Q(duration__isnull=False))
-        )['total'] or timedelta(0)
-        total_hours = total_duration.total_seconds() / 3600
-        
-        # Calculate billable hours
-        billable_duration = time_entries.filter(is_billable=True).aggregate(
-            total=Sum('duration', filter=Q(duration__isnull=False))
-        )['total'] or timedelta(0)
-        billable_hours = billable_duration.total_seconds() / 3600
-        
-        # Calculate break time
-        break_duration = Break.objects.filter(
-            time_entry__in=time_entries,
-            duration__isnull=False
-        ).aggregate(total=Sum('duration'))['total'] or timedelta(0)
-        break_time = break_duration.total_seconds() / 3600
-        
-        # Calculate tasks worked and completed
-        task_ids = time_entries.filter(task__isnull=False).values_list('task_id', flat=True).distinct()
-        tasks_worked = len(task_ids)
-        
-        # Check how many of these tasks were completed on this day
-        tasks_completed = Task.objects.filter(
-            id__in=task_ids, 
-            status='completed',
-            completed_at__date=target_date
-        ).count()
-        
-        # Calculate task completion rate
-        task_completion_rate = (tasks_completed / tasks_worked * 100) if tasks_worked > 0 else 0
-        
-        # Calculate average productivity score from time entries
-        avg_productivity = time_entries.filter(
-            productivity_score__isnull=False
-        ).aggregate(avg=Avg('productivity_score'))['avg'] or 0
-        
-        # Generate hourly data
-        hourly_data = []
-        for hour in range(24):
-            hour_start = datetime.combine(target_date, datetime.min.time()) + timedelta(hours=hour)
-            hour_end = hour_start + timedelta(hours=1)
-            
-            hour_entries = time_entries.filter(
-                start_time__lt=hour_end,
-                end_time__isnull=False
-            ).filter(
-                Q(end_time__gt=hour_start) | Q(end_time__isnull=True)
-            )
-            
-            # Calculate time spent in this hour
-            hour_duration = timedelta(0)
-            for entry in hour_entries:
-                entry_start = max(entry.start_time, hour_start)
-                entry_end = min(entry.end_time, hour_end) if entry.end_time else hour_end
-                if entry_end > entry_start:
-                    hour_duration += entry_end - entry_start
-            
-            hourly_data.append({
-                'hour': hour,
-                'time': hour_duration.total_seconds() / 60,  # in minutes
-                'entry_count': hour_entries.count()
-            })
-        
-        # Generate task data
-        task_data = []
-        for task_id in task_ids:
-            task_entries = time_entries.filter(task_id=task_id)
-            task_duration = task_entries.aggregate(
-                total=Sum('duration', filter=Q(duration__isnull=False))
-            )['total'] or timedelta(0)
-            
-            # Get task details
-            try:
-                task = Task.objects.get(id=task_id)
-                task_title = task.title
-                task_status = task.status
-            except Task.DoesNotExist:
-                task_title = "Unknown Task"
-                task_status = "unknown"
-            
-            task_data.append({
-                'task_id': task_id,
-                'title': task_title,
-                'status': task_status,
-                'hours': task_duration.total_seconds() / 3600,
-                'entry_count': task_entries.count()
-            })
+        # Fetch the day's entries once and compute every metric in memory
+        entries = list(entry_rows(time_entries))
+        break_duration = time_entries.break_duration_total() if entries else None
         
         # Create or update daily analytics
         analytics, created = DailyAnalytics.objects.update_or_create(
             business=request.user.business,
             user=user,
             date=target_date,
-            defaults={
-                'total_hours': total_hours,
-                'billable_hours': billable_hours,
-                'break_time': break_time,
-                'productivity_score': avg_productivity,
-                'task_completion_rate': task_completion_rate,
-                'tasks_worked': tasks_worked,
-                'tasks_completed': tasks_completed,
-                'hourly_data': {'hours': hourly_data},
-                'task_data': {'tasks': task_data}
-            }
+            defaults=compute_daily_analytics(entries, target_date, break_duration)
         )
         
         serializer = self.get_serializer(analytics)
@@ -946,71 +786,37 @@ class DailyAnalyticsViewSet(viewsets.ModelViewSet):
                 }
                 serializer = ProductivityChartDataSerializer(chart_data)
         else:
-            # Get analytics for the date range
+            # Hours come from the time rollup, break time and productivity from daily analytics
+            daily_hours = TimeRollup.objects.filter(
+                business=request.user.business,
+                user=user,
+                date__range=(start_date, end_date)
+            ).values('date').annotate(
+                total=Sum('duration'),
+                billable=Sum('billable_duration')
+            ).order_by()
             analytics = DailyAnalytics.objects.filter(
                 business=request.user.business,
                 user=user,
                 date__range=(start_date, end_date)
-            ).order_by('date')
+            ).values('date', 'break_time', 'productivity_score')
             
             if group_by == 'daily':
                 # Create a date range to include all dates
                 date_range = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
-                
-                # Prepare data
                 labels = [d.strftime(date_format) for d in date_range]
-                
-                # Initialize data arrays
-                total_hours = [0] * len(date_range)
-                billable_hours = [0] * len(date_range)
-                break_time = [0] * len(date_range)
-                productivity_scores = [0] * len(date_range)
-                
-                # Fill in data where we have analytics
-                for entry in analytics:
-                    day_index = (entry.date - start_date).days
-                    if 0 <= day_index < len(date_range):
-                        total_hours[day_index] = round(entry.total_hours, 1)
-                        billable_hours[day_index] = round(entry.billable_hours, 1)
-                        break_time[day_index] = round(entry.break_time, 1)
-                        productivity_scores[day_index] = round(entry.productivity_score, 1)
-            
+                bucket_index = lambda d: (d - start_date).days
             elif group_by == 'monthly':
-                # Create month labels for the year
+                # Create month labels for the year, values are monthly averages
                 labels = [date(today.year, month, 1).strftime(date_format) for month in range(1, 13)]
-                
-                # Initialize data arrays
-                total_hours = [0] * 12
-                billable_hours = [0] * 12
-                break_time = [0] * 12
-                productivity_scores = [0] * 12
-                
-                # Group by month and calculate averages
-                month_data = {}
-                for entry in analytics:
-                    month = entry.date.month - 1  # 0-indexed
-                    if month not in month_data:
-                        month_data[month] = {
-                            'total': entry.total_hours,
-                            'billable': entry.billable_hours,
-                            'break': entry.break_time,
-                            'productivity': entry.productivity_score,
-                            'count': 1
-                        }
-                    else:
-                        month_data[month]['total'] += entry.total_hours
-                        month_data[month]['billable'] += entry.billable_hours
-                        month_data[month]['break'] += entry.break_time
-                        month_data[month]['productivity'] += entry.productivity_score
-                        month_data[month]['count'] += 1
-                
-                # Calculate monthly averages
-                for month, data in month_data.items():
-                    count = data['count']
-                    total_hours[month] = round(data['total'] / count, 1)
-                    billable_hours[month] = round(data['billable'] / count, 1)
-                    break_time[month] = round(data['break'] / count, 1)
-                    productivity_scores[month] = round(data['productivity'] / count, 1)
+                bucket_index = lambda d: d.month - 1
+            
+            total_hours, billable_hours = average_by_bucket(
+                daily_hours, ['total', 'billable'], bucket_index, len(labels)
+            )
+            break_time, productivity_scores = average_by_bucket(
+                analytics, ['break_time', 'productivity_score'], bucket_index, len(labels)
+            )
             
             if chart_type == 'time':
                 chart_data = {
@@ -1082,196 +888,30 @@ class GenerateReportView(APIView):
         )
         
         # Generate report data
-        time_entries = TimeEntry.objects.filter(
-            business=request.user.business,
-            start_time__date__gte=report.start_date,
-            start_time__date__lte=report.end_date
-        )
-        
-        # Apply filters
         filters = report.filters or {}
-        for key, value in filters.items():
-            if key == 'user_id' and value:
-                time_entries = time_entries.filter(user_id=value)
-            elif key == 'task_id' and value:
-                time_entries = time_entries.filter(task_id=value)
-            elif key == 'client_id' and value:
-                time_entries = time_entries.filter(client_id=value)
-        
-        # Calculate total duration
-        total_duration = time_entries.aggregate(
-            total=Sum('duration', filter=Q(duration__isnull=False))
-        )['total'] or timedelta(0)
-        
-        # Calculate data by user
-        user_data = []
-        for user_id, user_name in time_entries.values_list('user__id', 'user__first_name').distinct():
-            user_entries = time_entries.filter(user__id=user_id)
-            user_duration = user_entries.aggregate(
-                total=Sum('duration', filter=Q(duration__isnull=False))
-            )['total'] or timedelta(0)
-            
-            user_data.append({
-                'user_id': user_id,
-                'user_name': user_name,
-                'hours': user_duration.total_seconds() / 3600,
-                'entry_count': user_entries.count()
-            })
-        
-        # Calculate data by task
-        task_data = []
-        for task_id, task_title in time_entries.filter(task__isnull=False).values_list('task__id', 'task__title').distinct():
-            task_entries = time_entries.filter(task__id=task_id)
-            task_duration = task_entries.aggregate(
-                total=Sum('duration', filter=Q(duration__isnull=False))
-            )['total'] or timedelta(0)
-            
-            task_data.append({
-                'task_id': task_id,
-                'task_title': task_title,
-                'hours': task_duration.total_seconds() / 3600,
-                'entry_count': task_entries.count()
-            })
-        
-        # Calculate data by client
-        client_data = []
-        for client_id, client_name in time_entries.filter(client__isnull=False).values_list('client__id', 'client__name').distinct():
-            client_entries = time_entries.filter(client__id=client_id)
-            client_duration = client_entries.aggregate(
-                total=Sum('duration', filter=Q(duration__isnull=False))
-            )['total'] or timedelta(0)
-            
-            client_data.append({
-                'client_id': client_id,
-                'client_name': client_name,
-                'hours': client_duration.total_seconds() / 3600,
-                'entry_count': client_entries.count()
-            })
+        time_entries = apply_report_filters(
+            TimeEntry.objects.filter(
+                business=request.user.business,
+                start_time__date__gte=report.start_date,
+                start_time__date__lte=report.end_date
+            ),
+            filters
+        )
+        report_data = build_report_data(time_entries, overlap=filters.get('overlap'))
         
         # Generate chart data based on report format
-        chart_data = {}
-        if report.report_format in ['daily', 'weekly', 'monthly']:
-            # Generate date range
-            if report.report_format == 'daily':
-                date_range = [report.start_date + timedelta(days=i) for i in range((report.end_date - report.start_date).days + 1)]
-                date_format = '%Y-%m-%d'
-            elif report.report_format == 'weekly':
-                # Group by weeks
-                date_range = []
-                current = report.start_date
-                while current <= report.end_date:
-                    week_start = current - timedelta(days=current.weekday())
-                    date_range.append(week_start)
-                    current = week_start + timedelta(days=7)
-                date_format = 'Week %W, %Y'
-            elif report.report_format == 'monthly':
-                # Group by months
-                date_range = []
-                current = report.start_date.replace(day=1)
-                while current <= report.end_date:
-                    date_range.append(current)
-                    if current.month == 12:
-                        current = date(current.year + 1, 1, 1)
-                    else:
-                        current = date(current.year, current.month + 1, 1)
-                date_format = '%B %Y'
-            
-            # Format labels
-            labels = [d.strftime(date_format) for d in date_range]
-            
-            # Create datasets for chart
-            datasets = []
-            
-            # For each date in range, calculate total hours
-            if 'user_id' in filters and filters['user_id']:
-                # If a user is specified, show data by date
-                data = [0] * len(date_range)
-                
-                for i, d in enumerate(date_range):
-                    if report.report_format == 'daily':
-                        entries = time_entries.filter(start_time__date=d)
-                    elif report.report_format == 'weekly':
-                        entries = time_entries.filter(
-                            start_time__date__gte=d,
-                            start_time__date__lt=d + timedelta(days=7)
-                        )
-                    elif report.report_format == 'monthly':
-                        if d.month == 12:
-                            next_month = date(d.year + 1, 1, 1)
-                        else:
-                            next_month = date(d.year, d.month + 1, 1)
-                        entries = time_entries.filter(
-                            start_time__date__gte=d,
-                            start_time__date__lt=next_month
-                        )
-                    
-                    duration = entries.aggregate(
-                        total=Sum('duration', filter=Q(duration__isnull=False))
-                    )['total'] or timedelta(0)
-                    
-                    data[i] = round(duration.total_seconds() / 3600, 1)
-                
-                datasets.append({
-                    'label': 'Hours',
-                    'data': data,
-                    'backgroundColor': 'rgba(54, 162, 235, 0.5)',
-                    'borderColor': 'rgba(54, 162, 235, 1)',
-                    'borderWidth': 1
-                })
-            else:
-                # If no user is specified, show data by user
-                for user in user_data:
-                    user_id = user['user_id']
-                    user_name = user['user_name']
-                    
-                    data = [0] * len(date_range)
-                    
-                    for i, d in enumerate(date_range):
-                        if report.report_format == 'daily':
-                            entries = time_entries.filter(user_id=user_id, start_time__date=d)
-                        elif report.report_format == 'weekly':
-                            entries = time_entries.filter(
-                                user_id=user_id,
-                                start_time__date__gte=d,
-                                start_time__date__lt=d + timedelta(days=7)
-                            )
-                        elif report.report_format == 'monthly':
-                            if d.month == 12:
-                                next_month = date(d.year + 1, 1, 1)
-                            else:
-                                next_month = date(d.year, d.month + 1, 1)
-                            entries = time_entries.filter(
-                                user_id=user_id,
-                                start_time__date__gte=d,
-                                start_time__date__lt=next_month
-                            )
-                        
-                        duration = entries.aggregate(
-                            total=Sum('duration', filter=Q(duration__isnull=False))
-                        )['total'] or timedelta(0)
-                        
-                        data[i] = round(duration.total_seconds() / 3600, 1)
-                    
-                    datasets.append({
-                        'label': user_name,
-                        'data': data,
-                        'backgroundColor': f'rgba({user_id * 50 % 255}, {(user_id * 30 + 100) % 255}, {(user_id * 70 + 50) % 255}, 0.5)',
-                        'borderColor': f'rgba({user_id * 50 % 255}, {(user_id * 30 + 100) % 255}, {(user_id * 70 + 50) % 255}, 1)',
-                        'borderWidth': 1
-                    })
-            
-            chart_data = {
-                'labels': labels,
-                'datasets': datasets
-            }
+        # (a single dataset when filtered to one user, otherwise one dataset per user)
+        chart_data = build_chart_data(
+            time_entries,
+            report.report_format,
+            report.start_date,
+            report.end_date,
+            users=None if filters.get('user_id') else report_data['user_data']
+        )
         
         # Store report data
         report.data = {
-            'entry_count': time_entries.count(),
-            'total_hours': total_duration.total_seconds() / 3600,
-            'user_data': user_data,
-            'task_data': task_data,
-            'client_data': client_data,
+            **report_data,
             'chart_data': chart_data,
             'generated_at': timezone.now().isoformat()
         }
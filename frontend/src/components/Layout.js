@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Link, Outlet, useNavigate, useLocation } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
+import useTaskNotifications from '../hooks/useTaskNotifications';
 
 // React Iconsをインポート
 import { 
@@ -24,6 +25,9 @@ const Layout = () => {
   const navigate = useNavigate();
   const location = useLocation();
 
+  // 自分宛てのタスク通知をリアルタイムに表示
+  useTaskNotifications();
+
   const handleLogout = async () => {
     await logout();
     navigate('/');
@@ -112,6 +112,9 @@ const useSocketIO = (options = {}) => {
         reconnectionDelay: 1000,
         timeout: 10000,
         autoConnect: true,
+        // DRF のトークンでハンドシェイクを認証し、サーバー側で user_{id} ルームに参加させる
+        // （関数で渡すと再接続のたびに最新のトークンを読む）
+        auth: (cb) => cb({ token: localStorage.getItem('token') }),
       };
       
       // URL取得とログ出力
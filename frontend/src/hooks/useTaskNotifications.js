@@ -0,0 +1,39 @@
+import { useEffect } from 'react';
+import useSocketIO from './useSocketIO';
+import { useAuth } from '../context/AuthContext';
+import toast from 'react-hot-toast';
+
+/**
+ * 自分宛てのタスク通知（担当・ステータス変更・コメント・メンションなど）をトーストで表示するフック
+ * サーバーは認証済みソケットの user_{id} ルームに task_notification を送り、
+ * 同じ時間窓に複数件あれば task_notifications（{room, events}）にまとめて送る
+ */
+const useTaskNotifications = () => {
+  const { currentUser } = useAuth();
+  
+  const { isConnected, on } = useSocketIO({
+    autoConnect: Boolean(currentUser),
+    debug: process.env.NODE_ENV === 'development',
+  });
+  
+  useEffect(() => {
+    if (!isConnected || !currentUser) return;
+    
+    const showNotification = (notification) => {
+      if (!notification || !notification.content) return;
+      toast(notification.content, { icon: '🔔' });
+    };
+    
+    const unsubscribeNotification = on('task_notification', showNotification);
+    const unsubscribeNotifications = on('task_notifications', (data) => {
+      (data.events || []).forEach(showNotification);
+    });
+    
+    return () => {
+      unsubscribeNotification();
+      unsubscribeNotifications();
+    };
+  }, [isConnected, currentUser, on]);
+};
+
+export default useTaskNotifications;
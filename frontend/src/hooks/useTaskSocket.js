@@ -167,9 +167,7 @@ const useTaskSocket = (taskId) => {
     });
     
     // Handle task updates (comments, status changes, etc.)
-    const unsubscribeTaskUpdate = on('task_update', (data) => {
-      console.log('Task update received:', data);
-      
+    const handleTaskUpdate = (data) => {
       if (data.type === 'comment_added') {
         // Handle new comment
         setComments(prev => {
@@ -206,12 +204,24 @@ const useTaskSocket = (taskId) => {
           });
         }
       }
+    };
+    
+    const unsubscribeTaskUpdate = on('task_update', (data) => {
+      console.log('Task update received:', data);
+      handleTaskUpdate(data);
+    });
+    
+    // Updates for the same task within a short window arrive as one batch
+    const unsubscribeTaskUpdates = on('task_updates', (data) => {
+      console.log('Task updates received:', data);
+      (data.events || []).forEach(handleTaskUpdate);
     });
     
     // Clean up event listeners
     return () => {
       unsubscribeTaskJoined();
       unsubscribeTaskUpdate();
+      unsubscribeTaskUpdates();
     };
   }, [isConnected, taskId, currentUser, on]);
   
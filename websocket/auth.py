@@ -0,0 +1,142 @@
+"""
+Socket.IO ハンドシェイクのトークン認証
+
+バックエンド（Django REST framework）の Token をバックエンドの DB に直接
+問い合わせて検証する。結果はプロセス内で TTL 付きでキャッシュし、接続の
+たびに DB へアクセスしないようにする（トークンを削除しても最大 TTL 秒は
+有効なままになる）。
+
+バックエンドからの通知受付エンドポイント（/api/notify_*）は、アウトボックスの
+送信処理と共有するシークレット（WEBSOCKET_NOTIFY_SECRET）で送信元を確認する。
+"""
+import asyncio
+import hmac
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+# 有効なトークンと無効なトークンのキャッシュ秒数、キャッシュする最大件数
+AUTH_CACHE_TTL = int(os.environ.get('WEBSOCKET_AUTH_CACHE_TTL', 300))
+AUTH_NEGATIVE_CACHE_TTL = int(os.environ.get('WEBSOCKET_AUTH_NEGATIVE_CACHE_TTL', 30))
+AUTH_CACHE_SIZE = 10000
+
+# 通知受付エンドポイントの共有シークレット（未設定の場合は通知を受け付けない）
+NOTIFY_SECRET = os.environ.get('WEBSOCKET_NOTIFY_SECRET', '')
+NOTIFY_SECRET_HEADER = 'X-Notify-Secret'
+
+USER_QUERY = """
+    SELECT u.id, u.email, u.first_name, u.last_name, u.business_id
+    FROM authtoken_token t
+    JOIN users_user u ON u.id = t.user_id
+    WHERE t.key = :key AND u.is_active
+"""
+
+
+class AuthUnavailable(Exception):
+    """認証用の DB に接続できない"""
+
+
+class TTLCache:
+    """有効期限付きの LRU キャッシュ"""
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE):
+        self.max_size = max_size
+        self.items: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        """(見つかったか, 値) を返す"""
+        item = self.items.get(key)
+        if item is None:
+            return False, None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self.items[key]
+            return False, None
+        self.items.move_to_end(key)
+        return True, value
+
+    def set(self, key, value, ttl: float):
+        self.items[key] = (time.monotonic() + ttl, value)
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+
+class TokenAuthenticator:
+    """DRF の Token からユーザー情報を取得する"""
+
+    def __init__(self, database_url: Optional[str] = None):
+        self.database_url = database_url or os.environ.get('DATABASE_URL', '')
+        self.cache = TTLCache()
+        self._engine = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from sqlalchemy import create_engine
+
+            # dj-database-url 形式（postgres://）を SQLAlchemy の形式に変換
+            url = self.database_url.replace('postgres://', 'postgresql+psycopg2://', 1)
+            self._engine = create_engine(url, pool_size=5, max_overflow=5, pool_pre_ping=True)
+        return self._engine
+
+    async def authenticate(self, token: str) -> Optional[Dict[str, Any]]:
+        """トークンのユーザー情報を返す。無効なトークンの場合は None"""
+        found, user = self.cache.get(token)
+        if found:
+            return user
+
+        try:
+            # DB アクセスは同期 API のためスレッドで実行
+            user = await asyncio.to_thread(self._lookup, token)
+        except Exception as e:
+            raise AuthUnavailable(str(e)) from e
+
+        self.cache.set(token, user, AUTH_CACHE_TTL if user else AUTH_NEGATIVE_CACHE_TTL)
+        return user
+
+    def _lookup(self, token: str) -> Optional[Dict[str, Any]]:
+        from sqlalchemy import text
+
+        with self.engine.connect() as connection:
+            row = connection.execute(text(USER_QUERY), {'key': token}).mappings().first()
+        if row is None:
+            return None
+        name = f"{row['first_name'] or ''} {row['last_name'] or ''}".strip()
+        return {
+            'id': row['id'],
+            'name': name or row['email'],
+            'email': row['email'],
+            'business_id': row['business_id'],
+        }
+
+
+def extract_token(environ: Dict[str, Any], auth: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    ハンドシェイクからトークンを取り出す
+    優先順: auth={'token': ...} / ?token=... / Authorization: Token ...
+    """
+    if isinstance(auth, dict) and auth.get('token'):
+        return str(auth['token'])
+
+    token = parse_qs(environ.get('QUERY_STRING', '')).get('token')
+    if token:
+        return token[0]
+
+    authorization = environ.get('HTTP_AUTHORIZATION', '')
+    scheme, _, credentials = authorization.partition(' ')
+    if scheme.lower() in ('token', 'bearer') and credentials:
+        return credentials.strip()
+    return None
+
+
+def notify_secret_valid(provided: Optional[str]) -> bool:
+    """通知受付エンドポイントに送られたシークレットが正しいか"""
+    if not NOTIFY_SECRET or not provided:
+        return False
+    return hmac.compare_digest(provided.encode(), NOTIFY_SECRET.encode())
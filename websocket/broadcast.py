@@ -0,0 +1,72 @@
+"""
+ルーム単位でまとめて送信するブロードキャスト
+
+同じルーム宛てのイベントを短い時間窓（デフォルト 50ms）だけ溜め、窓ごとに
+1 回だけ送信する。一括ステータス変更などで同じタスクに N 件のイベントが
+届いても、ルームへの送信フレームは 1 つになる。
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# イベントをまとめる時間窓（秒）
+DEFAULT_WINDOW = 0.05
+
+
+class RoomBatcher:
+    """
+    ルームごとに最初のイベントから window 秒後にまとめて送信する。
+    1 件だけなら single_event、複数件なら batch_event（{'room', 'events'}）で送る。
+    """
+
+    def __init__(self, emit: Callable[..., Awaitable[Any]], single_event: str, batch_event: str,
+                 window: float = DEFAULT_WINDOW, on_flush: Optional[Callable[[int], Any]] = None):
+        self.emit = emit
+        # 送信ごとにまとめたイベント数を受け取るコールバック（メトリクス用）
+        self.on_flush = on_flush
+        self.single_event = single_event
+        self.batch_event = batch_event
+        self.window = window
+        self.pending: Dict[str, List[Dict[str, Any]]] = {}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        self.tasks = set()
+
+    def add(self, room: str, event: Dict[str, Any]):
+        """イベントを追加する（送信は時間窓の終わりにまとめて行う）"""
+        self.pending.setdefault(room, []).append(event)
+        if room not in self.timers:
+            loop = asyncio.get_running_loop()
+            self.timers[room] = loop.call_later(self.window, self._schedule_flush, room)
+
+    def _schedule_flush(self, room: str):
+        task = asyncio.create_task(self.flush(room))
+        # 完了前にタスクがガベージコレクションされないよう参照を保持
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def flush(self, room: str):
+        """ルームの溜まっているイベントを送信する"""
+        timer = self.timers.pop(room, None)
+        if timer:
+            timer.cancel()
+        events = self.pending.pop(room, [])
+        if not events:
+            return
+        if self.on_flush:
+            self.on_flush(len(events))
+        try:
+            if len(events) == 1:
+                await self.emit(self.single_event, events[0], room=room)
+            else:
+                await self.emit(self.batch_event, {'room': room, 'events': events}, room=room)
+        except Exception as e:
+            logger.error(f"Failed to broadcast {len(events)} events to {room}: {str(e)}")
+
+    async def flush_all(self):
+        """すべてのルームを即座に送信する（シャットダウン時用）"""
+        for room in list(self.pending):
+            await self.flush(room)
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
@@ -0,0 +1,356 @@
+"""
+WebSocket サーバーの負荷試験
+
+N 本の Socket.IO 接続を張って M 個のタスクチャンネルに分散して参加させ、
+chat_message とタイピング通知を一定レートで送り続けて、送信から受信までの
+レイテンシ（p50 / p99）、受信スループット、サーバーのメモリ使用量を測る。
+
+デフォルトではこのディレクトリの main.py を空きポートで起動して試験する
+（外部サービス不要、WEBSOCKET_BACKEND=memory / WEBSOCKET_MODE=production）。
+--url を指定すると起動済みのサーバーに対して実行する。
+
+使い方:
+    python loadtest.py --connections 500 --channels 50 --duration 10
+    python loadtest.py --suite            # 規模を変えた一連のシナリオを実行
+    python loadtest.py --suite --json     # 結果を JSON で出力
+
+クライアント側も 1 プロセスで動くため、接続数が多い場合はクライアントの
+CPU が先に飽和していないか（client_cpu_seconds）も確認すること。
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import socketio
+
+# 規模を変えたシナリオ（--suite）
+SUITE = (
+    {'connections': 100, 'channels': 10},
+    {'connections': 500, 'channels': 50},
+    {'connections': 1000, 'channels': 100},
+    {'connections': 2000, 'channels': 200},
+)
+
+# 同時に進めるハンドシェイクの数
+CONNECT_CONCURRENCY = 100
+SERVER_START_TIMEOUT = 30
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """最近順位法によるパーセンタイル"""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalServer:
+    """試験用に main.py を uvicorn のサブプロセスとして起動する"""
+
+    def __init__(self, workers: int = 1):
+        self.port = free_port()
+        self.workers = workers
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    async def __aenter__(self):
+        env = {
+            **os.environ,
+            'WEBSOCKET_MODE': 'production',
+            'WEBSOCKET_BACKEND': os.environ.get('WEBSOCKET_BACKEND', 'memory'),
+            'WEBSOCKET_REQUIRE_AUTH': 'false',
+        }
+        command = [
+            sys.executable, '-m', 'uvicorn', 'main:app',
+            '--host', '127.0.0.1', '--port', str(self.port),
+            '--log-level', 'warning', '--no-access-log',
+        ]
+        if self.workers > 1:
+            command += ['--workers', str(self.workers)]
+        self.process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f'Server exited with code {self.process.returncode}')
+                try:
+                    async with session.get(f'{self.url}/health') as response:
+                        if response.status == 200:
+                            return self
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError('Server did not become healthy in time')
+
+    async def __aexit__(self, *exc_info):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+async def server_memory_bytes(url: str) -> Optional[float]:
+    """/metrics の process_resident_memory_bytes（ワーカーが複数の場合は応答したプロセスの値）"""
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'{url}/metrics') as response:
+                text = await response.text()
+    except aiohttp.ClientError:
+        return None
+    match = re.search(r'^process_resident_memory_bytes ([0-9.e+]+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class LoadClient:
+    """1 本の Socket.IO 接続"""
+
+    def __init__(self, index: int, channel_id: str, stats: 'Stats'):
+        self.index = index
+        self.channel_id = channel_id
+        self.stats = stats
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on('task_update', self.on_message)
+        self.sio.on('typing', self.on_typing)
+
+    async def on_message(self, data):
+        content = data.get('data') or {}
+        sent_at = content.get('sent_at') if isinstance(content, dict) else None
+        if sent_at is not None:
+            self.stats.latencies.append(time.perf_counter() - sent_at)
+        self.stats.received += 1
+
+    async def on_typing(self, data):
+        self.stats.typing_received += 1
+
+    async def connect(self, url: str, token: Optional[str]):
+        start = time.perf_counter()
+        # client=tasks: タスク用の接続としてチャンネル参加を許可してもらう
+        await self.sio.connect(
+            f'{url}?client=tasks',
+            transports=['websocket'],
+            auth={'token': token} if token else None,
+            wait_timeout=30
+        )
+        self.stats.connect_latencies.append(time.perf_counter() - start)
+        response = await self.sio.call('join_channel', {
+            'channel_id': self.channel_id,
+            'user_info': {'id': self.index, 'name': f'load-{self.index}'},
+        }, timeout=30)
+        if not response or response.get('status') != 'success':
+            raise RuntimeError(f'join_channel failed: {response}')
+
+    async def send_message(self, seq: int):
+        await self.sio.emit('chat_message', {
+            'type': 'task_update',
+            'channel_id': self.channel_id,
+            'content': {'sent_at': time.perf_counter(), 'sender': self.index, 'seq': seq},
+        })
+        self.stats.sent += 1
+
+    async def send_typing(self):
+        await self.sio.emit('typing_indicator', {'channel_id': self.channel_id, 'is_typing': True})
+        self.stats.typing_sent += 1
+
+    async def disconnect(self):
+        if self.sio.connected:
+            await self.sio.disconnect()
+
+
+class Stats:
+    def __init__(self):
+        self.connect_latencies: List[float] = []
+        self.connect_errors = 0
+        self.latencies: List[float] = []
+        self.sent = 0
+        self.received = 0
+        self.expected = 0
+        self.typing_sent = 0
+        self.typing_received = 0
+
+
+async def run_scenario(url: str, connections: int, channels: int, duration: float, rate: float,
+                       typing_rate: float, senders: float, token: Optional[str] = None) -> Dict[str, Any]:
+    """
+    1 つのシナリオを実行して結果を返す
+
+    rate / typing_rate は送信者 1 人あたりの毎秒の送信数、senders は送信する接続の割合
+    """
+    stats = Stats()
+    clients = [LoadClient(i, str(i % channels + 1), stats) for i in range(connections)]
+
+    # 接続とチャンネル参加（同時実行数を制限）
+    semaphore = asyncio.Semaphore(CONNECT_CONCURRENCY)
+
+    async def connect(client):
+        async with semaphore:
+            try:
+                await client.connect(url, token)
+                return client
+            except Exception:
+                stats.connect_errors += 1
+                await client.disconnect()
+                return None
+
+    connect_start = time.perf_counter()
+    connected = [client for client in await asyncio.gather(*map(connect, clients)) if client]
+    connect_seconds = time.perf_counter() - connect_start
+
+    # 各チャンネルで実際に参加できた人数（1 メッセージあたりの受信予定数）
+    members = {}
+    for client in connected:
+        members[client.channel_id] = members.get(client.channel_id, 0) + 1
+
+    memory_before = await server_memory_bytes(url)
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+
+    # メッセージとタイピングの連続送信
+    sender_count = max(int(len(connected) * senders), 1) if connected else 0
+    sending = random.sample(connected, sender_count)
+
+    async def storm(client):
+        seq = 0
+        deadline = time.perf_counter() + duration
+        next_message = next_typing = time.perf_counter() + random.random() / max(rate, typing_rate, 1)
+        while time.perf_counter() < deadline:
+            now = time.perf_counter()
+            if rate and now >= next_message:
+                await client.send_message(seq)
+                # 送信者自身も同じルームにいるため、チャンネルの全員に届く
+                stats.expected += members[client.channel_id]
+                seq += 1
+                next_message += 1 / rate
+            if typing_rate and now >= next_typing:
+                await client.send_typing()
+                next_typing += 1 / typing_rate
+            due = min(next_message if rate else deadline, next_typing if typing_rate else deadline, deadline)
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+
+    storm_start = time.perf_counter()
+    await asyncio.gather(*map(storm, sending))
+    # 送信済みのメッセージが届くのを待つ
+    drain_deadline = time.perf_counter() + 5
+    while stats.received < stats.expected and time.perf_counter() < drain_deadline:
+        await asyncio.sleep(0.05)
+    storm_seconds = time.perf_counter() - storm_start
+
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    memory_after = await server_memory_bytes(url)
+    await asyncio.gather(*(client.disconnect() for client in connected))
+
+    return {
+        'connections': connections,
+        'channels': channels,
+        'connected': len(connected),
+        'connect_errors': stats.connect_errors,
+        'connect_seconds': round(connect_seconds, 3),
+        'connect_p50_ms': _ms(percentile(stats.connect_latencies, 50)),
+        'connect_p99_ms': _ms(percentile(stats.connect_latencies, 99)),
+        'senders': sender_count,
+        'messages_sent': stats.sent,
+        'messages_received': stats.received,
+        'messages_expected': stats.expected,
+        'delivery_ratio': round(stats.received / stats.expected, 4) if stats.expected else None,
+        'latency_p50_ms': _ms(percentile(stats.latencies, 50)),
+        'latency_p99_ms': _ms(percentile(stats.latencies, 99)),
+        'latency_max_ms': _ms(max(stats.latencies, default=None)),
+        'received_per_second': round(stats.received / storm_seconds, 1) if storm_seconds else None,
+        'typing_sent': stats.typing_sent,
+        'typing_received': stats.typing_received,
+        'server_memory_mb_before': _mb(memory_before),
+        'server_memory_mb_after': _mb(memory_after),
+        'client_cpu_seconds': round(
+            (cpu_after.ru_utime + cpu_after.ru_stime) - (cpu_before.ru_utime + cpu_before.ru_stime), 2
+        ),
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def _mb(value: Optional[float]) -> Optional[float]:
+    return round(value / 1024 / 1024, 1) if value is not None else None
+
+
+def print_results(results: List[Dict[str, Any]]):
+    columns = (
+        ('conns', 'connected'), ('chans', 'channels'), ('conn p99', 'connect_p99_ms'),
+        ('sent', 'messages_sent'), ('recv/s', 'received_per_second'), ('delivered', 'delivery_ratio'),
+        ('p50 ms', 'latency_p50_ms'), ('p99 ms', 'latency_p99_ms'), ('mem MB', 'server_memory_mb_after'),
+    )
+    print('  '.join(f'{label:>10}' for label, _ in columns))
+    for result in results:
+        print('  '.join(f"{'-' if result[key] is None else result[key]:>10}" for _, key in columns))
+
+
+async def main(args):
+    scenarios = SUITE if args.suite else ({'connections': args.connections, 'channels': args.channels},)
+    results = []
+
+    async def run_all(url):
+        for scenario in scenarios:
+            result = await run_scenario(
+                url, scenario['connections'], scenario['channels'], args.duration, args.rate,
+                args.typing_rate, args.senders, token=args.token
+            )
+            results.append(result)
+            if not args.json:
+                print(f"finished {scenario['connections']} connections / {scenario['channels']} channels",
+                      file=sys.stderr)
+
+    if args.url:
+        await run_all(args.url.rstrip('/'))
+    else:
+        async with LocalServer(workers=args.workers) as server:
+            await run_all(server.url)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the Socket.IO server')
+    parser.add_argument('--url', help='Target server (default: start main.py locally on a free port)')
+    parser.add_argument('--connections', type=int, default=200, help='Number of sockets (default: 200)')
+    parser.add_argument('--channels', type=int, default=20, help='Number of task channels (default: 20)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of message storm (default: 10)')
+    parser.add_argument('--rate', type=float, default=1, help='Messages per second per sender (default: 1)')
+    parser.add_argument('--typing-rate', type=float, default=2,
+                        help='Typing indicators per second per sender (default: 2)')
+    parser.add_argument('--senders', type=float, default=0.2,
+                        help='Fraction of sockets that send (default: 0.2)')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers for the local server (default: 1)')
+    parser.add_argument('--token', help='DRF token to send in the handshake')
+    parser.add_argument('--suite', action='store_true', help='Run the preset scenarios of increasing size')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
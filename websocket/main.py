@@ -2,16 +2,30 @@ import json
 import asyncio
 import os
 import logging
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, Any, Optional, List
 import socketio
 from datetime import datetime
 from pydantic import BaseModel
 
-# ロギング設定
-logging.basicConfig(level=logging.INFO)
+from auth import (
+    NOTIFY_SECRET, NOTIFY_SECRET_HEADER, AuthUnavailable, TokenAuthenticator, extract_token, notify_secret_valid
+)
+from broadcast import RoomBatcher
+from presence import HEARTBEAT_INTERVAL, create_backend
+from telemetry import (
+    BROADCAST_BATCH_SIZE, CONNECTED_CLIENTS, CONNECTIONS, DISCONNECTS, PRODUCTION, EventLogger,
+    InstrumentedAsyncServer, configure_logging, instrument, monitor_loop_lag, prepare_metrics_dir, render_metrics
+)
+
+# ロギング設定（WEBSOCKET_MODE=production ではイベントログをサンプリング）
+configure_logging()
 logger = logging.getLogger(__name__)
+event_log = EventLogger()
+
+# /debug/connections は本番モードでは WEBSOCKET_DEBUG_ENDPOINTS=true の場合のみ有効
+DEBUG_ENDPOINTS = os.environ.get('WEBSOCKET_DEBUG_ENDPOINTS', 'false' if PRODUCTION else 'true').lower() == 'true'
 
 # FastAPIアプリケーションの作成
 app = FastAPI(title="Sphere Chat WebSocket Server")
@@ -45,12 +59,16 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# クライアントマネージャーとプレゼンスストア（WEBSOCKET_BACKEND=redis で複数プロセス間で共有）
+client_manager, presence = create_backend()
+
 # Socket.IOサーバー作成 - タイムアウト問題解決のための設定
-sio = socketio.AsyncServer(
+sio = InstrumentedAsyncServer(
     async_mode='asgi',
+    client_manager=client_manager,
     cors_allowed_origins="*",  # すべてのオリジンを許可（開発環境用）
-    logger=True,
-    engineio_logger=True,
+    logger=not PRODUCTION,
+    engineio_logger=not PRODUCTION,
     ping_timeout=20000,  # クライアントとより近い値に設定
     ping_interval=25000,  # クライアントとバランスのとれた値
     max_http_buffer_size=500000,
@@ -61,9 +79,63 @@ sio = socketio.AsyncServer(
 # ASGIアプリケーション作成
 socket_app = socketio.ASGIApp(sio, app)
 
-# 接続クライアント管理
+# ハンドシェイクのトークン認証（WEBSOCKET_REQUIRE_AUTH=true でトークンなしの接続を拒否）
+authenticator = TokenAuthenticator()
+REQUIRE_AUTH = os.environ.get('WEBSOCKET_REQUIRE_AUTH', 'false').lower() == 'true'
+if not NOTIFY_SECRET:
+    logger.warning("WEBSOCKET_NOTIFY_SECRET is not set; /api/notify_* endpoints will reject all requests")
+
+# バックエンドからのタスク通知をタスクチャンネルごとにまとめて送信
+task_broadcaster = RoomBatcher(
+    sio.emit,
+    single_event='task_update',
+    batch_event='task_updates',
+    window=float(os.environ.get('BROADCAST_WINDOW_MS', 50)) / 1000,
+    on_flush=BROADCAST_BATCH_SIZE.observe
+)
+
+# ユーザー宛ての通知（TaskNotification）を user_{id} ルームごとにまとめて送信
+user_broadcaster = RoomBatcher(
+    sio.emit,
+    single_event='task_notification',
+    batch_event='task_notifications',
+    window=float(os.environ.get('BROADCAST_WINDOW_MS', 50)) / 1000,
+    on_flush=BROADCAST_BATCH_SIZE.observe
+)
+
+# このプロセスに接続しているクライアント（クラスタ全体の状況は presence で管理）
 connected_clients = {}  # sid -> ユーザー情報
-channel_members = {}    # channel_id -> set(sid)
+
+heartbeat_task = None
+loop_lag_task = None
+
+
+async def run_heartbeat():
+    """プレゼンスストアへ定期的に生存を通知"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            await presence.heartbeat()
+        except Exception as e:
+            logger.error(f"Presence heartbeat failed: {str(e)}")
+
+
+@app.on_event("startup")
+async def start_presence():
+    global heartbeat_task, loop_lag_task
+    await presence.start()
+    heartbeat_task = asyncio.create_task(run_heartbeat())
+    loop_lag_task = asyncio.create_task(monitor_loop_lag())
+
+
+@app.on_event("shutdown")
+async def stop_presence():
+    for task in (heartbeat_task, loop_lag_task):
+        if task:
+            task.cancel()
+    await task_broadcaster.flush_all()
+    await user_broadcaster.flush_all()
+    await presence.stop()
 
 # データモデル
 class UserInfo(BaseModel):
@@ -90,23 +162,97 @@ class ReadStatusData(BaseModel):
     channel_id: str
     timestamp: Optional[str] = None
 
+class TaskStatusEvent(BaseModel):
+    model_config = {'extra': 'allow'}
+    
+    task_id: int
+    task_title: Optional[str] = None
+    old_status: Optional[str] = None
+    new_status: str
+    user_id: Optional[int] = None
+    user_name: Optional[str] = None
+
+class TaskCommentEvent(BaseModel):
+    model_config = {'extra': 'allow'}
+    
+    task_id: int
+    task_title: Optional[str] = None
+    comment_id: int
+    content: str = ''
+    user_id: Optional[int] = None
+    user_name: Optional[str] = None
+    created_at: Optional[str] = None
+    mentioned_user_ids: List[int] = []
+
+class UserNotification(BaseModel):
+    model_config = {'extra': 'allow'}
+    
+    user_id: int
+    task_id: int
+    notification_type: str
+    content: str = ''
+
+class UserNotificationBatch(BaseModel):
+    notifications: List[UserNotification]
+
+class NotifyBatchItem(BaseModel):
+    event_type: str
+    payload: Dict[str, Any]
+
+class NotifyBatch(BaseModel):
+    events: List[NotifyBatchItem]
+
+# バックエンドのイベント種別 -> (ペイロードのモデル, フロントエンドに送る type)
+TASK_EVENT_TYPES = {
+    'task_status': (TaskStatusEvent, 'status_changed'),
+    'task_comment': (TaskCommentEvent, 'comment_added'),
+}
+
 # Socket.IOイベントハンドラ
 @sio.event
+@instrument
 async def connect(sid, environ, auth):
     """クライアント接続処理 - チャットはメンテナンス中、タスク関連の接続は許可"""
+    # トークンがあれば検証し、無効なトークンの接続は拒否する
+    user = None
+    token = extract_token(environ, auth)
+    if token:
+        try:
+            user = await authenticator.authenticate(token)
+        except AuthUnavailable as e:
+            logger.error(f"Token authentication unavailable: {str(e)}")
+            if REQUIRE_AUTH:
+                CONNECTIONS.labels('rejected').inc()
+                return False
+        else:
+            if user is None:
+                event_log.log('connect_rejected', sid=sid, reason='invalid_token')
+                CONNECTIONS.labels('rejected').inc()
+                return False
+    elif REQUIRE_AUTH:
+        event_log.log('connect_rejected', sid=sid, reason='no_token')
+        CONNECTIONS.labels('rejected').inc()
+        return False
+    CONNECTIONS.labels('accepted').inc()
+    
     try:
-        # ヘッダーとトランスポート情報をログ出力
+        # ヘッダーとトランスポート情報
         transport = environ.get('asgi.scope', {}).get('type', 'unknown')
         headers = {k.decode('utf-8'): v.decode('utf-8') 
                   for k, v in environ.get('asgi.scope', {}).get('headers', [])
                   if k.decode('utf-8').lower() in ['origin', 'user-agent', 'x-forwarded-for']}
         
-        logger.info(f"Client connecting: {sid} via {transport}")
-        logger.info(f"Headers: {headers}")
+        if PRODUCTION:
+            event_log.log('connect', sid=sid, transport=transport, user_id=user['id'] if user else None)
+        else:
+            event_log.log('connect', sid=sid, transport=transport, user_id=user['id'] if user else None,
+                          headers=headers)
 
-        # パスを取得してタスク関連の接続かチェック
+        # パスまたはクエリ（例: ?client=tasks）からタスク関連の接続かチェック
+        # （Socket.IO のパスは常に /socket.io/ のため、クエリでも判定する）
         path = environ.get('asgi.scope', {}).get('path', '')
-        is_task_connection = path and 'tasks' in path
+        query = environ.get('QUERY_STRING', '')
+        is_task_connection = 'tasks' in path or 'tasks' in query
         
         # クライアント情報を保存
         connected_clients[sid] = {
@@ -118,10 +264,17 @@ async def connect(sid, environ, auth):
             'origin': headers.get('origin', 'unknown'),
             'is_task_connection': is_task_connection
         }
+        CONNECTED_CLIENTS.set(len(connected_clients))
+        if user:
+            # 認証済みユーザーはユーザー宛て通知を受け取るルームに参加
+            connected_clients[sid]['user_id'] = user['id']
+            connected_clients[sid]['user_info'] = {'id': user['id'], 'name': user['name'], 'email': user['email']}
+            await sio.enter_room(sid, f"user_{user['id']}")
+        await presence.add_client(sid)
         
         if is_task_connection:
             # タスク関連の接続は許可
-            logger.info(f"Task connection allowed: {sid}")
+            event_log.log('task_connection', sid=sid)
             await sio.emit('connection_established', {
                 'status': 'connected',
                 'connection_id': sid,
@@ -129,7 +282,7 @@ async def connect(sid, environ, auth):
             }, to=sid)
         else:
             # チャット関連の接続はメンテナンス中
-            logger.info(f"Chat connection in maintenance: {sid}")
+            event_log.log('chat_maintenance', sid=sid)
             await sio.emit('connection_status', {
                 'status': 'maintenance',
                 'sid': sid,
@@ -144,9 +297,10 @@ async def connect(sid, environ, auth):
         return True
 
 @sio.event
+@instrument
 async def ping(sid):
     """Pingイベントに対するPong応答"""
-    logger.info(f"Ping received from {sid}")
+    event_log.log('ping', sid=sid)
     await sio.emit('pong', {
         'time': datetime.now().isoformat(),
         'sid': sid
@@ -154,37 +308,36 @@ async def ping(sid):
     return {'status': 'ok', 'message': 'pong'}
 
 @sio.event
+@instrument
 async def disconnect(sid):
     """クライアント切断時の処理"""
-    logger.info(f"Client disconnected: {sid}")
+    DISCONNECTS.inc()
     
     # 所属していたすべてのチャンネルから削除
     client = connected_clients.get(sid)
     if client:
         for channel_id in list(client['channels']):
-            if channel_id in channel_members:
-                # チャンネルからユーザーを削除
-                channel_members[channel_id].remove(sid)
-                
-                # チャンネルの他のメンバーに退出を通知
-                user_info = client.get('user_info', {})
-                await sio.emit('user_left', {
-                    'channel_id': channel_id,
-                    'user_info': user_info,
-                    'timestamp': datetime.now().isoformat()
-                }, room=f'channel_{channel_id}')
-                
-                # チャンネルが空になった場合は削除
-                if not channel_members[channel_id]:
-                    del channel_members[channel_id]
+            # チャンネルからユーザーを削除
+            await presence.leave(channel_id, sid)
+            
+            # チャンネルの他のメンバーに退出を通知
+            user_info = client.get('user_info', {})
+            await sio.emit('user_left', {
+                'channel_id': channel_id,
+                'user_info': user_info,
+                'timestamp': datetime.now().isoformat()
+            }, room=f'channel_{channel_id}')
     
     # クライアント情報を削除
     if sid in connected_clients:
         del connected_clients[sid]
+    CONNECTED_CLIENTS.set(len(connected_clients))
+    await presence.remove_client(sid)
     
-    logger.info(f"Active connections: {len(connected_clients)}")
+    event_log.log('disconnect', sid=sid, active_connections=len(connected_clients))
 
 @sio.event
+@instrument
 async def join_channel(sid, data):
     """チャンネル参加処理 - タスク関連は許可、チャットはメンテナンス中"""
     try:
@@ -198,25 +351,21 @@ async def join_channel(sid, data):
             if not channel_id:
                 return {'status': 'error', 'message': 'Channel ID is required'}
             
-            # チャンネルが存在しなければ初期化
-            if channel_id not in channel_members:
-                channel_members[channel_id] = set()
-            
-            # チャンネルにクライアントを追加
-            channel_members[channel_id].add(sid)
-            
             # クライアントの参加チャンネルリストを更新
             if sid in connected_clients:
                 connected_clients[sid]['channels'].add(channel_id)
                 
-                # ユーザー情報があれば保存
-                if 'user_info' in data:
+                # ユーザー情報があれば保存（認証済みの場合はトークンのユーザー情報を使う）
+                if 'user_info' in data and not connected_clients[sid].get('user_id'):
                     connected_clients[sid]['user_info'] = data['user_info']
             
+            # チャンネルにクライアントを追加
+            await presence.join(channel_id, sid, connected_clients.get(sid, {}).get('user_info'))
+            
             # チャンネルルームに参加
-            sio.enter_room(sid, f'channel_{channel_id}')
+            await sio.enter_room(sid, f'channel_{channel_id}')
             
-            logger.info(f"User joined task channel {channel_id}")
+            event_log.log('join_channel', sid=sid, channel_id=channel_id)
             
             return {
                 'status': 'success',
@@ -230,7 +379,7 @@ async def join_channel(sid, data):
                 'message': 'Chat system is currently under maintenance. Channels cannot be joined at this time.'
             }, to=sid)
             
-            logger.info(f"Maintenance message sent to client attempting to join channel: {sid}")
+            event_log.log('join_channel_maintenance', sid=sid)
             
             return {
                 'status': 'maintenance',
@@ -247,6 +396,7 @@ async def join_channel(sid, data):
         }
 
 @sio.event
+@instrument
 async def leave_channel(sid, data):
     """チャンネル退出処理"""
     try:
@@ -255,15 +405,10 @@ async def leave_channel(sid, data):
             return {'status': 'error', 'message': 'Channel ID is required'}
         
         # チャンネルルームから退出
-        sio.leave_room(sid, f'channel_{channel_id}')
+        await sio.leave_room(sid, f'channel_{channel_id}')
         
         # チャンネルメンバー管理から削除
-        if channel_id in channel_members and sid in channel_members[channel_id]:
-            channel_members[channel_id].remove(sid)
-            
-            # チャンネルが空になった場合は削除
-            if not channel_members[channel_id]:
-                del channel_members[channel_id]
+        await presence.leave(channel_id, sid)
         
         # クライアント情報を更新
         if sid in connected_clients:
@@ -280,8 +425,8 @@ async def leave_channel(sid, data):
                 'timestamp': datetime.now().isoformat()
             }, room=f'channel_{channel_id}')
         
-        member_count = len(channel_members.get(channel_id, set()))
-        logger.info(f"User left channel {channel_id}. Remaining members: {member_count}")
+        member_count = await presence.member_count(channel_id)
+        event_log.log('leave_channel', sid=sid, channel_id=channel_id, remaining_members=member_count)
         
         return {
             'status': 'success',
@@ -295,6 +440,52 @@ async def leave_channel(sid, data):
         }
 
 @sio.event
+@instrument
+async def join_task(sid, data):
+    """
+    タスク詳細画面の参加処理（useTaskSocket）
+    channel_{task_id} ルームに参加し、バックエンドからのタスク通知（task_update / task_updates）を受け取る
+    """
+    task_id = (data or {}).get('task_id')
+    if not task_id:
+        return {'status': 'error', 'message': 'Task ID is required'}
+    channel_id = str(task_id)
+    
+    client = connected_clients.get(sid)
+    if client is not None:
+        client['is_task_connection'] = True
+        client['channels'].add(channel_id)
+        # 認証済みの場合はトークンのユーザー情報を使う
+        if data.get('user_info') and not client.get('user_id'):
+            client['user_info'] = data['user_info']
+    
+    await presence.join(channel_id, sid, (client or {}).get('user_info'))
+    await sio.enter_room(sid, f'channel_{channel_id}')
+    
+    active_users = await presence.member_count(channel_id)
+    await sio.emit('task_joined', {'task_id': task_id, 'active_users': active_users}, to=sid)
+    event_log.log('join_task', sid=sid, task_id=task_id)
+    return {'status': 'success', 'active_users': active_users}
+
+@sio.event
+@instrument
+async def leave_task(sid, data):
+    """タスク詳細画面の退出処理"""
+    task_id = (data or {}).get('task_id')
+    if not task_id:
+        return {'status': 'error', 'message': 'Task ID is required'}
+    channel_id = str(task_id)
+    
+    await sio.leave_room(sid, f'channel_{channel_id}')
+    await presence.leave(channel_id, sid)
+    if sid in connected_clients:
+        connected_clients[sid]['channels'].discard(channel_id)
+    
+    event_log.log('leave_task', sid=sid, task_id=task_id)
+    return {'status': 'success'}
+
+@sio.event
+@instrument
 async def chat_message(sid, data):
     """メッセージ送信処理 - タスク関連メッセージは許可、チャットはメンテナンス中"""
     try:
@@ -309,7 +500,7 @@ async def chat_message(sid, data):
             channel_id = data.get('channel_id') or data.get('task_id')
             message_content = data.get('content') or data.get('data', {})
             
-            logger.info(f"Task message from {sid} to {channel_id}: {message_type}")
+            event_log.log('chat_message', sid=sid, channel_id=channel_id, message_type=message_type)
             
             # チャンネルのメンバーにブロードキャスト
             await sio.emit(message_type or 'chat_message', {
@@ -331,7 +522,7 @@ async def chat_message(sid, data):
                 'message': 'Chat system is currently under maintenance. Messages cannot be sent at this time.'
             }, to=sid)
             
-            logger.info(f"Maintenance message sent to client attempting to send chat message: {sid}")
+            event_log.log('chat_message_maintenance', sid=sid)
             
             return {
                 'status': 'maintenance',
@@ -345,6 +536,7 @@ async def chat_message(sid, data):
         }
 
 @sio.event
+@instrument
 async def typing_indicator(sid, data):
     """タイピングインジケーター送信処理"""
     try:
@@ -371,6 +563,7 @@ async def typing_indicator(sid, data):
         return {'status': 'error', 'message': str(e)}
 
 @sio.event
+@instrument
 async def read_status(sid, data):
     """既読ステータス送信処理"""
     try:
@@ -396,38 +589,109 @@ async def read_status(sid, data):
         return {'status': 'error', 'message': str(e)}
 
 # REST API エンドポイント
+async def require_notify_secret(secret: Optional[str] = Header(None, alias=NOTIFY_SECRET_HEADER)):
+    """通知受付エンドポイントの送信元（バックエンドのアウトボックス）を共有シークレットで確認"""
+    if not NOTIFY_SECRET:
+        # 設定漏れの場合はアウトボックス側で再送されるよう 503 を返す
+        raise HTTPException(status_code=503, detail="Notification endpoints are not configured")
+    if not notify_secret_valid(secret):
+        raise HTTPException(status_code=403, detail="Invalid notification secret")
+
+def queue_task_event(event_type: str, event: BaseModel):
+    """タスク通知をタスクチャンネルの送信キューに追加"""
+    data = event.model_dump()
+    data['source_type'] = data.pop('type', None)
+    data['type'] = TASK_EVENT_TYPES[event_type][1]
+    data['user'] = {'id': data.get('user_id'), 'name': data.get('user_name')}
+    data['timestamp'] = datetime.now().isoformat()
+    task_broadcaster.add(f"channel_{event.task_id}", data)
+
+@app.post("/api/notify_task_status", status_code=202, dependencies=[Depends(require_notify_secret)])
+async def notify_task_status(event: TaskStatusEvent):
+    """タスクのステータス変更通知（バックエンドのアウトボックスから送信される）"""
+    queue_task_event('task_status', event)
+    return {"status": "queued"}
+
+@app.post("/api/notify_task_comment", status_code=202, dependencies=[Depends(require_notify_secret)])
+async def notify_task_comment(event: TaskCommentEvent):
+    """タスクへのコメント通知（バックエンドのアウトボックスから送信される）"""
+    queue_task_event('task_comment', event)
+    return {"status": "queued"}
+
+@app.post("/api/notify_users", status_code=202, dependencies=[Depends(require_notify_secret)])
+async def notify_users(batch: UserNotificationBatch):
+    """
+    ユーザー宛てのタスク通知（TaskNotification）を受信者のソケットにだけ送る
+    notifications: [{"user_id", "task_id", "notification_type", "content", ...}]
+    """
+    for notification in batch.notifications:
+        user_broadcaster.add(f"user_{notification.user_id}", notification.model_dump())
+    return {"status": "queued", "count": len(batch.notifications)}
+
+@app.post("/api/notify_batch", status_code=202, dependencies=[Depends(require_notify_secret)])
+async def notify_batch(batch: NotifyBatch):
+    """
+    複数のタスク通知をまとめて受け付ける
+    events: [{"event_type": "task_status" | "task_comment", "payload": {...}}]
+    """
+    # 1 件でも不正なら何も送らない
+    events = []
+    for index, item in enumerate(batch.events):
+        if item.event_type not in TASK_EVENT_TYPES:
+            raise HTTPException(status_code=422, detail=f"events[{index}]: unknown event_type {item.event_type}")
+        model = TASK_EVENT_TYPES[item.event_type][0]
+        try:
+            events.append((item.event_type, model(**item.payload)))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"events[{index}]: {str(e)}")
+    
+    for event_type, event in events:
+        queue_task_event(event_type, event)
+    return {"status": "queued", "count": len(events)}
+
 @app.get("/")
 async def root():
     """ルートエンドポイント - サーバー状態確認用"""
+    stats = await presence.stats()
     return {
         "message": "Sphere Chat Socket.IO Server",
         "status": "running",
         "connections": {
-            "clients": len(connected_clients),
-            "channels": len(channel_members),
+            "clients": stats["clients"],
+            "channels": stats["channels"],
+            "nodes": stats["nodes"],
         },
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/health")
 async def health_check():
-    """ヘルスチェックエンドポイント"""
+    """ヘルスチェックエンドポイント（接続数はクラスタ全体、local_connections はこのプロセス）"""
+    stats = await presence.stats()
     return {
         "status": "healthy",
-        "connections": len(connected_clients),
+        "connections": stats["clients"],
+        "local_connections": len(connected_clients),
+        "nodes": stats["nodes"],
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 形式のメトリクス"""
+    body, content_type = await render_metrics(presence)
+    return Response(content=body, media_type=content_type)
+
 @app.get("/debug/connections")
 async def debug_connections():
-    """デバッグ用の接続情報エンドポイント"""
+    """デバッグ用の接続情報エンドポイント（clients はこのプロセスの接続のみ）"""
+    if not DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+    stats = await presence.stats()
     return {
-        "active_connections": len(connected_clients),
-        "channel_count": len(channel_members),
-        "channels": {
-            channel_id: list(sids)
-            for channel_id, sids in channel_members.items()
-        },
+        "active_connections": stats["clients"],
+        "channel_count": stats["channels"],
+        "channels": await presence.room_sizes(),
         "clients": {
             sid: {
                 "connected_at": client.get("connected_at"),
@@ -439,33 +703,22 @@ async def debug_connections():
         "server_info": {
             "start_time": datetime.now().isoformat(),
             "socketio_version": socketio.__version__,
-            "cors_origins": cors_origins
+            "cors_origins": allowed_origins,
+            "shared_backend": presence.shared
         }
     }
 
 # チャンネル情報取得API
 @app.get("/api/channels/{channel_id}/status")
 async def get_channel_status(channel_id: str):
-    """チャンネルのステータス情報を取得"""
-    if channel_id in channel_members:
-        members = []
-        for sid in channel_members[channel_id]:
-            if sid in connected_clients:
-                members.append(connected_clients[sid].get('user_info', {}))
-        
-        return {
-            "channel_id": channel_id,
-            "active_members_count": len(channel_members[channel_id]),
-            "active_members": members,
-            "timestamp": datetime.now().isoformat()
-        }
-    else:
-        return {
-            "channel_id": channel_id,
-            "active_members_count": 0,
-            "active_members": [],
-            "timestamp": datetime.now().isoformat()
-        }
+    """チャンネルのステータス情報を取得（すべてのノードのメンバーを含む）"""
+    members = await presence.channel_members(channel_id)
+    return {
+        "channel_id": channel_id,
+        "active_members_count": len(members),
+        "active_members": members,
+        "timestamp": datetime.now().isoformat()
+    }
 
 # メインアプリケーションとして実行する場合
 if __name__ == "__main__":
@@ -475,15 +728,33 @@ if __name__ == "__main__":
     host = os.environ.get("HOST", "0.0.0.0")
     port = int(os.environ.get("PORT", 8001))
     
-    logger.info(f"Starting Socket.IO server on {host}:{port}")
+    # 複数ワーカーは共有バックエンド（WEBSOCKET_BACKEND=redis）が必要。
+    # ロングポーリングを使うクライアントがいる場合はスティッキーセッションも必要
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    
+    logger.info(f"Starting Socket.IO server on {host}:{port} ({workers} workers)")
     
-    uvicorn.run(
-        socket_app,
-        host=host,
-        port=port,
-        log_level="info",
-        reload=True
-    )
+    # 本番モードではリクエストごとのアクセスログを出さない
+    log_level = "warning" if PRODUCTION else "info"
+    
+    # 複数ワーカーのメトリクスを /metrics でまとめて返すための共有ディレクトリ
+    prepare_metrics_dir(workers)
+    
+    if workers > 1 and not presence.shared:
+        logger.warning("Multiple workers with the memory backend: broadcasts will not reach other workers")
+    
+    if workers > 1 or not PRODUCTION:
+        # 複数ワーカーと開発モードの自動リロードはアプリを import 文字列で渡す必要がある
+        uvicorn.run("main:app", host=host, port=port, log_level=log_level, access_log=not PRODUCTION,
+                    workers=workers, reload=not PRODUCTION and workers == 1)
+    else:
+        uvicorn.run(
+            socket_app,
+            host=host,
+            port=port,
+            log_level=log_level,
+            access_log=False
+        )
 else:
     # Uvicornから呼び出される場合
     # このモジュールのソケットアプリをエクスポート
@@ -0,0 +1,198 @@
+"""
+接続・チャンネル参加状況（プレゼンス）の管理
+
+WEBSOCKET_BACKEND=memory（デフォルト）はプロセス内の辞書で管理し、従来と同じ
+動作になる。WEBSOCKET_BACKEND=redis は Redis 互換サーバー（Redis / Valkey /
+KeyDB）に状態を置き、Socket.IO の AsyncRedisManager と組み合わせることで
+複数ワーカー・複数レプリカ間でブロードキャストと接続状況を共有する。
+"""
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import socketio
+
+logger = logging.getLogger(__name__)
+
+# ノードの生存確認間隔（秒）と、応答がないノードを停止とみなすまでの秒数
+HEARTBEAT_INTERVAL = 10
+NODE_TIMEOUT = 30
+
+
+class MemoryPresence:
+    """プロセス内の辞書による接続状況管理（単一プロセス用）"""
+
+    shared = False
+
+    def __init__(self):
+        self.clients = set()
+        self.channels: Dict[str, Dict[str, Dict[str, Any]]] = {}  # channel_id -> {sid: user_info}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def heartbeat(self):
+        pass
+
+    async def add_client(self, sid: str):
+        self.clients.add(sid)
+
+    async def remove_client(self, sid: str):
+        self.clients.discard(sid)
+
+    async def join(self, channel_id: str, sid: str, user_info: Optional[Dict[str, Any]] = None):
+        self.channels.setdefault(channel_id, {})[sid] = user_info or {}
+
+    async def leave(self, channel_id: str, sid: str):
+        members = self.channels.get(channel_id)
+        if members is None:
+            return
+        members.pop(sid, None)
+        # チャンネルが空になった場合は削除
+        if not members:
+            del self.channels[channel_id]
+
+    async def channel_members(self, channel_id: str) -> List[Dict[str, Any]]:
+        return list(self.channels.get(channel_id, {}).values())
+
+    async def member_count(self, channel_id: str) -> int:
+        return len(self.channels.get(channel_id, {}))
+
+    async def room_sizes(self) -> Dict[str, int]:
+        return {channel_id: len(members) for channel_id, members in self.channels.items()}
+
+    async def stats(self) -> Dict[str, int]:
+        return {
+            'clients': len(self.clients),
+            'channels': len(self.channels),
+            'nodes': 1,
+        }
+
+
+class RedisPresence:
+    """
+    Redis 互換サーバーによるクラスタ全体の接続状況管理
+
+    キー構成:
+    - {prefix}:nodes                    稼働ノード（ZSET, score=最終ハートビート時刻）
+    - {prefix}:node:{node}:clients      ノードに接続中の sid（SET）
+    - {prefix}:node:{node}:memberships  ノードの sid のチャンネル参加（SET, [channel_id, sid] の JSON）
+    - {prefix}:channels                 メンバーがいるチャンネル ID（SET）
+    - {prefix}:channel:{channel_id}     チャンネルのメンバー（HASH, sid -> {"node", "user_info"}）
+
+    停止したノード（ハートビートが NODE_TIMEOUT 秒途絶えたもの）の接続は、
+    他のノードのハートビート時に掃除される。
+    """
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = 'sphere_ws'):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.node = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def _key(self, *parts: str) -> str:
+        return ':'.join((self.prefix, *parts))
+
+    async def start(self):
+        await self.heartbeat()
+        logger.info(f"Presence node registered: {self.node}")
+
+    async def stop(self):
+        await self._remove_node(self.node)
+
+    async def heartbeat(self):
+        """自ノードの生存を記録し、停止したノードの接続を削除"""
+        now = time.time()
+        await self.redis.zadd(self._key('nodes'), {self.node: now})
+        dead_nodes = await self.redis.zrangebyscore(self._key('nodes'), 0, now - NODE_TIMEOUT)
+        for node in dead_nodes:
+            logger.warning(f"Removing stale presence node: {node}")
+            await self._remove_node(node)
+
+    async def _remove_node(self, node: str):
+        memberships = await self.redis.smembers(self._key('node', node, 'memberships'))
+        for membership in memberships:
+            channel_id, sid = json.loads(membership)
+            await self._remove_member(channel_id, sid)
+        await self.redis.delete(self._key('node', node, 'clients'), self._key('node', node, 'memberships'))
+        await self.redis.zrem(self._key('nodes'), node)
+
+    async def add_client(self, sid: str):
+        await self.redis.sadd(self._key('node', self.node, 'clients'), sid)
+
+    async def remove_client(self, sid: str):
+        await self.redis.srem(self._key('node', self.node, 'clients'), sid)
+
+    async def join(self, channel_id: str, sid: str, user_info: Optional[Dict[str, Any]] = None):
+        member = json.dumps({'node': self.node, 'user_info': user_info or {}})
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._key('channel', channel_id), sid, member)
+            pipe.sadd(self._key('channels'), channel_id)
+            pipe.sadd(self._key('node', self.node, 'memberships'), json.dumps([channel_id, sid]))
+            await pipe.execute()
+
+    async def leave(self, channel_id: str, sid: str):
+        await self.redis.srem(self._key('node', self.node, 'memberships'), json.dumps([channel_id, sid]))
+        await self._remove_member(channel_id, sid)
+
+    async def _remove_member(self, channel_id: str, sid: str):
+        await self.redis.hdel(self._key('channel', channel_id), sid)
+        # チャンネルが空になった場合は一覧から削除
+        if not await self.redis.hlen(self._key('channel', channel_id)):
+            await self.redis.srem(self._key('channels'), channel_id)
+
+    async def channel_members(self, channel_id: str) -> List[Dict[str, Any]]:
+        members = await self.redis.hvals(self._key('channel', channel_id))
+        return [json.loads(member).get('user_info', {}) for member in members]
+
+    async def member_count(self, channel_id: str) -> int:
+        return await self.redis.hlen(self._key('channel', channel_id))
+
+    async def room_sizes(self) -> Dict[str, int]:
+        channel_ids = list(await self.redis.smembers(self._key('channels')))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for channel_id in channel_ids:
+                pipe.hlen(self._key('channel', channel_id))
+            sizes = await pipe.execute()
+        return dict(zip(channel_ids, sizes))
+
+    async def stats(self) -> Dict[str, int]:
+        nodes = await self.redis.zrangebyscore(self._key('nodes'), time.time() - NODE_TIMEOUT, '+inf')
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for node in nodes:
+                pipe.scard(self._key('node', node, 'clients'))
+            pipe.scard(self._key('channels'))
+            counts = await pipe.execute()
+        return {
+            'clients': sum(counts[:-1]),
+            'channels': counts[-1],
+            'nodes': len(nodes),
+        }
+
+
+def create_backend():
+    """
+    環境変数から (Socket.IO クライアントマネージャー, プレゼンスストア) を作成
+
+    - WEBSOCKET_BACKEND: memory（デフォルト）または redis
+    - WEBSOCKET_REDIS_URL: redis バックエンドの接続先（デフォルト: REDIS_URL または redis://redis:6379/0）
+    """
+    backend = os.environ.get('WEBSOCKET_BACKEND', 'memory').lower()
+    if backend == 'redis':
+        url = os.environ.get('WEBSOCKET_REDIS_URL') or os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+        channel = os.environ.get('WEBSOCKET_REDIS_CHANNEL', 'sphere_socketio')
+        logger.info(f"Using shared Redis backend for Socket.IO: {channel}")
+        return socketio.AsyncRedisManager(url, channel=channel), RedisPresence(url)
+    if backend != 'memory':
+        raise ValueError(f"Unknown WEBSOCKET_BACKEND: {backend}")
+    return None, MemoryPresence()
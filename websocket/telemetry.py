@@ -0,0 +1,164 @@
+"""
+ログとメトリクス
+
+WEBSOCKET_MODE=production では Socket.IO / Engine.IO のログを止め、イベント単位の
+ログを WEBSOCKET_LOG_SAMPLE_RATE（デフォルト 0.01）の割合だけ JSON 1 行で出力する。
+接続数・イベント処理時間・送信数・ルームサイズ・イベントループの遅延は
+Prometheus 形式のメトリクス（/metrics）で確認する。
+
+複数ワーカー（WEB_CONCURRENCY>1）では PROMETHEUS_MULTIPROC_DIR の共有ディレクトリに
+各ワーカーの値を書き出し、/metrics はどのワーカーが応答しても全ワーカーの合計を返す
+（プロセスのメモリ・CPU だけは応答したワーカーの値）。
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Any
+
+import socketio
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, ProcessCollector, generate_latest,
+    multiprocess
+)
+
+MODE = os.environ.get('WEBSOCKET_MODE', 'development').lower()
+PRODUCTION = MODE == 'production'
+LOG_SAMPLE_RATE = float(os.environ.get('WEBSOCKET_LOG_SAMPLE_RATE', 0.01 if PRODUCTION else 1.0))
+# 設定されている場合はマルチプロセスモード（prepare_metrics_dir を参照）
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# イベントループの遅延を測る間隔（秒）
+LOOP_LAG_INTERVAL = 0.5
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+CONNECTIONS = Counter('socketio_connections_total', 'Socket.IO connection attempts', ['result'])
+DISCONNECTS = Counter('socketio_disconnects_total', 'Socket.IO disconnections')
+CONNECTED_CLIENTS = Gauge(
+    'socketio_connected_clients', 'Sockets connected to this process', multiprocess_mode='livesum'
+)
+EVENTS = Counter('socketio_events_total', 'Socket.IO events handled', ['event', 'status'])
+EVENT_DURATION = Histogram(
+    'socketio_event_duration_seconds', 'Socket.IO event handler latency', ['event'], buckets=LATENCY_BUCKETS
+)
+EMITS = Counter('socketio_emits_total', 'Socket.IO emits', ['event', 'target'])
+EMIT_DURATION = Histogram(
+    'socketio_emit_duration_seconds', 'Time spent in sio.emit', ['target'], buckets=LATENCY_BUCKETS
+)
+BROADCAST_BATCH_SIZE = Histogram(
+    'socketio_broadcast_batch_events', 'Events coalesced into one broadcast frame', buckets=(1, 2, 5, 10, 25, 50, 100)
+)
+# クラスタ全体の値なのでワーカー間では合計せず最大値を使う
+CHANNELS = Gauge(
+    'socketio_channels', 'Channels with at least one member (cluster-wide)', multiprocess_mode='livemax'
+)
+CHANNEL_MEMBERS = Gauge(
+    'socketio_channel_members', 'Channel member counts (cluster-wide)', ['stat'], multiprocess_mode='livemax'
+)
+LOOP_LAG = Histogram(
+    'socketio_event_loop_lag_seconds', 'Delay of scheduled callbacks on the event loop', buckets=LATENCY_BUCKETS
+)
+
+
+def prepare_metrics_dir(workers: int):
+    """
+    ワーカー起動前に PROMETHEUS_MULTIPROC_DIR を用意する（複数ワーカーの場合）
+    未設定なら一時ディレクトリを作り、前回の起動で残った値のファイルは削除する
+    """
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if workers <= 1 and not directory:
+        return
+    if not directory:
+        directory = tempfile.mkdtemp(prefix='prometheus_')
+        # ワーカーはこの環境変数を引き継いで起動する
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = directory
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.db'):
+            os.remove(os.path.join(directory, name))
+
+
+def configure_logging():
+    """モードに応じてログレベルを設定"""
+    logging.basicConfig(level=logging.WARNING if PRODUCTION else logging.INFO)
+    # イベントログはサンプリングして INFO で出す
+    logging.getLogger('websocket.events').setLevel(logging.INFO)
+
+
+class EventLogger:
+    """イベント単位のログを sample_rate の割合だけ JSON 1 行で出力する"""
+
+    def __init__(self, sample_rate: float = LOG_SAMPLE_RATE):
+        self.logger = logging.getLogger('websocket.events')
+        self.sample_rate = sample_rate
+
+    def log(self, event: str, **fields: Any):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(json.dumps({'event': event, **fields}, default=str, ensure_ascii=False))
+
+
+class InstrumentedAsyncServer(socketio.AsyncServer):
+    """emit の回数と所要時間を記録する AsyncServer"""
+
+    async def emit(self, event, data=None, to=None, room=None, **kwargs):
+        # to=sid も 1 人だけのルームとして扱う
+        target = 'room' if (to or room) else 'all'
+        start = time.perf_counter()
+        try:
+            return await super().emit(event, data, to=to, room=room, **kwargs)
+        finally:
+            EMIT_DURATION.labels(target).observe(time.perf_counter() - start)
+            EMITS.labels(event, target).inc()
+
+
+def instrument(handler):
+    """Socket.IO イベントハンドラの処理時間と結果を記録する（@sio.event の内側に付ける）"""
+    event = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            result = await handler(*args, **kwargs)
+            if isinstance(result, dict) and result.get('status') == 'error':
+                status = 'error'
+            return result
+        except Exception:
+            status = 'exception'
+            raise
+        finally:
+            EVENT_DURATION.labels(event).observe(time.perf_counter() - start)
+            EVENTS.labels(event, status).inc()
+
+    return wrapper
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """interval 秒ごとに起きて、予定より遅れた時間をイベントループの遅延として記録する"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(loop.time() - expected, 0))
+
+
+async def render_metrics(presence):
+    """/metrics のレスポンス本文と Content-Type を返す"""
+    sizes = list((await presence.room_sizes()).values())
+    CHANNELS.set(len(sizes))
+    CHANNEL_MEMBERS.labels('total').set(sum(sizes))
+    CHANNEL_MEMBERS.labels('max').set(max(sizes, default=0))
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        ProcessCollector(registry=registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
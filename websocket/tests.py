@@ -0,0 +1,155 @@
+"""
+WebSocket サーバーの結合テスト
+
+loadtest.LocalServer で main.py を空きポートで起動し、実際の Socket.IO クライアントと
+HTTP リクエストで動作を確認する（外部サービス不要）。
+
+使い方:
+    python -m unittest tests
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import aiohttp
+import socketio
+
+from loadtest import LocalServer
+
+NOTIFY_SECRET = 'test-notify-secret'
+
+
+class TaskNotificationTests(unittest.IsolatedAsyncioTestCase):
+    """バックエンドからのタスク通知が join_task したクライアントに届くことを確認する"""
+
+    async def asyncSetUp(self):
+        os.environ['WEBSOCKET_NOTIFY_SECRET'] = NOTIFY_SECRET
+        self.server = LocalServer()
+        await self.server.__aenter__()
+        self.addAsyncCleanup(self.server.__aexit__, None, None, None)
+
+    async def _task_client(self, task_id):
+        """useTaskSocket と同じく接続して join_task し、受信したイベントを返すリストを作る"""
+        received = []
+        client = socketio.AsyncClient(reconnection=False)
+        client.on('task_update', lambda data: received.append(('task_update', data)))
+        client.on('task_updates', lambda data: received.append(('task_updates', data)))
+        await client.connect(self.server.url, transports=['websocket'], wait_timeout=10)
+        self.addAsyncCleanup(client.disconnect)
+        response = await client.call('join_task', {'task_id': task_id, 'user_info': {'id': 1}}, timeout=10)
+        self.assertEqual(response['status'], 'success')
+        return received
+
+    async def _post(self, path, body, secret=NOTIFY_SECRET):
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                f'{self.server.url}{path}', json=body, headers={'X-Notify-Secret': secret}
+            ) as response:
+                return response.status
+
+    async def _wait_for(self, received, count=1, timeout=5):
+        for _ in range(int(timeout / 0.05)):
+            if len(received) >= count:
+                return
+            await asyncio.sleep(0.05)
+        self.fail(f'Expected {count} events, got {received}')
+
+    async def test_task_client_receives_status_update(self):
+        received = await self._task_client(7)
+        other_task = await self._task_client(8)
+
+        status = await self._post('/api/notify_task_status', {
+            'task_id': 7, 'new_status': '作業中', 'user_id': 3, 'user_name': 'Alice'
+        })
+        self.assertEqual(status, 202)
+
+        await self._wait_for(received)
+        event, data = received[0]
+        self.assertEqual(event, 'task_update')
+        self.assertEqual(data['type'], 'status_changed')
+        self.assertEqual(data['new_status'], '作業中')
+        self.assertEqual(data['user'], {'id': 3, 'name': 'Alice'})
+        self.assertEqual(other_task, [])
+
+    async def test_updates_in_one_window_arrive_as_one_batch(self):
+        received = await self._task_client(7)
+
+        status = await self._post('/api/notify_batch', {'events': [
+            {'event_type': 'task_status', 'payload': {'task_id': 7, 'new_status': s}} for s in ('A', 'B', 'C')
+        ]})
+        self.assertEqual(status, 202)
+
+        await self._wait_for(received)
+        event, data = received[0]
+        self.assertEqual(event, 'task_updates')
+        self.assertEqual([item['new_status'] for item in data['events']], ['A', 'B', 'C'])
+
+    async def test_notify_requires_secret(self):
+        status = await self._post('/api/notify_task_status', {'task_id': 7, 'new_status': 'A'}, secret='wrong')
+        self.assertEqual(status, 403)
+
+
+class UserNotificationTests(unittest.IsolatedAsyncioTestCase):
+    """トークン付きで接続したソケットにだけユーザー宛て通知が届くことを確認する"""
+
+    token = 'a' * 40
+
+    async def asyncSetUp(self):
+        # 認証用に authtoken_token / users_user だけを持つ SQLite の DB を用意する
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'auth.sqlite3')
+        with sqlite3.connect(path) as db:
+            db.executescript(f"""
+                CREATE TABLE users_user (
+                    id INTEGER PRIMARY KEY, email TEXT, first_name TEXT, last_name TEXT,
+                    business_id INTEGER, is_active BOOLEAN
+                );
+                CREATE TABLE authtoken_token (key TEXT PRIMARY KEY, user_id INTEGER);
+                INSERT INTO users_user VALUES (5, 'user@example.com', 'Taro', 'Yamada', 1, 1);
+                INSERT INTO authtoken_token VALUES ('{self.token}', 5);
+            """)
+        os.environ['WEBSOCKET_NOTIFY_SECRET'] = NOTIFY_SECRET
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+        self.addCleanup(os.environ.pop, 'DATABASE_URL')
+        self.server = LocalServer()
+        await self.server.__aenter__()
+        self.addAsyncCleanup(self.server.__aexit__, None, None, None)
+
+    async def _client(self, token=None):
+        received = []
+        # always_connect=True のため接続完了は connect ハンドラより先に届く。
+        # ハンドラの最後に送られる connection_status を待ってルーム参加を確定させる
+        ready = asyncio.Event()
+        client = socketio.AsyncClient(reconnection=False)
+        client.on('connection_status', lambda data: ready.set())
+        client.on('task_notification', lambda data: received.append(data))
+        await client.connect(
+            self.server.url, transports=['websocket'], auth={'token': token} if token else None, wait_timeout=10
+        )
+        self.addAsyncCleanup(client.disconnect)
+        await asyncio.wait_for(ready.wait(), timeout=10)
+        return received
+
+    async def test_notification_reaches_only_the_recipient(self):
+        recipient = await self._client(self.token)
+        anonymous = await self._client()
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f'{self.server.url}/api/notify_users', headers={'X-Notify-Secret': NOTIFY_SECRET}, json={
+                'notifications': [{'user_id': 5, 'task_id': 7, 'notification_type': 'comment', 'content': 'hi'}]
+            }) as response:
+                self.assertEqual(response.status, 202)
+
+        for _ in range(100):
+            if recipient:
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual([n['content'] for n in recipient], ['hi'])
+        self.assertEqual(anonymous, [])
+
+
+if __name__ == '__main__':
+    unittest.main()